@@ -0,0 +1,4 @@
+"""
+Tools for measuring the performance of taskflowd. Run them from the repository root,
+eg. ``python -m benchmark.loadgen --help``
+"""
@@ -0,0 +1,235 @@
+"""
+Runs taskflowd against the scripted state of a fake machine, instead of the local system's.
+
+Usage: python -m benchmark.fake_daemon --port 14305 --memory 64G --gpus 4 --script steps.yml
+"""
+
+import os
+import tempfile
+import time
+import typer
+import yaml
+
+from types import MappingProxyType
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import daemon
+
+from taskflow import di
+from taskflow.model.state import SystemState, SystemStateSnapshot
+from taskflow.model.task import Task
+from taskflow.utils import convert_byte_any
+
+from benchmark.utils import raise_open_files_limit
+
+# Main memory, and memory on each GPU id, in bytes
+Usage = Tuple[int, Dict[str, int]]
+
+
+class ScriptStep(NamedTuple):
+    """
+    Free resources of the fake machine from a point in time on,
+    before the usage of running tasks is subtracted
+    """
+
+    # Seconds since the state was created
+    at_s: float
+    memory_free_bytes: int
+    # Missing GPUs are entirely free
+    gpu_memory_free_bytes: Dict[str, int] = {}
+
+
+def load_script(f) -> List[ScriptStep]:
+    """
+    Loads script steps from a YAML list, eg.
+
+    .. code-block:: yaml
+
+        - at_s: 60
+          memory_free: 16G
+          gpu_memory_free: {"0": 0}
+
+    :param f: An opened YAML file
+    :rtype: List[ScriptStep]
+    """
+    steps = []
+    for d in yaml.full_load(f) or []:
+        steps.append(
+            ScriptStep(
+                at_s=float(d["at_s"]),
+                memory_free_bytes=convert_byte_any(d["memory_free"]),
+                gpu_memory_free_bytes={
+                    str(k): convert_byte_any(v)
+                    for k, v in d.get("gpu_memory_free", {}).items()
+                },
+            )
+        )
+    return sorted(steps, key=lambda s: s.at_s)
+
+
+def get_running_usage(tasks: List[Task]) -> Usage:
+    """
+    Get the resources declared by a set of tasks, as assigned by the scheduler
+
+    :type tasks: List[Task]
+    :rtype: Usage
+    """
+    memory_bytes = 0
+    gpu_memory_bytes: Dict[str, int] = {}
+    for task in tasks:
+        memory_bytes += task.usage.memory_bytes or 0
+        for gpu_id, usage_bytes in (task.gpu_assignment or {}).items():
+            gpu_memory_bytes[gpu_id] = gpu_memory_bytes.get(gpu_id, 0) + usage_bytes
+    return memory_bytes, gpu_memory_bytes
+
+
+class ScriptedSystemState(SystemState):
+    """
+    System state of a fake machine, following a script instead of querying the local system.
+
+    Free resources come from the last script step reached, minus the usage of running tasks
+    returned by ``usage``. Tasks are thus assumed to use exactly what they declared, as soon as they start.
+    The usage is subtracted in :meth:`publish`, which runs on the event loop along with the scheduler.
+
+    :param memory_total_bytes: Main memory of the machine
+    :param gpu_memory_total_bytes: Memory of each GPU id
+    :param cpu_count: Number of CPU cores, which are always idle
+    :param steps: Script steps, in time order. Without steps, the whole machine is free
+    :param usage: Callback returning the resources used by running tasks
+    """
+
+    __slots__ = [
+        "total_memory_bytes",
+        "total_gpu_memory_bytes",
+        "cpu_count",
+        "steps",
+        "usage",
+        "started_at",
+    ]
+
+    def __init__(
+        self,
+        memory_total_bytes: int,
+        gpu_memory_total_bytes: Optional[Dict[str, int]] = None,
+        cpu_count: int = 0,
+        steps: Optional[List[ScriptStep]] = None,
+        usage: Optional[Callable[[], Usage]] = None,
+    ) -> None:
+        super().__init__(gpu_available=False)
+        self.total_memory_bytes = memory_total_bytes
+        self.total_gpu_memory_bytes = dict(gpu_memory_total_bytes or {})
+        self.cpu_count = cpu_count
+        self.steps = list(steps or [])
+        self.usage = usage
+        self.started_at = time.monotonic()
+
+    def probe(self) -> SystemStateSnapshot:
+        elapsed_s = time.monotonic() - self.started_at
+        memory_free_bytes = self.total_memory_bytes
+        gpu_memory_free_bytes = dict(self.total_gpu_memory_bytes)
+
+        for step in self.steps:
+            if step.at_s > elapsed_s:
+                break
+            memory_free_bytes = min(step.memory_free_bytes, self.total_memory_bytes)
+            gpu_memory_free_bytes = dict(self.total_gpu_memory_bytes)
+            for gpu_id, free_bytes in step.gpu_memory_free_bytes.items():
+                if gpu_id in gpu_memory_free_bytes:
+                    gpu_memory_free_bytes[gpu_id] = min(
+                        free_bytes, gpu_memory_free_bytes[gpu_id]
+                    )
+
+        return SystemStateSnapshot(
+            memory_free_bytes=memory_free_bytes,
+            memory_total_bytes=self.total_memory_bytes,
+            gpu_memory_free_bytes=MappingProxyType(gpu_memory_free_bytes),
+            gpu_memory_total_bytes=MappingProxyType(dict(self.total_gpu_memory_bytes)),
+            cpu_load_percent=MappingProxyType({i: 0.0 for i in range(self.cpu_count)}),
+        )
+
+    def publish(
+        self, snapshot: SystemStateSnapshot, change_threshold_bytes: int = 0
+    ) -> bool:
+        if self.usage is not None:
+            memory_bytes, gpu_memory_bytes = self.usage()
+            snapshot = snapshot._replace(
+                memory_free_bytes=max(0, snapshot.memory_free_bytes - memory_bytes),
+                gpu_memory_free_bytes=MappingProxyType(
+                    {
+                        gpu_id: max(0, free_bytes - gpu_memory_bytes.get(gpu_id, 0))
+                        for gpu_id, free_bytes in snapshot.gpu_memory_free_bytes.items()
+                    }
+                ),
+            )
+        return super().publish(snapshot, change_threshold_bytes)
+
+
+def get_benchmark_settings(port: int, base: Optional[dict] = None) -> dict:
+    """
+    Get daemon settings for a benchmark run, on top of the given settings.
+    Nothing is written to disk, and task usage is not sampled since tasks have no process.
+
+    :param port: Port of the API server
+    :param base: Settings under test, eg. scheduling policies
+    :rtype: dict
+    """
+    settings = dict(base or {})
+    settings.update(
+        api_host="127.0.0.1",
+        api_port=port,
+        db_backend="memory",
+        archive_dir=None,
+        estimator_path=None,
+        trace_dir=None,
+        usage_sample_interval=0,
+        ramp_up_sample_interval=0,
+    )
+    return settings
+
+
+def fake_daemon(
+    port: int = typer.Option(14305, help="Port of the API server"),
+    memory: str = typer.Option("64G", help="Main memory of the fake machine"),
+    gpus: int = typer.Option(0, help="Number of GPUs of the fake machine"),
+    gpu_memory: str = typer.Option("24G", help="Memory of each GPU"),
+    cpus: int = typer.Option(32, help="Number of CPU cores of the fake machine"),
+    script: Optional[str] = typer.Option(
+        None, help="YAML file of timed changes in free resources"
+    ),
+    settings_path: Optional[str] = typer.Option(
+        None, "--settings", help="Daemon settings to benchmark"
+    ),
+):
+    """
+    Runs taskflowd against a fake machine
+    """
+    raise_open_files_limit()
+
+    steps: List[ScriptStep] = []
+    if script is not None:
+        with open(script, "rt") as f:
+            steps = load_script(f)
+
+    base = None
+    if settings_path is not None:
+        with open(settings_path, "rt") as f:
+            base = yaml.full_load(f)
+
+    gpu_memory_bytes = convert_byte_any(gpu_memory)
+    state = ScriptedSystemState(
+        memory_total_bytes=convert_byte_any(memory),
+        gpu_memory_total_bytes={str(i): gpu_memory_bytes for i in range(gpus)},
+        cpu_count=cpus,
+        steps=steps,
+        usage=lambda: get_running_usage(di.scheduler().running_tasks()),
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "settings.yml")
+        with open(path, "wt") as f:
+            yaml.dump(get_benchmark_settings(port, base), f)
+        daemon.main(path, state=state)
+
+
+if __name__ == "__main__":
+    typer.run(fake_daemon)
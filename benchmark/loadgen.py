@@ -0,0 +1,469 @@
+"""
+Load generator for taskflowd.
+
+Starts the daemon against a fake machine (see :mod:`benchmark.fake_daemon`), then runs
+many clients speaking the same websocket protocol as `taskflow run`, each submitting tasks
+one after the other. Reports submit-to-start latencies, daemon CPU and memory, and event loop lag.
+
+Usage: python -m benchmark.loadgen --clients 2000 --duration 60
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import time
+import psutil
+import requests
+import tabulate
+import typer
+import uvloop
+import websockets
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from websockets.exceptions import ConnectionClosed
+
+from taskflow.model.task import NewTask, TaskPriority, TaskResourceUsage
+from taskflow.model.ws import MessageType, SocketMessage, TaskFinishInfo
+from taskflow.utils import convert_byte_any, get_timestamp_ms
+
+from benchmark.utils import parse_range, percentiles, raise_open_files_limit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LATENCY_PERCENTILES = [50, 90, 99, 100]
+
+
+class Histogram(NamedTuple):
+    """
+    Histogram scraped from the daemon's metrics
+    """
+
+    # Upper bound and cumulative count of each bucket
+    buckets: List[Tuple[float, int]]
+    sum: float
+    count: int
+
+    def __sub__(self, other: "Histogram") -> "Histogram":
+        # Histograms only show up once they have a value
+        if len(other.buckets) < 1:
+            return self
+        return Histogram(
+            buckets=[
+                (bound, count - other_count)
+                for (bound, count), (_, other_count) in zip(self.buckets, other.buckets)
+            ],
+            sum=self.sum - other.sum,
+            count=self.count - other.count,
+        )
+
+    def quantile(self, q: float) -> float:
+        """
+        Get the upper bound of the bucket holding the given quantile
+
+        :param q: Quantile, between 0 and 1
+        :rtype: float
+        """
+        for bound, count in self.buckets:
+            if count >= q * self.count:
+                return bound
+        return float("inf")
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count > 0 else 0
+
+
+def parse_histogram(text: str, name: str) -> Histogram:
+    """
+    Extracts an unlabelled histogram from metrics in the Prometheus text format
+
+    :param text: The scraped metrics
+    :param name: Name of the histogram
+    :rtype: Histogram
+    """
+    buckets: List[Tuple[float, int]] = []
+    values: Dict[str, float] = {}
+    for line in text.splitlines():
+        match = re.match(rf'{name}_bucket{{le="([^"]+)"}} (\S+)$', line)
+        if match is not None:
+            buckets.append((float(match.group(1)), int(float(match.group(2)))))
+            continue
+        for suffix in ["sum", "count"]:
+            if line.startswith(f"{name}_{suffix} "):
+                values[suffix] = float(line.split()[1])
+
+    return Histogram(
+        buckets=buckets,
+        sum=values.get("sum", 0),
+        count=int(values.get("count", 0)),
+    )
+
+
+class LoadOptions(NamedTuple):
+    """
+    Behavior of the benchmark clients
+    """
+
+    users: int
+    runtime_s: Tuple[float, float]
+    think_time_s: Tuple[float, float]
+    memory_bytes: Tuple[int, int]
+    init_delay_s: int
+    abandon_ratio: float
+    patience_s: Tuple[float, float]
+
+
+class LoadStats:
+    """
+    Counters shared by all benchmark clients
+    """
+
+    def __init__(self) -> None:
+        # Time between sending a task and receiving its start signal
+        self.latencies_s: List[float] = []
+        self.submitted = 0
+        self.finished = 0
+        self.abandoned = 0
+        # Tasks still pending at the end of the run
+        self.unstarted = 0
+        self.rejected = 0
+        self.errors = 0
+
+
+async def wait_for_start(ws, timeout: float) -> bool:
+    """
+    Reads messages until the start signal, ignoring queue updates
+
+    :return: True if the task can start, False on timeout
+    :rtype: bool
+    """
+
+    async def receive_start():
+        while True:
+            data = json.loads(await ws.recv())
+            if data.get("type") == MessageType.TASK_CAN_START:
+                return
+
+    try:
+        await asyncio.wait_for(receive_start(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def run_client(
+    index: int, uri: str, options: LoadOptions, deadline: float, stats: LoadStats
+):
+    """
+    Submits tasks one after the other until the deadline, like a user calling `taskflow run` in a loop
+    """
+    rng = random.Random(index)
+
+    while time.monotonic() < deadline:
+        new_task = NewTask(
+            cmd=f"benchmark {index}",
+            created_by=f"user{index % options.users}",
+            priority=rng.choice(list(TaskPriority)),
+            usage=TaskResourceUsage(memory_bytes=rng.randint(*options.memory_bytes)),
+            init_delay_s=options.init_delay_s,
+            pid=os.getpid(),
+        )
+
+        try:
+            async with websockets.connect(uri, open_timeout=None) as ws:
+                submitted_at = time.monotonic()
+                await ws.send(new_task.json())
+                stats.submitted += 1
+                task = json.loads(await ws.recv())
+
+                timeout = deadline - time.monotonic()
+                abandon = rng.random() < options.abandon_ratio
+                if abandon:
+                    timeout = min(timeout, rng.uniform(*options.patience_s))
+                if not await wait_for_start(ws, max(0, timeout)):
+                    if abandon:
+                        stats.abandoned += 1
+                    else:
+                        stats.unstarted += 1
+                    continue
+                stats.latencies_s.append(time.monotonic() - submitted_at)
+
+                task["pid"] = os.getpid()
+                task["started_at"] = get_timestamp_ms()
+                message = SocketMessage(type=MessageType.TASK_UPDATE, data=task)
+                await ws.send(message.json())
+
+                await asyncio.sleep(rng.uniform(*options.runtime_s))
+
+                message = SocketMessage(
+                    type=MessageType.TASK_FINISH, data=TaskFinishInfo(exit_code=0)
+                )
+                await ws.send(message.json())
+                await ws.wait_closed()
+                stats.finished += 1
+        except ConnectionClosed as e:
+            if e.code == 1008:
+                stats.rejected += 1
+            else:
+                stats.errors += 1
+        except OSError:
+            stats.errors += 1
+            await asyncio.sleep(1)
+
+        await asyncio.sleep(rng.uniform(*options.think_time_s))
+
+
+async def monitor_process(
+    process: psutil.Process, samples: List[Tuple[float, int]], interval_s: float = 1
+):
+    """
+    Samples the CPU usage and resident memory of a process until cancelled
+    """
+    process.cpu_percent()
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            samples.append((process.cpu_percent(), process.memory_info().rss))
+        except psutil.NoSuchProcess:
+            return
+
+
+async def run_load(
+    port: int,
+    clients: int,
+    connect_rate: float,
+    duration_s: float,
+    options: LoadOptions,
+    daemon_process: psutil.Process,
+) -> Dict[str, Any]:
+    uri = f"ws://127.0.0.1:{port}/tasks/start"
+    loop = asyncio.get_event_loop()
+    stats = LoadStats()
+    daemon_samples: List[Tuple[float, int]] = []
+    own_samples: List[Tuple[float, int]] = []
+
+    metrics_before = await loop.run_in_executor(None, scrape_metrics, port)
+    monitors = [
+        asyncio.ensure_future(monitor_process(daemon_process, daemon_samples)),
+        asyncio.ensure_future(monitor_process(psutil.Process(), own_samples)),
+    ]
+
+    started_at = time.monotonic()
+    deadline = started_at + duration_s
+    client_tasks = []
+    for i in range(clients):
+        client_tasks.append(
+            asyncio.ensure_future(run_client(i, uri, options, deadline, stats))
+        )
+        await asyncio.sleep(1 / connect_rate)
+    await asyncio.gather(*client_tasks)
+    elapsed_s = time.monotonic() - started_at
+
+    for monitor in monitors:
+        monitor.cancel()
+    metrics_after = await loop.run_in_executor(None, scrape_metrics, port)
+
+    loop_lag = parse_histogram(
+        metrics_after, "taskflow_event_loop_lag_seconds"
+    ) - parse_histogram(metrics_before, "taskflow_event_loop_lag_seconds")
+    scheduler_pass = parse_histogram(
+        metrics_after, "taskflow_scheduler_pass_seconds"
+    ) - parse_histogram(metrics_before, "taskflow_scheduler_pass_seconds")
+
+    latencies = percentiles(stats.latencies_s, LATENCY_PERCENTILES)
+    return {
+        "clients": clients,
+        "duration_s": elapsed_s,
+        "submitted": stats.submitted,
+        "started": len(stats.latencies_s),
+        "finished": stats.finished,
+        "abandoned": stats.abandoned,
+        "unstarted": stats.unstarted,
+        "rejected": stats.rejected,
+        "errors": stats.errors,
+        "start_rate_per_s": len(stats.latencies_s) / elapsed_s,
+        "start_latency_s": dict(zip([f"p{p}" for p in LATENCY_PERCENTILES], latencies)),
+        "daemon_cpu_percent": summarize([s[0] for s in daemon_samples]),
+        "daemon_rss_bytes": summarize([s[1] for s in daemon_samples]),
+        "loadgen_cpu_percent": summarize([s[0] for s in own_samples]),
+        "loop_lag_s": {
+            "mean": loop_lag.mean(),
+            "p99": loop_lag.quantile(0.99),
+        },
+        "scheduler_pass_s": {
+            "count": scheduler_pass.count,
+            "mean": scheduler_pass.mean(),
+            "p99": scheduler_pass.quantile(0.99),
+        },
+    }
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    if len(values) < 1:
+        return {"mean": 0, "max": 0}
+    return {"mean": sum(values) / len(values), "max": max(values)}
+
+
+def scrape_metrics(port: int) -> str:
+    response = requests.get(f"http://127.0.0.1:{port}/metrics")
+    response.raise_for_status()
+    return response.text
+
+
+def start_daemon(port: int, daemon_args: List[str], log_path: str) -> subprocess.Popen:
+    """
+    Starts the fake daemon, and waits until its API answers
+
+    :raises RuntimeError: If the daemon exits or does not answer within 30 seconds
+    :rtype: subprocess.Popen
+    """
+    with open(log_path, "wb") as log:
+        p = subprocess.Popen(
+            [sys.executable, "-m", "benchmark.fake_daemon", "--port", str(port)]
+            + daemon_args,
+            cwd=ROOT_DIR,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+    for _ in range(300):
+        if p.poll() is not None:
+            raise RuntimeError(f"The daemon exited, see {log_path}")
+        try:
+            scrape_metrics(port)
+            return p
+        except requests.RequestException:
+            time.sleep(0.1)
+
+    p.kill()
+    raise RuntimeError(f"The daemon did not start, see {log_path}")
+
+
+def print_report(report: Dict[str, Any]):
+    latency = report["start_latency_s"]
+    daemon_cpu = report["daemon_cpu_percent"]
+    daemon_rss = report["daemon_rss_bytes"]
+    loop_lag = report["loop_lag_s"]
+    scheduler_pass = report["scheduler_pass_s"]
+    mib = 1024**2
+
+    rows = [
+        ["Clients", report["clients"]],
+        ["Duration", f"{report['duration_s']:.1f}s"],
+        ["Tasks submitted", report["submitted"]],
+        ["Tasks started", f"{report['started']} ({report['start_rate_per_s']:.1f}/s)"],
+        ["Tasks finished", report["finished"]],
+        ["Tasks abandoned", report["abandoned"]],
+        ["Tasks pending at the end", report["unstarted"]],
+        ["Rejected / errors", f"{report['rejected']} / {report['errors']}"],
+        [
+            "Submit-to-start",
+            " ".join(f"{k}={v * 1000:.1f}ms" for k, v in latency.items()),
+        ],
+        ["Daemon CPU", f"{daemon_cpu['mean']:.0f}% mean, {daemon_cpu['max']:.0f}% max"],
+        [
+            "Daemon RSS",
+            f"{daemon_rss['mean'] / mib:.0f}MiB mean, {daemon_rss['max'] / mib:.0f}MiB max",
+        ],
+        [
+            "Event loop lag",
+            f"{loop_lag['mean'] * 1000:.1f}ms mean, p99 <= {loop_lag['p99'] * 1000:g}ms",
+        ],
+        [
+            "Scheduler passes",
+            f"{scheduler_pass['count']}, {scheduler_pass['mean'] * 1000:.2f}ms mean",
+        ],
+        ["Load generator CPU", f"{report['loadgen_cpu_percent']['mean']:.0f}% mean"],
+    ]
+    typer.echo(tabulate.tabulate(rows, tablefmt="plain"))
+
+
+def loadgen(
+    clients: int = typer.Option(1000, help="Number of concurrent clients"),
+    duration: float = typer.Option(60, help="Duration of the run in seconds"),
+    connect_rate: float = typer.Option(
+        200, help="Number of clients connecting per second, at the start of the run"
+    ),
+    users: int = typer.Option(10, help="Number of users the clients submit tasks as"),
+    runtime: str = typer.Option(
+        "1-10", help="Range of task runtimes in seconds, with format <min>-<max>"
+    ),
+    think_time: str = typer.Option(
+        "0-1", help="Range of delays between the tasks of a client, in seconds"
+    ),
+    task_memory: str = typer.Option(
+        "100M-2G", help="Range of declared task memory, with format <min>-<max>"
+    ),
+    init_delay: int = typer.Option(0, help="Startup time of tasks in seconds"),
+    abandon: float = typer.Option(
+        0, help="Fraction of tasks whose client disconnects if they wait too long"
+    ),
+    patience: str = typer.Option(
+        "1-30", help="Range of waiting times before abandoning a task, in seconds"
+    ),
+    port: int = typer.Option(14305, help="Port of the daemon under test"),
+    memory: str = typer.Option("64G", help="Main memory of the fake machine"),
+    cpus: int = typer.Option(32, help="Number of CPU cores of the fake machine"),
+    script: Optional[str] = typer.Option(
+        None, help="YAML file of timed changes in the fake machine's free resources"
+    ),
+    settings_path: Optional[str] = typer.Option(
+        None, "--settings", help="Daemon settings to benchmark"
+    ),
+    daemon_log: str = typer.Option(
+        "taskflowd-benchmark.log", help="File receiving the daemon's output"
+    ),
+    output: Optional[str] = typer.Option(
+        None, "-o", help="Also write the results to this JSON file"
+    ),
+):
+    """
+    Measures how taskflowd copes with many concurrent clients
+    """
+    raise_open_files_limit()
+    uvloop.install()
+
+    memory_range = [convert_byte_any(v) for v in task_memory.split("-", 1)]
+    options = LoadOptions(
+        users=users,
+        runtime_s=parse_range(runtime),
+        think_time_s=parse_range(think_time),
+        memory_bytes=(memory_range[0], memory_range[-1]),
+        init_delay_s=init_delay,
+        abandon_ratio=abandon,
+        patience_s=parse_range(patience),
+    )
+
+    daemon_args = ["--memory", memory, "--cpus", str(cpus)]
+    if script is not None:
+        daemon_args += ["--script", os.path.abspath(script)]
+    if settings_path is not None:
+        daemon_args += ["--settings", os.path.abspath(settings_path)]
+
+    p = start_daemon(port, daemon_args, daemon_log)
+    try:
+        loop = asyncio.get_event_loop()
+        report = loop.run_until_complete(
+            run_load(
+                port, clients, connect_rate, duration, options, psutil.Process(p.pid)
+            )
+        )
+    finally:
+        p.send_signal(signal.SIGINT)
+        try:
+            p.wait(10)
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+    print_report(report)
+    if output is not None:
+        with open(output, "wt") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    typer.run(loadgen)
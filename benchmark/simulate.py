@@ -0,0 +1,674 @@
+"""
+Offline discrete-event simulator for scheduling policies.
+
+Drives the real :class:`TaskScheduler` with a virtual clock, against a fake machine whose free
+resources drop by the actual usage of running tasks. A workload is replayed from a JSON lines file,
+from a task archive, or generated at random, and days of workload run in seconds.
+
+Usage: python -m benchmark.simulate --generate 5000 --settings my-settings.yml
+"""
+
+import asyncio
+import heapq
+import json
+import math
+import random
+import tabulate
+import time
+import typer
+import yaml
+
+from loguru import logger
+from pydantic import BaseModel, validator
+from types import MappingProxyType
+from typing import Any, Dict, List, NamedTuple, Optional, TextIO, Tuple
+
+from taskflow.archive import TaskArchive
+from taskflow.clock import Clock
+from taskflow.db.mem import InMemoryDb
+from taskflow.ledger import PLATEAU_SAMPLES
+from taskflow.model.settings import TaskflowSettings
+from taskflow.model.state import SystemState, SystemStateSnapshot
+from taskflow.model.task import Task, TaskPriority, TaskResourceUsage
+from taskflow.scheduler import TaskScheduler
+from taskflow.utils import convert_byte_any
+
+from benchmark.utils import parse_range, percentiles
+
+WAIT_PERCENTILES = [50, 90, 99, 100]
+
+# Kinds of events, in the order they are handled at the same time
+FINISH = 0
+ARRIVAL = 1
+SAMPLE = 2
+PROBE = 3
+PASS = 4
+
+
+class WorkloadTask(BaseModel):
+    """
+    A task of a workload, as submitted by `taskflow run`, along with how it actually behaves
+    """
+
+    # Seconds since the start of the workload
+    submit_s: float
+    created_by: str = "user"
+    priority: TaskPriority = TaskPriority.MEDIUM
+    # Declared usage
+    usage: TaskResourceUsage = TaskResourceUsage()
+    init_delay_s: int = 15
+    expected_runtime_s: Optional[int] = None
+    duration_s: float
+    # Main memory actually used once started. Defaults to the declared amount
+    memory_bytes: Optional[int] = None
+    # Memory actually used on each assigned GPU. Defaults to the declared amount
+    gpu_memory_bytes: Optional[int] = None
+
+    @validator("memory_bytes", "gpu_memory_bytes", pre=True, always=True)
+    def convert_byte_value(cls, v):
+        return convert_byte_any(v)
+
+
+def load_workload(f: TextIO) -> List[WorkloadTask]:
+    """
+    Loads a workload from a file holding one JSON WorkloadTask per line
+
+    :type f: TextIO
+    :rtype: List[WorkloadTask]
+    """
+    workload = [WorkloadTask.parse_raw(line) for line in f if line.strip()]
+    return sorted(workload, key=lambda w: w.submit_s)
+
+
+def save_workload(workload: List[WorkloadTask], f: TextIO):
+    for w in workload:
+        f.write(w.json(exclude_none=True) + "\n")
+
+
+async def load_archive_workload(path: str) -> List[WorkloadTask]:
+    """
+    Rebuilds a workload from the tasks recorded in a task archive.
+    Archived records only hold the declared main memory, which is assumed to be actually used.
+
+    :param path: Directory of the task archive
+    :rtype: List[WorkloadTask]
+    """
+    archive = TaskArchive(path, retention_days=0)
+    await archive.init()
+
+    records = []
+    cursor: Optional[str] = None
+    while True:
+        page = await archive.search(size=1000, cursor=cursor)
+        records.extend(r for r in page.records if r.runtime_ms is not None)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    await archive.shutdown()
+
+    if len(records) < 1:
+        return []
+
+    first_ms = min(r.created_at for r in records)
+    workload = [
+        WorkloadTask(
+            submit_s=(r.created_at - first_ms) / 1000,
+            created_by=r.created_by,
+            priority=r.priority,
+            usage=TaskResourceUsage(memory_bytes=r.memory_bytes),
+            init_delay_s=0,
+            duration_s=(r.runtime_ms or 0) / 1000,
+        )
+        for r in records
+    ]
+    return sorted(workload, key=lambda w: w.submit_s)
+
+
+def generate_workload(
+    count: int,
+    seed: int = 0,
+    users: int = 10,
+    interval_s: float = 60,
+    duration_s: float = 1800,
+    memory_bytes: Tuple[int, int] = (1024**3, 16 * 1024**3),
+    usage_ratio: Tuple[float, float] = (0.5, 1),
+    gpu_ratio: float = 0,
+    gpu_memory_bytes: Tuple[int, int] = (2 * 1024**3, 20 * 1024**3),
+    init_delay_s: int = 15,
+) -> List[WorkloadTask]:
+    """
+    Generates a random workload. Tasks arrive as a Poisson process, run for exponentially
+    distributed durations, and declare a log-uniform amount of memory, of which they use a random fraction.
+    They declare an expected runtime of up to 1.5 times their duration, as users overestimate it.
+
+    :param count: Number of tasks
+    :param seed: Random seed, for reproducible workloads
+    :param users: Number of users submitting tasks
+    :param interval_s: Mean time between arrivals
+    :param duration_s: Mean task duration
+    :param memory_bytes: Range of declared main memory
+    :param usage_ratio: Range of the fraction of declared memory actually used
+    :param gpu_ratio: Fraction of tasks requesting any GPU
+    :param gpu_memory_bytes: Range of declared GPU memory
+    :param init_delay_s: Startup time of tasks
+    :rtype: List[WorkloadTask]
+    """
+    rng = random.Random(seed)
+
+    def log_uniform(low: int, high: int) -> int:
+        return int(math.exp(rng.uniform(math.log(low), math.log(high))))
+
+    workload = []
+    submit_s = 0.0
+    for _ in range(count):
+        submit_s += rng.expovariate(1 / interval_s)
+        duration = rng.expovariate(1 / duration_s)
+        ratio = rng.uniform(*usage_ratio)
+
+        usage = TaskResourceUsage(memory_bytes=log_uniform(*memory_bytes))
+        gpu_usage_bytes = None
+        if rng.random() < gpu_ratio:
+            declared = log_uniform(*gpu_memory_bytes)
+            usage.gpu_memory_bytes = {"any": declared}
+            gpu_usage_bytes = int(declared * ratio)
+
+        workload.append(
+            WorkloadTask(
+                submit_s=submit_s,
+                created_by=f"user{rng.randrange(users)}",
+                priority=rng.choices(list(TaskPriority), weights=[2, 6, 2])[0],
+                usage=usage,
+                init_delay_s=init_delay_s,
+                expected_runtime_s=math.ceil(duration * rng.uniform(1, 1.5)),
+                duration_s=duration,
+                memory_bytes=int((usage.memory_bytes or 0) * ratio),
+                gpu_memory_bytes=gpu_usage_bytes,
+            )
+        )
+    return workload
+
+
+class Machine(NamedTuple):
+    """
+    Resources of the simulated machine
+    """
+
+    memory_bytes: int
+    # Memory of each GPU id
+    gpu_memory_bytes: Dict[str, int] = {}
+    cpu_count: int = 0
+
+
+class VirtualClock(Clock):
+    """
+    Clock that only moves when the simulation advances it
+
+    :param epoch_ms: Timestamp at the start of the simulation
+    """
+
+    def __init__(self, epoch_ms: int = 0) -> None:
+        self.epoch_ms = epoch_ms
+        # Seconds since the start of the simulation
+        self.now_s = 0.0
+
+    def monotonic(self) -> float:
+        return self.now_s
+
+    def timestamp_ms(self) -> int:
+        return self.epoch_ms + int(self.now_s * 1000)
+
+
+class Simulation:
+    """
+    Replays a workload through the scheduler, one event at a time.
+
+    Events are task arrivals and finishes, usage samples of started tasks, system state probes,
+    and scheduling passes. Like the daemon, the scheduler runs a pass whenever a task arrives or finishes,
+    when the system state changes, when a started task ramps up, and when a promise made to a started
+    task expires. The system state is probed ``system_query_min_interval`` seconds after
+    tasks start or finish, and started tasks are sampled every ``ramp_up_sample_interval`` seconds
+    until they have ramped up.
+
+    :param workload: Tasks to submit, in submission order
+    :param machine: Resources of the simulated machine
+    :param settings: Daemon settings holding the scheduling policies
+    """
+
+    def __init__(
+        self,
+        workload: List[WorkloadTask],
+        machine: Machine,
+        settings: Optional[TaskflowSettings] = None,
+    ) -> None:
+        self.workload = workload
+        self.machine = machine
+        self.settings = settings if settings is not None else TaskflowSettings()
+
+        self.clock = VirtualClock()
+        self.state = SystemState(gpu_available=False)
+        self.db = InMemoryDb()
+        self.scheduler = TaskScheduler.from_settings(
+            self.settings, state=self.state, db=self.db, clock=self.clock
+        )
+
+        # (time, sequence number, kind, payload)
+        self.__events: List[Tuple[float, int, int, Any]] = []
+        self.__seq = 0
+        # Number of queued events that are not scheduling passes
+        self.__active_events = 0
+        self.__next_pass_at: Optional[float] = None
+        self.__probe_at: Optional[float] = None
+
+        # Task id -> (workload index, task, start future)
+        self.__pending: Dict[str, Tuple[int, Task, asyncio.Future]] = {}
+        # Task id -> (workload index, task, main memory used, memory used on each GPU)
+        self.__running: Dict[str, Tuple[int, Task, int, Dict[str, int]]] = {}
+        self.__memory_used = 0
+        self.__memory_declared = 0
+        self.__gpu_memory_used: Dict[str, int] = {}
+
+        self.__started_at: Dict[int, float] = {}
+        self.__finished_at: Dict[int, float] = {}
+        self.__rejected = 0
+        self.__passes = 0
+
+        # Time integrals of the usage, from the first arrival on
+        self.__updated_at = 0.0
+        self.__memory_used_s = 0.0
+        self.__memory_declared_s = 0.0
+        self.__gpu_memory_used_s = 0.0
+        self.__running_s = 0.0
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Runs the simulation until every task has finished, or until the remaining tasks can never start
+
+        :return: The report of the simulation (see :meth:`report`)
+        :rtype: Dict[str, Any]
+        """
+        wall_started_at = time.monotonic()
+        await self.db.init()
+        self.state.publish(self.__probe())
+
+        for i, w in enumerate(self.workload):
+            self.__push(w.submit_s, ARRIVAL, i)
+        if len(self.workload) > 0:
+            self.__updated_at = self.workload[0].submit_s
+
+        while len(self.__events) > 0:
+            now = self.__events[0][0]
+            self.__advance(now)
+
+            needs_pass = False
+            while len(self.__events) > 0 and self.__events[0][0] == now:
+                _, _, kind, payload = heapq.heappop(self.__events)
+                if kind != PASS:
+                    self.__active_events -= 1
+                needs_pass = await self.__handle(kind, payload) or needs_pass
+
+            if not needs_pass:
+                continue
+
+            interval_s, started_count = await self.__run_pass()
+            if self.__active_events < 1 and started_count < 1:
+                # Nothing will change anymore
+                break
+
+            # The daemon's fallback timer only catches missed events, which cannot happen here
+            if interval_s >= self.scheduler.DEFAULT_LOOP_INTERVAL_S:
+                continue
+            if self.__next_pass_at is None or self.__next_pass_at <= now:
+                self.__next_pass_at = now + interval_s
+                self.__push(self.__next_pass_at, PASS, None)
+            elif now + interval_s < self.__next_pass_at:
+                self.__next_pass_at = now + interval_s
+                self.__push(self.__next_pass_at, PASS, None)
+
+        await self.db.shutdown()
+        return self.report(time.monotonic() - wall_started_at)
+
+    def report(self, wall_s: float = 0) -> Dict[str, Any]:
+        """
+        Summarizes the simulation
+
+        :param wall_s: Real time taken by the simulation
+        :rtype: Dict[str, Any]
+        """
+        first_submit_s = self.workload[0].submit_s if len(self.workload) > 0 else 0
+        last_finish_s = max(self.__finished_at.values(), default=first_submit_s)
+        makespan_s = last_finish_s - first_submit_s
+        gpu_total = sum(self.machine.gpu_memory_bytes.values())
+
+        def utilization(used_s: float, total: int) -> float:
+            if makespan_s <= 0 or total <= 0:
+                return 0
+            return used_s / (total * makespan_s)
+
+        waits: Dict[str, List[float]] = {p.name: [] for p in TaskPriority}
+        for i, started_at in self.__started_at.items():
+            w = self.workload[i]
+            waits[w.priority.name].append(started_at - w.submit_s)
+
+        wait_report = {}
+        for priority, values in waits.items():
+            wait_report[priority] = dict(
+                zip(
+                    ["count", "mean"] + [f"p{p}" for p in WAIT_PERCENTILES],
+                    [len(values), sum(values) / max(1, len(values))]
+                    + percentiles(values, WAIT_PERCENTILES),
+                )
+            )
+
+        return {
+            "tasks": len(self.workload),
+            "started": len(self.__started_at),
+            "finished": len(self.__finished_at),
+            "rejected": self.__rejected,
+            "never_started": len(self.__pending),
+            "makespan_s": makespan_s,
+            "memory_utilization": utilization(
+                self.__memory_used_s, self.machine.memory_bytes
+            ),
+            "memory_allocation": utilization(
+                self.__memory_declared_s, self.machine.memory_bytes
+            ),
+            "gpu_memory_utilization": utilization(self.__gpu_memory_used_s, gpu_total),
+            "mean_running_tasks": self.__running_s / makespan_s
+            if makespan_s > 0
+            else 0,
+            "wait_s": wait_report,
+            "scheduler_passes": self.__passes,
+            "wall_s": wall_s,
+        }
+
+    async def __handle(self, kind: int, payload: Any) -> bool:
+        # Returns True if the event would wake the scheduler up
+        now = self.clock.now_s
+
+        if kind == ARRIVAL:
+            return await self.__submit(payload)
+
+        if kind == FINISH:
+            i, task, memory_bytes, gpu_memory_bytes = self.__running.pop(payload)
+            self.__use(task, memory_bytes, gpu_memory_bytes, -1)
+            self.__finished_at[i] = now
+            await self.db.delete_task(task)
+            self.scheduler.task_finished(task)
+            self.__schedule_probe()
+            return True
+
+        if kind == SAMPLE:
+            task_id, samples_count = payload
+            running = self.__running.get(task_id)
+            if running is None:
+                return False
+
+            ramping_count = len(self.scheduler.ledger)
+            self.scheduler.task_sampled(task_id, running[2], running[3])
+            if samples_count < PLATEAU_SAMPLES:
+                self.__push(
+                    now + self.settings.ramp_up_sample_interval,
+                    SAMPLE,
+                    (task_id, samples_count + 1),
+                )
+            return len(self.scheduler.ledger) < ramping_count
+
+        if kind == PROBE:
+            self.__probe_at = None
+            return self.state.publish(
+                self.__probe(), self.settings.state_change_threshold_bytes
+            )
+
+        # Stale passes were superseded by an earlier one
+        return now == self.__next_pass_at
+
+    async def __submit(self, i: int) -> bool:
+        w = self.workload[i]
+        task = Task(
+            id=str(i),
+            cmd=f"task {i}",
+            created_at=self.clock.timestamp_ms(),
+            created_by=w.created_by,
+            priority=w.priority,
+            usage=w.usage.copy(deep=True),
+            init_delay_s=w.init_delay_s,
+            expected_runtime_s=w.expected_runtime_s,
+        )
+
+        if len(self.scheduler.unavailable_resources(task.usage)) > 0:
+            self.__rejected += 1
+            return False
+
+        await self.db.insert_task(task)
+        self.scheduler.submit(task)
+        self.__pending[task.id] = (i, task, self.scheduler.wait_for_start(task))
+        return True
+
+    async def __run_pass(self) -> Tuple[float, int]:
+        now = self.clock.now_s
+        interval_s = self.scheduler.run_pass()
+        self.__passes += 1
+
+        started = [
+            (i, task) for i, task, future in self.__pending.values() if future.done()
+        ]
+        for i, task in started:
+            self.__pending.pop(task.id)
+            task.is_running = True
+            await self.db.update_task(task)
+
+            w = self.workload[i]
+            memory_bytes = (
+                w.memory_bytes
+                if w.memory_bytes is not None
+                else task.usage.memory_bytes or 0
+            )
+            gpu_memory_bytes = {
+                gpu_id: w.gpu_memory_bytes if w.gpu_memory_bytes is not None else v
+                for gpu_id, v in (task.gpu_assignment or {}).items()
+            }
+            self.__running[task.id] = (i, task, memory_bytes, gpu_memory_bytes)
+            self.__use(task, memory_bytes, gpu_memory_bytes, 1)
+            self.__started_at[i] = now
+
+            self.__push(now + w.duration_s, FINISH, task.id)
+            if self.settings.ramp_up_sample_interval > 0:
+                self.__push(
+                    now + self.settings.ramp_up_sample_interval,
+                    SAMPLE,
+                    (task.id, 0),
+                )
+
+        if len(started) > 0:
+            self.__schedule_probe()
+        return interval_s, len(started)
+
+    def __push(self, at: float, kind: int, payload: Any):
+        self.__seq += 1
+        if kind != PASS:
+            self.__active_events += 1
+        heapq.heappush(self.__events, (at, self.__seq, kind, payload))
+
+    def __schedule_probe(self):
+        if self.__probe_at is None:
+            self.__probe_at = self.clock.now_s + self.settings.system_query_min_interval
+            self.__push(self.__probe_at, PROBE, None)
+
+    def __probe(self) -> SystemStateSnapshot:
+        return SystemStateSnapshot(
+            memory_free_bytes=max(0, self.machine.memory_bytes - self.__memory_used),
+            memory_total_bytes=self.machine.memory_bytes,
+            gpu_memory_free_bytes=MappingProxyType(
+                {
+                    gpu_id: max(0, total - self.__gpu_memory_used.get(gpu_id, 0))
+                    for gpu_id, total in self.machine.gpu_memory_bytes.items()
+                }
+            ),
+            gpu_memory_total_bytes=MappingProxyType(
+                dict(self.machine.gpu_memory_bytes)
+            ),
+            cpu_load_percent=MappingProxyType(
+                {i: 0.0 for i in range(self.machine.cpu_count)}
+            ),
+        )
+
+    def __use(
+        self,
+        task: Task,
+        memory_bytes: int,
+        gpu_memory_bytes: Dict[str, int],
+        sign: int,
+    ):
+        # Adds (sign=1) or removes (sign=-1) the usage of a task
+        self.__memory_used += sign * memory_bytes
+        self.__memory_declared += sign * (task.usage.memory_bytes or 0)
+        for gpu_id, usage_bytes in gpu_memory_bytes.items():
+            self.__gpu_memory_used[gpu_id] = (
+                self.__gpu_memory_used.get(gpu_id, 0) + sign * usage_bytes
+            )
+
+    def __advance(self, now: float):
+        elapsed_s = now - self.__updated_at
+        if elapsed_s > 0:
+            self.__memory_used_s += self.__memory_used * elapsed_s
+            self.__memory_declared_s += self.__memory_declared * elapsed_s
+            self.__gpu_memory_used_s += sum(self.__gpu_memory_used.values()) * elapsed_s
+            self.__running_s += len(self.__running) * elapsed_s
+            self.__updated_at = now
+        self.clock.now_s = now
+
+
+def print_report(report: Dict[str, Any]):
+    def format_s(value: float) -> str:
+        if value >= 3600:
+            return f"{value / 3600:.1f}h"
+        if value >= 60:
+            return f"{value / 60:.1f}m"
+        return f"{value:.1f}s"
+
+    rows = [
+        ["Tasks", report["tasks"]],
+        ["Started / finished", f"{report['started']} / {report['finished']}"],
+        [
+            "Rejected / never started",
+            f"{report['rejected']} / {report['never_started']}",
+        ],
+        ["Makespan", format_s(report["makespan_s"])],
+        ["Memory utilization", f"{report['memory_utilization'] * 100:.1f}%"],
+        ["Memory allocation", f"{report['memory_allocation'] * 100:.1f}%"],
+        ["GPU memory utilization", f"{report['gpu_memory_utilization'] * 100:.1f}%"],
+        ["Mean running tasks", f"{report['mean_running_tasks']:.1f}"],
+        ["Scheduler passes", report["scheduler_passes"]],
+        ["Simulated in", f"{report['wall_s']:.1f}s"],
+    ]
+    typer.echo(tabulate.tabulate(rows, tablefmt="plain"))
+    typer.echo()
+
+    headers = ["Priority", "Tasks", "Mean wait"] + [
+        f"p{p} wait" for p in WAIT_PERCENTILES
+    ]
+    wait_rows = []
+    for priority, waits in report["wait_s"].items():
+        wait_rows.append(
+            [priority, waits["count"], format_s(waits["mean"])]
+            + [format_s(waits[f"p{p}"]) for p in WAIT_PERCENTILES]
+        )
+    typer.echo(tabulate.tabulate(wait_rows, headers=headers))
+
+
+def simulate(
+    workload_path: Optional[str] = typer.Option(
+        None, "--workload", help="JSON lines file of tasks to replay"
+    ),
+    archive_dir: Optional[str] = typer.Option(
+        None, "--archive", help="Replay the tasks recorded in this task archive"
+    ),
+    generate: int = typer.Option(
+        1000, help="Number of tasks to generate, if no workload is given"
+    ),
+    seed: int = typer.Option(0, help="Random seed of the generated workload"),
+    users: int = typer.Option(10, help="Number of users of the generated workload"),
+    interval: float = typer.Option(
+        60, help="Mean time between generated arrivals, in seconds"
+    ),
+    duration: float = typer.Option(
+        1800, help="Mean duration of generated tasks, in seconds"
+    ),
+    task_memory: str = typer.Option(
+        "1G-16G", help="Range of declared memory of generated tasks"
+    ),
+    usage_ratio: str = typer.Option(
+        "0.5-1", help="Range of the fraction of declared memory actually used"
+    ),
+    gpu_ratio: float = typer.Option(
+        0, help="Fraction of generated tasks requesting a GPU"
+    ),
+    task_gpu_memory: str = typer.Option(
+        "2G-20G", help="Range of declared GPU memory of generated tasks"
+    ),
+    save_path: Optional[str] = typer.Option(
+        None, "--save", help="Write the workload to this JSON lines file"
+    ),
+    memory: str = typer.Option("256G", help="Main memory of the simulated machine"),
+    gpus: int = typer.Option(0, help="Number of GPUs of the simulated machine"),
+    gpu_memory: str = typer.Option("24G", help="Memory of each GPU"),
+    cpus: int = typer.Option(64, help="Number of CPU cores of the simulated machine"),
+    settings_path: Optional[str] = typer.Option(
+        None, "--settings", help="Daemon settings holding the scheduling policies"
+    ),
+    output: Optional[str] = typer.Option(
+        None, "-o", help="Also write the report to this JSON file"
+    ),
+):
+    """
+    Simulates the scheduling of a workload on a fake machine
+    """
+    logger.disable("taskflow")
+    loop = asyncio.get_event_loop()
+
+    settings = TaskflowSettings()
+    if settings_path is not None:
+        with open(settings_path, "rt") as f:
+            settings = TaskflowSettings.parse_obj(yaml.full_load(f) or {})
+
+    if workload_path is not None:
+        with open(workload_path, "rt") as f:
+            workload = load_workload(f)
+    elif archive_dir is not None:
+        workload = loop.run_until_complete(load_archive_workload(archive_dir))
+    else:
+        memory_range = [convert_byte_any(v) for v in task_memory.split("-", 1)]
+        gpu_memory_range = [convert_byte_any(v) for v in task_gpu_memory.split("-", 1)]
+        workload = generate_workload(
+            generate,
+            seed=seed,
+            users=users,
+            interval_s=interval,
+            duration_s=duration,
+            memory_bytes=(memory_range[0], memory_range[-1]),
+            usage_ratio=parse_range(usage_ratio),
+            gpu_ratio=gpu_ratio,
+            gpu_memory_bytes=(gpu_memory_range[0], gpu_memory_range[-1]),
+            init_delay_s=settings.default_init_delay,
+        )
+
+    if save_path is not None:
+        with open(save_path, "wt") as f:
+            save_workload(workload, f)
+
+    gpu_memory_bytes = convert_byte_any(gpu_memory)
+    machine = Machine(
+        memory_bytes=convert_byte_any(memory),
+        gpu_memory_bytes={str(i): gpu_memory_bytes for i in range(gpus)},
+        cpu_count=cpus,
+    )
+
+    report = loop.run_until_complete(Simulation(workload, machine, settings).run())
+    print_report(report)
+    if output is not None:
+        with open(output, "wt") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    typer.run(simulate)
@@ -0,0 +1,48 @@
+import math
+import resource
+
+from typing import List, Tuple
+
+
+def raise_open_files_limit() -> int:
+    """
+    Raises the soft limit on open files to the hard limit, since every websocket uses a file descriptor
+
+    :return: The new limit
+    :rtype: int
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def parse_range(value: str) -> Tuple[float, float]:
+    """
+    Parses a range of numbers with format <min>-<max>, or a single number
+
+    :type value: str
+    :raises ValueError: If the value is not a number or a range
+    :rtype: Tuple[float, float]
+    """
+    low, sep, high = value.partition("-")
+    if not sep:
+        return float(value), float(value)
+    if float(low) > float(high):
+        raise ValueError(f"Invalid range: {value}")
+    return float(low), float(high)
+
+
+def percentiles(values: List[float], ps: List[float]) -> List[float]:
+    """
+    Nearest-rank percentiles of a list of values
+
+    :param ps: Percentiles, between 0 and 100
+    :return: The value for each percentile, or 0 if the list is empty
+    :rtype: List[float]
+    """
+    ordered = sorted(values)
+    if len(ordered) < 1:
+        return [0.0 for _ in ps]
+    ranks = [max(1, math.ceil(p / 100 * len(ordered))) for p in ps]
+    return [ordered[min(rank, len(ordered)) - 1] for rank in ranks]
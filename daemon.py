@@ -9,17 +9,28 @@ import os
 import uvloop
 
 from loguru import logger
+from typing import Optional
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from taskflow.endpoint import bind_app
 from taskflow import di
-from taskflow.model.state import SystemStateUpdateCoroutine
+from taskflow.metrics import LoopLagMonitor
+from taskflow.model.state import SystemState, SystemStateUpdateCoroutine
 
 
-def main():
+def main(
+    settings_path: str = "/etc/taskflow/settings.yml",
+    state: Optional[SystemState] = None,
+):
+    """
+    Runs the daemon until interrupted
+
+    :param settings_path: Path of the settings file
+    :param state: State to schedule tasks against instead of the local system's
+    """
     uvloop.install()
-    di.init()
+    di.init(settings_path, system_state=state)
     settings = di.settings()
 
     is_debug = "TASKFLOW_DEBUG" in os.environ.keys()
@@ -41,21 +52,42 @@ def main():
     )
 
     state_coro = SystemStateUpdateCoroutine(
-        state=di.state(), interval_s=settings.system_query_interval
+        state=di.state(),
+        interval_s=settings.system_query_interval,
+        on_change=di.scheduler().notify,
+        change_threshold_bytes=settings.state_change_threshold_bytes,
+        min_interval_s=settings.system_query_min_interval,
+        demand=di.scheduler().needs_fresh_state,
     )
+    di.scheduler().on_state_demand = state_coro.wake
+    lag_monitor = LoopLagMonitor()
 
     # Run everything in 1 thread
     # Wait for interrupt signal
     try:
         loop = asyncio.get_event_loop()
 
-        future = asyncio.gather(di.scheduler().loop(), state_coro.run(), api_coro.run())
+        future = asyncio.gather(
+            di.scheduler().loop(),
+            di.hub().run(),
+            di.archive().run(),
+            di.sampler().run(),
+            state_coro.run(),
+            lag_monitor.run(),
+            di.tracer().run(),
+            api_coro.run(),
+        )
         loop.run_until_complete(future)
     except KeyboardInterrupt:
         logger.warning("Stopping daemon")
 
         di.scheduler().stop()
+        di.hub().stop()
+        di.archive().stop()
+        di.sampler().stop()
         state_coro.stop()
+        lag_monitor.stop()
+        di.tracer().stop()
         api_coro.stop()
 
 
@@ -85,10 +117,16 @@ def setup_api(debug=False) -> FastAPI:
     @app.on_event("startup")
     async def on_startup():
         await di.db().init()
+        await di.archive().init()
+        await di.estimator().init()
+        await di.scheduler().restore()
 
     @app.on_event("shutdown")
     async def on_shutdown():
         await di.db().shutdown()
+        await di.archive().shutdown()
+        await di.estimator().shutdown()
+        await di.tracer().shutdown()
 
     return app
 
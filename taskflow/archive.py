@@ -0,0 +1,570 @@
+import asyncio
+import json
+import os
+import re
+import struct
+
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple
+from loguru import logger
+
+from taskflow.db.cursor import decode_cursor, encode_cursor
+from taskflow.model.history import TaskRecord, TaskRecordList
+from taskflow.model.task import Task, TaskPriority
+from taskflow.utils import get_timestamp_ms
+
+# seq, id, created_at, started_at, finished_at, exit_code, priority, flags,
+# user number (line of created_by in the users file), memory_bytes, data offset, data length
+RECORD = struct.Struct("<Q16sqqqiHHIqQI")
+RecordFields = Tuple[int, bytes, int, int, int, int, int, int, int, int, int, int]
+
+FLAG_HAS_STARTED = 1
+FLAG_HAS_EXIT_CODE = 2
+FLAG_HAS_MEMORY = 4
+
+FILE_PATTERN = re.compile(r"^tasks-(\d+)\.(idx|dat|usr)(\.tmp)?$")
+
+
+class TaskArchive:
+    """
+    Append-only archive of finished tasks, kept apart from the live task database.
+
+    Each task is stored as a fixed-width record in an index file, holding every field used
+    to filter searches, and pointing to its variable-length fields in a data file.
+    Records refer to their user by number, each user name being a JSON line of a users file.
+    The index and the users are loaded in memory on startup, without reading the data file,
+    and kept up to date as records are appended. Lookups by id and searches filtered by user only are served
+    from in-memory indexes, as are searches for failed tasks, and only read the data file
+    for the returned records. Other filters scan the in-memory index.
+    All file accesses happen on a dedicated thread, so the event loop never waits on disk.
+
+    :param path: Directory holding the archive files, or None to disable the archive
+    :param retention_days: Number of days during which records are kept. Older records are
+        removed by the compactor (see :meth:`run`). Records are kept forever if 0 or less
+
+    Compaction writes a new generation of both files, and switches to it by renaming its index file
+    into place, so an interrupted compaction never leaves the archive half-written.
+    """
+
+    COMPACT_INTERVAL_S = 3600
+
+    def __init__(self, path: Optional[str], retention_days: float = 30) -> None:
+        self.path = path
+        self.retention_days = retention_days
+
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__generation = 0
+        self.__next_seq = 1
+        self.__index_file: Optional[BinaryIO] = None
+        self.__data_file: Optional[BinaryIO] = None
+        self.__users_file: Optional[BinaryIO] = None
+        self.__stop_signal = asyncio.Event()
+
+        # Index records in seq order, with their seq and user
+        self.__records: List[RecordFields] = []
+        self.__seqs: List[int] = []
+        self.__users: List[str] = []
+        # User -> positions of their records
+        self.__by_user: Dict[str, List[int]] = {}
+        # Positions of records that exited with a non-zero code
+        self.__failed: List[int] = []
+        # Raw task id -> position of its latest record
+        self.__by_id: Dict[bytes, int] = {}
+        # Users by number, and the number of each user
+        self.__user_names: List[str] = []
+        self.__user_numbers: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the archive is open for reading and writing
+        """
+        return self.__executor is not None
+
+    async def init(self):
+        if self.path is None:
+            return
+
+        # A single worker thread owns the files, which also keeps writes ordered
+        self.__executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="taskflow-archive"
+        )
+        loop = asyncio.get_event_loop()
+        try:
+            count = await loop.run_in_executor(self.__executor, self.__open)
+        except OSError:
+            logger.exception(
+                "Cannot open task archive, finished tasks will not be kept"
+            )
+            self.__executor.shutdown()
+            self.__executor = None
+            return
+        logger.info(f"Opened task archive with {count} records at {self.path}")
+
+        await self.compact()
+
+    async def shutdown(self):
+        if self.__executor is None:
+            return
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.__executor, self.__close)
+        self.__executor.shutdown()
+        self.__executor = None
+
+    async def run(self):
+        """
+        Runs the compaction loop, removing expired records periodically
+        """
+        self.__stop_signal.clear()
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self.__stop_signal.wait(), self.COMPACT_INTERVAL_S
+                )
+                break
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.compact()
+            except Exception:
+                logger.exception("Failed to compact task archive")
+
+    def stop(self):
+        """
+        Stops the compaction loop
+        """
+        self.__stop_signal.set()
+
+    async def append(
+        self, task: Task, exit_code: Optional[int], finished_at: Optional[int] = None
+    ):
+        """
+        Archives a finished task. Failures are logged, since archiving is best-effort.
+
+        :type task: Task
+        :param exit_code: Exit code of the task's process, or None if unknown
+        :param finished_at: Timestamp in ms, defaults to now
+        """
+        if self.__executor is None:
+            return
+
+        # Serialize on the loop thread, so the worker never sees a task being modified
+        flags = 0
+        if task.started_at is not None:
+            flags |= FLAG_HAS_STARTED
+        if exit_code is not None:
+            flags |= FLAG_HAS_EXIT_CODE
+        if task.usage.memory_bytes is not None:
+            flags |= FLAG_HAS_MEMORY
+
+        data = json.dumps(
+            {
+                "cmd": task.cmd,
+                "created_by": task.created_by,
+                "cwd": task.cwd,
+                "gpu_ids": list((task.gpu_assignment or {}).keys()),
+            }
+        ).encode("utf-8")
+        fields = (
+            task.id.encode("utf-8")[:16].ljust(16, b"\0"),
+            task.created_at,
+            task.started_at or 0,
+            finished_at or get_timestamp_ms(),
+            exit_code or 0,
+            int(task.priority),
+            flags,
+        )
+        memory_bytes = task.usage.memory_bytes or 0
+
+        try:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(
+                self.__executor,
+                self.__append,
+                fields,
+                task.created_by,
+                memory_bytes,
+                data,
+            )
+        except Exception:
+            logger.exception(f"Failed to archive task {task.id}")
+
+    async def search(
+        self,
+        created_by: Optional[str] = None,
+        failed: Optional[bool] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        size: int = 20,
+        cursor: Optional[str] = None,
+    ) -> TaskRecordList:
+        """
+        Search archived tasks, most recently finished first
+
+        :type created_by: Optional[str], optional
+        :param failed: Only return tasks that exited with a non-zero code if True,
+            or with a zero code if False. Tasks without an exit code only match None
+        :param since: Only return tasks finished at or after this timestamp in ms
+        :param until: Only return tasks finished before this timestamp in ms
+        :param size: Number of records to return, defaults to 20
+        :param cursor: Opaque cursor from the next_cursor field of a previous result
+        :raises ValueError: If the cursor is malformed
+        :rtype: TaskRecordList
+        """
+        before_seq = None
+        if cursor is not None:
+            before_seq = decode_cursor(cursor)[0]
+
+        if self.__executor is None:
+            return TaskRecordList(records=[], total=0)
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.__executor,
+            self.__search,
+            created_by,
+            failed,
+            since,
+            until,
+            size,
+            before_seq,
+        )
+
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        """
+        Get the latest archived record of a task
+
+        :type task_id: str
+        :rtype: Optional[TaskRecord]
+        """
+        if self.__executor is None:
+            return None
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.__executor, self.__get, task_id)
+
+    async def compact(self) -> int:
+        """
+        Removes records older than the retention period
+
+        :return: Number of removed records
+        :rtype: int
+        """
+        if self.__executor is None or self.retention_days <= 0:
+            return 0
+
+        before = get_timestamp_ms() - int(self.retention_days * 24 * 3600 * 1000)
+        loop = asyncio.get_event_loop()
+        removed = await loop.run_in_executor(self.__executor, self.__compact, before)
+        if removed > 0:
+            logger.info(f"Removed {removed} expired records from task archive")
+        return removed
+
+    def __file_path(self, generation: int, ext: str) -> str:
+        assert self.path is not None
+        return os.path.join(self.path, f"tasks-{generation}.{ext}")
+
+    def __open(self) -> int:
+        assert self.path is not None
+        os.makedirs(self.path, exist_ok=True)
+
+        # The latest generation with an index file is the current one
+        generations = set()
+        for name in os.listdir(self.path):
+            match = FILE_PATTERN.match(name)
+            if match is not None and match.group(2) == "idx" and not match.group(3):
+                generations.add(int(match.group(1)))
+        self.__generation = max(generations, default=0)
+
+        # Leftovers of previous generations or of an interrupted compaction
+        for name in os.listdir(self.path):
+            match = FILE_PATTERN.match(name)
+            if match is not None and int(match.group(1)) != self.__generation:
+                os.remove(os.path.join(self.path, name))
+
+        index_path = self.__file_path(self.__generation, "idx")
+        users_path = self.__file_path(self.__generation, "usr")
+        self.__index_file = open(index_path, "ab")
+        self.__data_file = open(self.__file_path(self.__generation, "dat"), "ab")
+        self.__users_file = open(users_path, "ab")
+
+        # Drop a record or a user that was partially written when the daemon stopped
+        size = self.__index_file.tell()
+        if size % RECORD.size != 0:
+            size -= size % RECORD.size
+            self.__index_file.truncate(size)
+        with open(users_path, "rb") as f:
+            lines = f.read().split(b"\n")
+        if len(lines[-1]) > 0:
+            self.__users_file.truncate(self.__users_file.tell() - len(lines[-1]))
+
+        self.__user_names = [json.loads(line) for line in lines[:-1]]
+        self.__user_numbers = {name: i for i, name in enumerate(self.__user_names)}
+        with open(index_path, "rb") as f:
+            index = f.read(size)
+        self.__reset_index()
+        for fields in RECORD.iter_unpack(index):
+            self.__index_record(fields)
+
+        self.__next_seq = self.__seqs[-1] + 1 if len(self.__seqs) > 0 else 1
+        return len(self.__records)
+
+    def __close(self):
+        if self.__index_file is not None:
+            self.__index_file.close()
+            self.__index_file = None
+        if self.__data_file is not None:
+            self.__data_file.close()
+            self.__data_file = None
+        if self.__users_file is not None:
+            self.__users_file.close()
+            self.__users_file = None
+
+    def __reset_index(self):
+        self.__records = []
+        self.__seqs = []
+        self.__users = []
+        self.__by_user = {}
+        self.__failed = []
+        self.__by_id = {}
+
+    def __index_record(self, fields: RecordFields):
+        created_by = self.__user_names[fields[8]]
+        position = len(self.__records)
+        self.__records.append(fields)
+        self.__seqs.append(fields[0])
+        self.__users.append(created_by)
+        self.__by_user.setdefault(created_by, []).append(position)
+        if fields[7] & FLAG_HAS_EXIT_CODE and fields[5] != 0:
+            self.__failed.append(position)
+        self.__by_id[fields[1]] = position
+
+    def __append(self, fields: Tuple, created_by: str, memory_bytes: int, data: bytes):
+        assert self.__index_file is not None and self.__data_file is not None
+        assert self.__users_file is not None
+
+        # Data and users go first, so an index record never points past the end of their files
+        user_number = self.__user_numbers.get(created_by)
+        if user_number is None:
+            self.__users_file.write(json.dumps(created_by).encode("utf-8") + b"\n")
+            self.__users_file.flush()
+            user_number = len(self.__user_names)
+            self.__user_names.append(created_by)
+            self.__user_numbers[created_by] = user_number
+
+        offset = self.__data_file.tell()
+        self.__data_file.write(data)
+        self.__data_file.flush()
+
+        record = (
+            self.__next_seq,
+            *fields,
+            user_number,
+            memory_bytes,
+            offset,
+            len(data),
+        )
+        self.__index_file.write(RECORD.pack(*record))
+        self.__index_file.flush()
+        self.__index_record(record)  # type: ignore
+        self.__next_seq += 1
+
+    def __search(
+        self,
+        created_by: Optional[str],
+        failed: Optional[bool],
+        since: Optional[int],
+        until: Optional[int],
+        size: int,
+        before_seq: Optional[int],
+    ) -> TaskRecordList:
+        # Walk the smallest index of the search's filters
+        indexes: List[Sequence[int]] = [range(len(self.__records))]
+        if created_by is not None:
+            indexes.append(self.__by_user.get(created_by, []))
+        if failed:
+            indexes.append(self.__failed)
+        positions = min(indexes, key=len)
+        exact = (
+            len(indexes) <= 2
+            and failed is not False
+            and since is None
+            and until is None
+        )
+
+        # Positions before the cursor, since seqs grow with positions
+        end = len(positions)
+        if before_seq is not None:
+            end = bisect_left(positions, bisect_left(self.__seqs, before_seq))
+
+        if exact:
+            # Every position matches
+            total = len(positions)
+            page = [
+                self.__records[p] for p in reversed(positions[max(0, end - size) : end])
+            ]
+            has_more = end > size
+        else:
+            total = 0
+            page = []
+            has_more = False
+            for i in range(len(positions) - 1, -1, -1):
+                position = positions[i]
+                if created_by is not None and self.__users[position] != created_by:
+                    continue
+                fields = self.__records[position]
+                if not self.__matches(fields, failed, since, until):
+                    continue
+
+                total += 1
+                if i >= end:
+                    continue
+                if len(page) < size:
+                    page.append(fields)
+                else:
+                    has_more = True
+
+        next_cursor = None
+        if has_more and len(page) > 0:
+            last = page[-1]
+            next_cursor = encode_cursor((last[0], self.__decode_id(last[1])))
+
+        return TaskRecordList(
+            records=self.__load(page), total=total, next_cursor=next_cursor
+        )
+
+    @staticmethod
+    def __matches(
+        fields: RecordFields,
+        failed: Optional[bool],
+        since: Optional[int],
+        until: Optional[int],
+    ) -> bool:
+        if since is not None and fields[4] < since:
+            return False
+        if until is not None and fields[4] >= until:
+            return False
+        if failed is not None:
+            if not fields[7] & FLAG_HAS_EXIT_CODE:
+                return False
+            if failed != (fields[5] != 0):
+                return False
+        return True
+
+    def __get(self, task_id: str) -> Optional[TaskRecord]:
+        raw_id = task_id.encode("utf-8")[:16].ljust(16, b"\0")
+        position = self.__by_id.get(raw_id)
+        if position is None:
+            return None
+        return self.__load([self.__records[position]])[0]
+
+    def __load(self, page: List[RecordFields]) -> List[TaskRecord]:
+        records: List[TaskRecord] = []
+        if len(page) < 1:
+            return records
+
+        with open(self.__file_path(self.__generation, "dat"), "rb") as f:
+            for fields in page:
+                (
+                    _,
+                    raw_id,
+                    created_at,
+                    started_at,
+                    finished_at,
+                    exit_code,
+                    priority,
+                    flags,
+                    _,
+                    memory_bytes,
+                    data_offset,
+                    data_length,
+                ) = fields
+
+                f.seek(data_offset)
+                data = json.loads(f.read(data_length).decode("utf-8"))
+                records.append(
+                    TaskRecord(
+                        id=self.__decode_id(raw_id),
+                        cmd=data["cmd"],
+                        created_by=data["created_by"],
+                        cwd=data.get("cwd"),
+                        priority=TaskPriority(priority),
+                        created_at=created_at,
+                        started_at=started_at if flags & FLAG_HAS_STARTED else None,
+                        finished_at=finished_at,
+                        exit_code=exit_code if flags & FLAG_HAS_EXIT_CODE else None,
+                        memory_bytes=memory_bytes if flags & FLAG_HAS_MEMORY else None,
+                        gpu_ids=data.get("gpu_ids", []),
+                    )
+                )
+        return records
+
+    def __compact(self, before: int) -> int:
+        count = len(self.__records)
+        kept = [
+            (fields, user)
+            for fields, user in zip(self.__records, self.__users)
+            if fields[4] >= before  # finished_at
+        ]
+        if len(kept) == count:
+            return 0
+
+        generation = self.__generation + 1
+        data_path = self.__file_path(generation, "dat")
+        index_path = self.__file_path(generation, "idx")
+        users_path = self.__file_path(generation, "usr")
+
+        # Users without records left are dropped, so users are numbered again
+        new_records: List[RecordFields] = []
+        user_names: List[str] = []
+        user_numbers: Dict[str, int] = {}
+        with open(self.__file_path(self.__generation, "dat"), "rb") as old_data, open(
+            data_path, "wb"
+        ) as new_data, open(users_path, "wb") as new_users, open(
+            index_path + ".tmp", "wb"
+        ) as new_index:
+            for fields, user in kept:
+                user_number = user_numbers.get(user)
+                if user_number is None:
+                    new_users.write(json.dumps(user).encode("utf-8") + b"\n")
+                    user_number = len(user_names)
+                    user_names.append(user)
+                    user_numbers[user] = user_number
+
+                old_data.seek(fields[10])
+                data = old_data.read(fields[11])
+                offset = new_data.tell()
+                new_data.write(data)
+                record = (*fields[:8], user_number, fields[9], offset, len(data))
+                new_index.write(RECORD.pack(*record))
+                new_records.append(record)  # type: ignore
+
+            for f in (new_data, new_users, new_index):
+                f.flush()
+                os.fsync(f.fileno())
+
+        # Switch generations, then drop the old one
+        os.replace(index_path + ".tmp", index_path)
+        self.__close()
+        old_generation = self.__generation
+        self.__generation = generation
+        self.__index_file = open(index_path, "ab")
+        self.__data_file = open(data_path, "ab")
+        self.__users_file = open(users_path, "ab")
+        for ext in ("idx", "dat", "usr"):
+            os.remove(self.__file_path(old_generation, ext))
+
+        self.__user_names = user_names
+        self.__user_numbers = user_numbers
+        self.__reset_index()
+        for fields in new_records:
+            self.__index_record(fields)
+
+        return count - len(kept)
+
+    @staticmethod
+    def __decode_id(raw_id: bytes) -> str:
+        return raw_id.rstrip(b"\0").decode("utf-8")
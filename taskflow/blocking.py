@@ -8,7 +8,7 @@ import json
 import asyncio
 
 from loguru import logger
-from typing import Tuple
+from typing import List, Optional, Tuple
 from datetime import timedelta
 from contextlib import contextmanager
 from websockets.exceptions import ConnectionClosed
@@ -17,8 +17,22 @@ from halo import Halo
 from threading import Event, Thread
 
 from taskflow.model.task import NewTask, Task, TaskPriority, TaskResourceUsage
-from taskflow.model.ws import ClientUpdateInfo, SocketMessage, MessageType
-from taskflow.utils import format_timedelta, get_timestamp_ms, format_timedelta
+from taskflow.model.ws import (
+    ClientUpdateInfo,
+    SocketMessage,
+    MessageType,
+    TaskFinishInfo,
+    TaskStartInfo,
+    TaskUsageReport,
+)
+from taskflow.utils import (
+    format_timedelta,
+    get_gpu_env,
+    get_online_cpu_ids,
+    get_timestamp_ms,
+    pin_to_cpus,
+    format_timedelta,
+)
 
 
 @contextmanager
@@ -28,9 +42,14 @@ def require(
     daemon_port=4305,
     priority: TaskPriority = TaskPriority.MEDIUM,
     init_delay_s: int = 5,
+    expected_runtime_s: Optional[int] = None,
 ):
     """
-    Blocks execution until the underlying task is triggered by the Taskflow daemon
+    Blocks execution until the underlying task is triggered by the Taskflow daemon.
+    If the daemon picks GPUs for the task, CUDA_VISIBLE_DEVICES is set accordingly,
+    so CUDA should not be initialized before entering this context.
+    If the task requests CPU cores, every thread of the current process is pinned to the
+    assigned cores until the context exits, then gets the cores of the calling thread back.
     """
     url = f"ws://{daemon_host}:{daemon_port}/tasks/start"
     new_task = NewTask(
@@ -39,13 +58,21 @@ def require(
         priority=priority,
         usage=usage,
         init_delay_s=init_delay_s,
+        expected_runtime_s=expected_runtime_s,
         pid=os.getpid(),
         cwd=os.getcwd(),
     )
 
-    task, ws = asyncio.get_event_loop().run_until_complete(
+    task, ws, start_info = asyncio.get_event_loop().run_until_complete(
         __wait_for_task_start(new_task, url)
     )
+    if len(start_info.gpu_ids) > 0:
+        os.environ.update(get_gpu_env(start_info.gpu_ids))
+
+    previous_cpu_ids: Optional[List[int]] = None
+    if len(start_info.cpu_ids) > 0:
+        previous_cpu_ids = get_online_cpu_ids()
+        pin_to_cpus(start_info.cpu_ids)
 
     stop_event = Event()
     keepalive_thread = Thread(
@@ -55,13 +82,18 @@ def require(
     )
     keepalive_thread.start()
 
+    # Reported as failed unless the block completes
+    exit_code = 1
     try:
         yield task
+        exit_code = 0
     finally:
         stop_event.set()
         keepalive_thread.join()
+        if previous_cpu_ids is not None:
+            pin_to_cpus(previous_cpu_ids)
 
-        asyncio.get_event_loop().run_until_complete(__send_shutdown(ws))
+        asyncio.get_event_loop().run_until_complete(__send_shutdown(ws, exit_code))
 
 
 def __ws_keepalive_loop(ws: WebSocketClientProtocol, stop_event: Event):
@@ -74,16 +106,45 @@ def __ws_keepalive_loop(ws: WebSocketClientProtocol, stop_event: Event):
         ev.run_until_complete(send_ping())
 
 
-async def __send_shutdown(ws: WebSocketClientProtocol):
+async def receive_usage_report(
+    ws: WebSocketClientProtocol, timeout_s: float = 2
+) -> Optional[TaskUsageReport]:
+    """
+    Waits for the report the daemon sends after TASK_FINISH, if the task declared much more
+    resources than it used
+
+    :param ws: Websocket of the task
+    :param timeout_s: Time to wait for each message
+    :return: The report, or None if the daemon closed the connection without sending one
+    :rtype: Optional[TaskUsageReport]
+    """
+    while True:
+        try:
+            data = await asyncio.wait_for(ws.recv(), timeout_s)
+        except (asyncio.TimeoutError, ConnectionClosed):
+            return None
+
+        message = SocketMessage.parse_obj(json.loads(data))
+        if message.type == MessageType.TASK_REPORT:
+            return TaskUsageReport.parse_obj(message.data)
+
+
+async def __send_shutdown(ws: WebSocketClientProtocol, exit_code: int):
     try:
-        await ws.send(json.dumps({"type": MessageType.TASK_FINISH}))
+        message = SocketMessage(
+            type=MessageType.TASK_FINISH, data=TaskFinishInfo(exit_code=exit_code)
+        )
+        await ws.send(message.json())
+        report = await receive_usage_report(ws)
+        if report is not None:
+            typer.secho(report.summary(), fg="yellow")
     except:
         typer.secho("Daemon did not respond", fg="yellow")
 
 
 async def __wait_for_task_start(
     new_task: NewTask, uri
-) -> Tuple[Task, WebSocketClientProtocol]:
+) -> Tuple[Task, WebSocketClientProtocol, TaskStartInfo]:
     ws = await websockets.connect(uri)
     await ws.send(new_task.json())
 
@@ -95,6 +156,7 @@ async def __wait_for_task_start(
 
     # Wait for start signal
     can_start = False
+    start_info = TaskStartInfo()
 
     typer.secho("Waiting for start signal...", fg="yellow")
     typer.echo(f"Task id: {task.id}")
@@ -116,6 +178,8 @@ async def __wait_for_task_start(
 
             if message.type == MessageType.TASK_CAN_START:
                 can_start = True
+                if message.data is not None:
+                    start_info = TaskStartInfo.parse_obj(message.data)
                 continue
 
             if message.type == MessageType.INFO_UPDATE:
@@ -138,4 +202,4 @@ async def __wait_for_task_start(
     message = SocketMessage(type=MessageType.TASK_UPDATE, data=task)
     await ws.send(message.json())
 
-    return task, ws
+    return task, ws, start_info
@@ -0,0 +1,111 @@
+from typing import Dict, Iterable, Optional
+
+from taskflow.ledger import ReservationLedger
+from taskflow.model.state import SystemState
+from taskflow.model.task import Task
+
+
+class Capacity:
+    """
+    Resources available to the scheduler at a point in time
+
+    :param memory_free_bytes: Free main memory
+    :param gpu_memory_free_bytes: Free memory on each GPU
+    :param cpu_load_percent: Observed load of each CPU core not assigned to a task
+    :param resources_free: Free units of each counted resource
+    """
+
+    __slots__ = [
+        "memory_free_bytes",
+        "gpu_memory_free_bytes",
+        "cpu_load_percent",
+        "resources_free",
+    ]
+
+    def __init__(
+        self,
+        memory_free_bytes: int,
+        gpu_memory_free_bytes: Dict[str, int],
+        cpu_load_percent: Optional[Dict[int, float]] = None,
+        resources_free: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.memory_free_bytes = memory_free_bytes
+        self.gpu_memory_free_bytes = gpu_memory_free_bytes
+        self.cpu_load_percent = cpu_load_percent or {}
+        self.resources_free = resources_free or {}
+
+    @classmethod
+    def from_state(
+        cls,
+        state: SystemState,
+        ledger: Optional[ReservationLedger] = None,
+        assigned_cpu_ids: Iterable[int] = (),
+        resources_free: Optional[Dict[str, int]] = None,
+    ) -> "Capacity":
+        """
+        Creates a capacity from the system state, minus the resources promised in a ledger
+
+        :type state: SystemState
+        :type ledger: Optional[ReservationLedger], optional
+        :param assigned_cpu_ids: CPU cores already assigned to running tasks
+        :param resources_free: Free units of each counted resource, which the system state does not know about
+        :rtype: Capacity
+        """
+        capacity = cls(
+            memory_free_bytes=state.memory_free_bytes,
+            gpu_memory_free_bytes=dict(state.gpu_memory_free_bytes),
+            cpu_load_percent=dict(state.cpu_load_percent),
+            resources_free=dict(resources_free or {}),
+        )
+        for cpu_id in assigned_cpu_ids:
+            capacity.cpu_load_percent.pop(cpu_id, None)
+
+        if ledger is not None:
+            capacity.memory_free_bytes -= ledger.memory_bytes
+            for gpu_id in capacity.gpu_memory_free_bytes.keys():
+                capacity.gpu_memory_free_bytes[gpu_id] -= ledger.gpu_memory_bytes(
+                    gpu_id
+                )
+
+        return capacity
+
+    def copy(self) -> "Capacity":
+        return Capacity(
+            memory_free_bytes=self.memory_free_bytes,
+            gpu_memory_free_bytes=dict(self.gpu_memory_free_bytes),
+            cpu_load_percent=dict(self.cpu_load_percent),
+            resources_free=dict(self.resources_free),
+        )
+
+    def take(self, task: Task):
+        """
+        Removes the resources used by a placed task
+
+        :type task: Task
+        """
+        self.memory_free_bytes -= task.usage.memory_bytes or 0
+        for gpu_id, usage_bytes in (task.gpu_assignment or {}).items():
+            self.gpu_memory_free_bytes[gpu_id] = (
+                self.gpu_memory_free_bytes.get(gpu_id, 0) - usage_bytes
+            )
+        for cpu_id in task.cpu_assignment or []:
+            self.cpu_load_percent.pop(cpu_id, None)
+        for name, count in task.usage.resources.items():
+            self.resources_free[name] = self.resources_free.get(name, 0) - count
+
+    def give(self, task: Task):
+        """
+        Adds back the resources used by a placed task
+
+        :type task: Task
+        """
+        self.memory_free_bytes += task.usage.memory_bytes or 0
+        for gpu_id, usage_bytes in (task.gpu_assignment or {}).items():
+            self.gpu_memory_free_bytes[gpu_id] = (
+                self.gpu_memory_free_bytes.get(gpu_id, 0) + usage_bytes
+            )
+        # The task's load goes away along with it
+        for cpu_id in task.cpu_assignment or []:
+            self.cpu_load_percent[cpu_id] = 0
+        for name, count in task.usage.resources.items():
+            self.resources_free[name] = self.resources_free.get(name, 0) + count
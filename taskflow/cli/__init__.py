@@ -1,6 +1,6 @@
 from typer import Typer
 
-from . import run, ps, version, show
+from . import run, ps, version, show, history, trace
 
 
 def bind_app(app: Typer):
@@ -8,3 +8,5 @@ def bind_app(app: Typer):
     app.command()(ps.ps)
     app.command()(version.version)
     app.command()(show.show)
+    app.command()(history.history)
+    app.command()(trace.trace)
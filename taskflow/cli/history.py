@@ -0,0 +1,156 @@
+import typer
+import getpass
+import requests
+import tabulate
+
+from typing import Any, Dict, Optional
+from datetime import timedelta
+
+from taskflow import di
+from taskflow.cli.ps import DisplayMode
+from taskflow.model.history import TaskRecord, TaskRecordList
+from taskflow.utils import format_bytes, format_int_timestamp, format_timedelta
+
+PAGE_SIZE = 100
+
+
+def history(
+    task_id: Optional[str] = typer.Argument(
+        None, help="Show the record of a single task"
+    ),
+    only_mine: bool = typer.Option(
+        False, "--user", "-u", help="Only show tasks started by the current user"
+    ),
+    only_failed: bool = typer.Option(
+        False, "--failed", "-f", help="Only show tasks that exited with an error"
+    ),
+    limit: int = typer.Option(20, "--limit", "-n", help="Show at most this many tasks"),
+    display_mode: DisplayMode = typer.Option(
+        DisplayMode.TABLE, "-o", help="Set the display format", show_choices=True
+    ),
+):
+    """
+    Shows finished tasks, most recent first
+    """
+    di.init_settings()
+    settings = di.settings()
+    base_url = f"http://localhost:{settings.api_port}/tasks/history"
+
+    try:
+        if task_id is not None:
+            response = requests.get(f"{base_url}/id/{task_id}")
+            check_response(response, task_id)
+            print_record(TaskRecord.parse_obj(response.json()))
+            return
+
+        params: Dict[str, Any] = {}
+        if only_mine:
+            params["created_by"] = getpass.getuser()
+        if only_failed:
+            params["failed"] = True
+
+        record_list = TaskRecordList(records=[], total=0)
+        cursor: Optional[str] = None
+        while len(record_list.records) < limit:
+            page_params = dict(params)
+            page_params["size"] = min(PAGE_SIZE, limit - len(record_list.records))
+            if cursor is not None:
+                page_params["cursor"] = cursor
+
+            response = requests.get(f"{base_url}/search", params=page_params)
+            check_response(response)
+
+            page = TaskRecordList.parse_obj(response.json())
+            record_list.records.extend(page.records)
+            record_list.total = page.total
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        if display_mode == DisplayMode.TABLE:
+            print_record_table(record_list)
+        elif display_mode == DisplayMode.JSON:
+            typer.echo(record_list.json(indent=2))
+        elif display_mode == DisplayMode.PIPE:
+            for record in record_list.records:
+                typer.echo(record.id)
+    except requests.RequestException:
+        typer.secho("Cannot connect to daemon. Is taskflowd running?", fg="red")
+        raise typer.Exit(10)
+
+
+def check_response(response: requests.Response, task_id: Optional[str] = None):
+    if response.status_code == 404:
+        detail = response.json().get("detail")
+        if detail == "ARCHIVE_DISABLED":
+            typer.secho("The task archive is disabled in taskflowd", fg="red")
+        else:
+            typer.secho(f"Task with id {task_id} not found in history", fg="red")
+        raise typer.Exit(404)
+
+    if response.status_code != 200:
+        typer.secho(f"Got error response from daemon ({response.status_code})")
+        raise typer.Exit(response.status_code)
+
+
+def format_runtime(record: TaskRecord) -> str:
+    runtime_ms = record.runtime_ms
+    if runtime_ms is None:
+        return "N/A"
+    return format_timedelta(timedelta(milliseconds=runtime_ms))
+
+
+def format_exit_code(record: TaskRecord) -> str:
+    return str(record.exit_code) if record.exit_code is not None else "N/A"
+
+
+def print_record_table(record_list: TaskRecordList):
+    headers = ["ID", "Command", "Created by", "Finished at", "Runtime", "Exit"]
+
+    rows = []
+    for record in record_list.records:
+        cmd = record.cmd
+        if len(cmd) > 10:
+            cmd = cmd[:10] + "..."
+
+        rows.append(
+            [
+                record.id,
+                cmd,
+                record.created_by,
+                format_int_timestamp(record.finished_at),
+                format_runtime(record),
+                format_exit_code(record),
+            ]
+        )
+
+    typer.echo(tabulate.tabulate(rows, headers=headers))
+    if record_list.total > len(record_list.records):
+        typer.secho(
+            f"Showing {len(record_list.records)} of {record_list.total} tasks, use -n to show more",
+            fg="yellow",
+        )
+
+
+def print_record(record: TaskRecord):
+    memory_usage = (
+        format_bytes(record.memory_bytes) if record.memory_bytes is not None else "N/A"
+    )
+    assigned_gpus_str = ",".join(record.gpu_ids) if len(record.gpu_ids) > 0 else "N/A"
+
+    typer.secho(f"Task {record.id}", bold=True)
+    typer.echo(f"Command: {record.cmd}")
+    typer.echo(f"Working directory: {record.cwd or 'N/A'}")
+    typer.echo()
+
+    typer.echo(f"RAM usage: {memory_usage}")
+    typer.echo(f"Assigned GPUs: {assigned_gpus_str}")
+    typer.echo()
+
+    typer.echo(f"Exit code: {format_exit_code(record)}")
+    typer.echo(f"Runtime: {format_runtime(record)}")
+    typer.echo(f"Priority: {record.priority.name}")
+    typer.echo(f"Created by: {record.created_by}")
+    typer.echo(f"Created at: {format_int_timestamp(record.created_at)}")
+    typer.echo(f"Started at: {format_int_timestamp(record.started_at)}")
+    typer.echo(f"Finished at: {format_int_timestamp(record.finished_at)}")
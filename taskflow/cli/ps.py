@@ -6,7 +6,7 @@ import requests
 import tabulate
 
 from enum import Enum
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Iterator, Optional, List
 from datetime import timedelta, datetime
 
 from taskflow import di
@@ -14,6 +14,9 @@ from taskflow.model.task import NewTask, Task, TaskList, TaskPriority, TaskResou
 from taskflow.utils import format_int_timestamp, get_timestamp_ms, format_bytes
 
 
+PAGE_SIZE = 100
+
+
 class DisplayMode(str, Enum):
     TABLE = "table"
     JSON = "json"
@@ -21,7 +24,12 @@ class DisplayMode(str, Enum):
 
 
 def ps(
-    verbose: bool = typer.Option(False, "-v", help="Show additional info for tasks"),
+    verbose: bool = typer.Option(
+        False,
+        "--verbose",
+        "-v",
+        help="Show additional info for tasks, such as the effective priority of pending tasks",
+    ),
     only_mine: bool = typer.Option(
         False, "--user", "-u", help="Only show tasks started by the current user"
     ),
@@ -30,19 +38,23 @@ def ps(
     display_mode: DisplayMode = typer.Option(
         DisplayMode.TABLE, "-o", help="Set the display format", show_choices=True
     ),
+    limit: Optional[int] = typer.Option(
+        None,
+        "--limit",
+        "-n",
+        help=f"Show at most this many tasks. Defaults to {PAGE_SIZE} in table and json modes, "
+        "and to all tasks in pipe mode",
+    ),
 ):
     """
     Shows current pending and active tasks
     """
 
-    di.init()
+    di.init_settings()
     settings = di.settings()
     current_user = getpass.getuser()
 
-    params: Dict[str, Any] = {
-        "start": 0,
-        "size": 100,
-    }
+    params: Dict[str, Any] = {}
 
     if only_mine:
         params["created_by"] = current_user
@@ -56,24 +68,32 @@ def ps(
     elif only_pending:
         params["is_running"] = False
 
-    try:
-        response = requests.get(
-            f"http://localhost:{settings.api_port}/tasks/search", params=params
-        )
+    if limit is None and display_mode != DisplayMode.PIPE:
+        limit = PAGE_SIZE
 
-        if response.status_code != 200:
-            typer.secho(f"Got error response from daemon ({response.status_code})")
-            raise typer.Exit(response.status_code)
-
-        data = response.json()
-        task_list = TaskList.parse_obj(data)
+    try:
+        pages = iter_task_pages(settings.api_port, params, limit)
 
-        if display_mode == DisplayMode.TABLE:
-            print_task_table(task_list, abbrev=not verbose)
-        elif display_mode == DisplayMode.JSON:
-            print_task_json(task_list)
-        elif display_mode == DisplayMode.PIPE:
-            print_task_pipe(task_list)
+        if display_mode == DisplayMode.PIPE:
+            # Ids are printed as pages arrive, so large queues start streaming right away
+            for page in pages:
+                print_task_pipe(page)
+        else:
+            task_list = TaskList(tasks=[], total=0)
+            for page in pages:
+                task_list.tasks.extend(page.tasks)
+                task_list.total = page.total
+
+            if display_mode == DisplayMode.TABLE:
+                print_task_table(task_list, abbrev=not verbose)
+                if task_list.total > len(task_list.tasks):
+                    typer.secho(
+                        f"Showing {len(task_list.tasks)} of {task_list.total} tasks, "
+                        "use -n to show more",
+                        fg="yellow",
+                    )
+            elif display_mode == DisplayMode.JSON:
+                print_task_json(task_list)
     except requests.RequestException:
         typer.secho("Cannot connect to daemon. Is taskflowd running?", fg="red")
         raise typer.Exit(10)
@@ -83,6 +103,46 @@ def ps(
     )
 
 
+def iter_task_pages(
+    api_port: int, params: Dict[str, Any], limit: Optional[int] = None
+) -> Iterator[TaskList]:
+    """
+    Fetches search results one page at a time, following the cursor of each page
+
+    :param api_port: Port of the daemon API
+    :param params: Search filters
+    :param limit: Maximum number of tasks to fetch, or None to fetch all of them
+    :rtype: Iterator[TaskList]
+    """
+    cursor: Optional[str] = None
+    remaining = limit
+
+    while remaining is None or remaining > 0:
+        page_params = dict(params)
+        page_params["size"] = (
+            PAGE_SIZE if remaining is None else min(PAGE_SIZE, remaining)
+        )
+        if cursor is not None:
+            page_params["cursor"] = cursor
+
+        response = requests.get(
+            f"http://localhost:{api_port}/tasks/search", params=page_params
+        )
+
+        if response.status_code != 200:
+            typer.secho(f"Got error response from daemon ({response.status_code})")
+            raise typer.Exit(response.status_code)
+
+        page = TaskList.parse_obj(response.json())
+        yield page
+
+        if remaining is not None:
+            remaining -= len(page.tasks)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+
 def print_task_pipe(task_list: TaskList):
     for task in task_list.tasks:
         typer.echo(task.id)
@@ -104,6 +164,7 @@ def print_task_table(task_list: TaskList, abbrev=True):
             "Command",
             "Created by",
             "Priority",
+            "Effective",
             "Delay",
             "Status",
         ]
@@ -114,13 +175,18 @@ def print_task_table(task_list: TaskList, abbrev=True):
         if len(cmd) > 10:
             cmd = cmd[:10] + "..."
 
-        priority = task.priority.name
-        delay = str(task.init_delay_s) + "s"
         status = "PENDING" if not task.is_running else "RUNNING"
 
         if abbrev:
             rows.append([task.id, task.pid or "N/A", cmd, status])
         else:
+            priority = task.priority.name
+            effective_priority = (
+                f"{task.effective_priority:.1f}"
+                if task.effective_priority is not None
+                else "N/A"
+            )
+            delay = str(task.init_delay_s) + "s"
             rows.append(
                 [
                     task.id,
@@ -128,6 +194,7 @@ def print_task_table(task_list: TaskList, abbrev=True):
                     cmd,
                     task.created_by,
                     priority,
+                    effective_priority,
                     delay,
                     status,
                 ]
@@ -7,17 +7,34 @@ import json
 import signal
 import yaml
 import humanfriendly as hf
+import requests
 
 from websockets.exceptions import ConnectionClosed
 from halo import Halo
+from functools import partial
 from subprocess import Popen
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 from datetime import timedelta
 
 from taskflow import di
+from taskflow.blocking import receive_usage_report
+from taskflow.model.estimate import ResourceEstimate
 from taskflow.model.task import NewTask, Task, TaskPriority, TaskResourceUsage
-from taskflow.model.ws import ClientUpdateInfo, SocketMessage, MessageType
-from taskflow.utils import format_timedelta, get_timestamp_ms, format_bytes
+from taskflow.model.ws import (
+    ClientUpdateInfo,
+    SocketMessage,
+    MessageType,
+    TaskFinishInfo,
+    TaskStartInfo,
+)
+from taskflow.utils import (
+    format_timedelta,
+    get_gpu_env,
+    get_timestamp_ms,
+    format_bytes,
+    format_cpu_ids,
+    pin_to_cpus,
+)
 
 
 def run(
@@ -35,7 +52,33 @@ def run(
     gpu_usage_strings: Optional[List[str]] = typer.Option(
         None,
         "--gpu",
-        help="Specify memory usage for each GPU, with format <gpu-id>:<usage>. Eg. 0:1G",
+        help="Specify memory usage for each GPU, with format <gpu-id>:<usage>. Eg. 0:1G. Use any:<usage> to let the scheduler pick the GPU",
+    ),
+    gpu_count: int = typer.Option(
+        1,
+        "--gpu-count",
+        help="Number of GPUs to pick for --gpu any:<usage>. Eg. --gpu any:10G --gpu-count 2",
+    ),
+    cpu_count: Optional[int] = typer.Option(
+        None,
+        "--cpus",
+        help="Number of CPU cores to pin the task to. The scheduler picks idle cores",
+    ),
+    resource_strings: List[str] = typer.Option(
+        [],
+        "--resource",
+        help="Units of a counted resource declared in the daemon settings, with format <name>=<count>. Eg. --resource ssd=1",
+    ),
+    expected_runtime: Optional[str] = typer.Option(
+        None,
+        "-t",
+        "--time",
+        help="Expected runtime (eg. 90, 30m, 2h). Used for backfill scheduling",
+    ),
+    auto: bool = typer.Option(
+        False,
+        "--auto",
+        help="Declare the usage measured in previous runs of the same command, instead of -m and --gpu amounts",
     ),
     file: Optional[str] = typer.Option(None, "-f", help="Path to options file to load"),
     save_to_file: Optional[str] = typer.Option(
@@ -46,7 +89,7 @@ def run(
     Adds a task to the execution queue
     """
 
-    di.init()
+    di.init_settings()
     current_user = getpass.getuser()
     new_task = None
 
@@ -62,6 +105,14 @@ def run(
             typer.echo(typer.style("Invalid priority value", fg="red"))
             raise typer.Exit(1)
 
+        expected_runtime_s = None
+        if expected_runtime is not None:
+            try:
+                expected_runtime_s = int(hf.parse_timespan(expected_runtime))
+            except hf.InvalidTimespan:
+                typer.echo(typer.style("Invalid runtime value", fg="red"))
+                raise typer.Exit(1)
+
         gpu_memory_usage = None
         if gpu_usage_strings is not None:
             # Parse GPU settings
@@ -69,14 +120,50 @@ def run(
             for gs in gpu_usage_strings:
                 gpu_id, usage = gs.split(":")
                 gpu_memory_usage[gpu_id] = usage
+            if "any" in gpu_memory_usage.keys() and len(gpu_memory_usage) > 1:
+                typer.secho(
+                    "--gpu any:<usage> cannot be combined with explicit GPU ids",
+                    fg="red",
+                )
+                raise typer.Exit(1)
+
+        resources = parse_resources(resource_strings, di.settings().resources)
+
+        if auto or (memory_usage is None and not gpu_memory_usage):
+            estimate = fetch_estimate(
+                cmd_str, current_user, os.getcwd(), port=di.settings().api_port
+            )
+            if auto and estimate is None:
+                typer.secho(
+                    "No previous successful run of this command, using the declared usage",
+                    fg="yellow",
+                )
+            elif auto and estimate is not None:
+                memory_usage, gpu_memory_usage, gpu_count = apply_estimate(
+                    estimate, gpu_memory_usage, gpu_count
+                )
+                typer.secho(
+                    f"Using the usage of {estimate.samples_count} previous runs: {describe_estimate(estimate)}",
+                    fg="green",
+                )
+            elif estimate is not None:
+                typer.secho(
+                    f"Previous runs of this command used {describe_estimate(estimate)}. Use --auto to declare it",
+                    fg="yellow",
+                )
 
         new_task = NewTask(
             cmd=cmd_str,
             created_by=current_user,
             priority=priority,
             init_delay_s=m_init_delay_s,
+            expected_runtime_s=expected_runtime_s,
             usage=TaskResourceUsage(
-                memory_bytes=memory_usage, gpu_memory_bytes=gpu_memory_usage
+                memory_bytes=memory_usage,
+                gpu_memory_bytes=gpu_memory_usage,
+                gpu_count=gpu_count,
+                cpu_count=cpu_count,
+                resources=resources,
             ),
             pid=os.getpid(),
             cwd=os.getcwd(),
@@ -109,13 +196,19 @@ async def start_proc(new_task: NewTask, port: int):
 
                 try:
                     data = await ws.recv()
-                except ConnectionClosed:
+                except ConnectionClosed as e:
+                    if e.code == 1008:
+                        typer.secho("The daemon rejected the task", fg="red")
+                        raise typer.Exit(1)
                     typer.secho("Daemon stopped unexpectedly", fg="red")
                     raise typer.Exit(5)
                 task = Task.parse_obj(json.loads(data))
+                # Resume this task if the daemon restarts while waiting
+                new_task.id = task.id
 
                 # Wait for start signal
                 can_start = False
+                start_info = TaskStartInfo()
 
                 typer.secho("Waiting for start signal...", fg="yellow")
                 typer.echo(f"Task id: {task.id}")
@@ -139,6 +232,8 @@ async def start_proc(new_task: NewTask, port: int):
 
                         if message.type == MessageType.TASK_CAN_START:
                             can_start = True
+                            if message.data is not None:
+                                start_info = TaskStartInfo.parse_obj(message.data)
                             continue
 
                         if message.type == MessageType.INFO_UPDATE:
@@ -155,7 +250,17 @@ async def start_proc(new_task: NewTask, port: int):
                 spinner.succeed()
                 typer.secho("Starting task...", fg="green")
 
-                p = Popen(task.cmd, shell=True, env=os.environ)
+                env = dict(os.environ)
+                if len(start_info.gpu_ids) > 0:
+                    typer.echo(f"Using GPUs: {','.join(start_info.gpu_ids)}")
+                    env.update(get_gpu_env(start_info.gpu_ids))
+
+                preexec_fn = None
+                if len(start_info.cpu_ids) > 0:
+                    typer.echo(f"Using CPUs: {format_cpu_ids(start_info.cpu_ids)}")
+                    preexec_fn = partial(pin_to_cpus, start_info.cpu_ids)
+
+                p = Popen(task.cmd, shell=True, env=env, preexec_fn=preexec_fn)
 
                 # Update task info
                 task.pid = p.pid
@@ -174,11 +279,22 @@ async def start_proc(new_task: NewTask, port: int):
                         await asyncio.sleep(0.5)
                 except KeyboardInterrupt:
                     p.send_signal(signal.SIGTERM)
-                    p.wait()
+                    status = p.wait()
 
                 # Send finish signal
                 try:
-                    await ws.send(json.dumps({"type": MessageType.TASK_FINISH}))
+                    message = SocketMessage(
+                        type=MessageType.TASK_FINISH,
+                        data=TaskFinishInfo(exit_code=status),
+                    )
+                    await ws.send(message.json())
+                    report = await receive_usage_report(ws)
+                    if report is not None:
+                        typer.secho(report.summary(), fg="yellow")
+                        typer.secho(
+                            "Use --auto to declare the usage of previous runs",
+                            fg="yellow",
+                        )
                 except:
                     typer.secho("Daemon did not respond", fg="yellow")
 
@@ -188,8 +304,99 @@ async def start_proc(new_task: NewTask, port: int):
             await asyncio.sleep(5)
 
 
+def fetch_estimate(
+    cmd: str, created_by: str, cwd: str, port: int
+) -> Optional[ResourceEstimate]:
+    """
+    Get the usage the daemon learned from previous runs of a command
+
+    :return: The estimate, or None if there is none or the daemon cannot be reached
+    :rtype: Optional[ResourceEstimate]
+    """
+    try:
+        response = requests.get(
+            f"http://localhost:{port}/tasks/estimate",
+            params={"cmd": cmd, "created_by": created_by, "cwd": cwd},
+            timeout=2,
+        )
+    except requests.RequestException:
+        return None
+
+    if response.status_code != 200:
+        return None
+    return ResourceEstimate.parse_obj(response.json())
+
+
+def apply_estimate(
+    estimate: ResourceEstimate,
+    gpu_memory_usage: Optional[Dict[str, Any]],
+    gpu_count: int,
+) -> Tuple[int, Optional[Dict[str, Any]], int]:
+    """
+    Replaces declared amounts with estimated ones. Explicitly requested GPUs are kept
+
+    :return: Memory usage, GPU memory usage and GPU count
+    :rtype: Tuple[int, Optional[Dict[str, Any]], int]
+    """
+    if estimate.gpu_memory_bytes is None:
+        return estimate.memory_bytes, gpu_memory_usage, gpu_count
+
+    if gpu_memory_usage:
+        gpu_memory_usage = {k: estimate.gpu_memory_bytes for k in gpu_memory_usage}
+    else:
+        gpu_memory_usage = {"any": estimate.gpu_memory_bytes}
+        gpu_count = estimate.gpu_count
+    return estimate.memory_bytes, gpu_memory_usage, gpu_count
+
+
+def describe_estimate(estimate: ResourceEstimate) -> str:
+    desc = f"-m {format_bytes(estimate.memory_bytes)}"
+    if estimate.gpu_memory_bytes is not None:
+        desc += f" --gpu any:{format_bytes(estimate.gpu_memory_bytes)}"
+        if estimate.gpu_count > 1:
+            desc += f" --gpu-count {estimate.gpu_count}"
+    return desc
+
+
+def parse_resources(
+    resource_strings: List[str], available: Dict[str, int]
+) -> Dict[str, int]:
+    """
+    Parses --resource options, and checks them against the resources declared in the settings
+
+    :param resource_strings: Values with format <name>=<count>
+    :param available: Number of units of each declared resource
+    :rtype: Dict[str, int]
+    """
+    resources: Dict[str, int] = {}
+    for rs in resource_strings:
+        name, _, count_str = rs.partition("=")
+        try:
+            count = int(count_str)
+        except ValueError:
+            typer.secho(f"Invalid resource value: {rs}", fg="red")
+            raise typer.Exit(1)
+
+        if name not in available:
+            typer.secho(
+                f"Unknown resource {name}. Declared resources: {', '.join(available) or 'none'}",
+                fg="red",
+            )
+            raise typer.Exit(1)
+        resources[name] = resources.get(name, 0) + count
+
+        if count < 1 or resources[name] > available[name]:
+            typer.secho(
+                f"Resource {name} has {available[name]} units, cannot request {resources[name]}",
+                fg="red",
+            )
+            raise typer.Exit(1)
+    return resources
+
+
 def convert_newtask_to_dict(new_task: NewTask):
     dout = json.loads(new_task.json())
+    dout.pop("id", None)
     dout.pop("cmd")
     dout.pop("created_by")
 
@@ -11,14 +11,20 @@ from datetime import timedelta, datetime
 
 from taskflow import di
 from taskflow.model.task import NewTask, Task, TaskList, TaskPriority, TaskResourceUsage
-from taskflow.utils import format_int_timestamp, get_timestamp_ms, format_bytes
+from taskflow.utils import (
+    format_int_timestamp,
+    format_timedelta,
+    get_timestamp_ms,
+    format_bytes,
+    format_cpu_ids,
+)
 
 
 def show(task_id: str):
     """
     Shows detailed information for a task
     """
-    di.init()
+    di.init_settings()
     settings = di.settings()
 
     try:
@@ -63,19 +69,64 @@ def print_task(task: Task):
     gpu_usage_str = "N/A"
     if len(gpu_usages) > 0:
         gpu_usage_str = " ".join(gpu_usages)
+        if "any" in gpu_bytes.keys() and task.usage.gpu_count > 1:
+            gpu_usage_str += f" (x{task.usage.gpu_count})"
 
     typer.secho(f"Task {task.id} (PID={task.pid or 'None'})", bold=True)
     typer.echo(f"Command: {task.cmd}")
     typer.echo(f"Working directory: {task.cwd or 'N/A'}")
     typer.echo()
 
+    assigned_gpus_str = "N/A"
+    if task.gpu_assignment:
+        assigned_gpus_str = ",".join(task.gpu_assignment.keys())
+
     typer.secho(f"RAM usage: {memory_usage}")
     typer.echo(f"GPU usage: {gpu_usage_str}")
+    typer.echo(f"Assigned GPUs: {assigned_gpus_str}")
+    if task.usage.cpu_count is not None:
+        assigned_cpus_str = format_cpu_ids(task.cpu_assignment or []) or "N/A"
+        typer.echo(f"CPU cores: {task.usage.cpu_count}")
+        typer.echo(f"Assigned CPUs: {assigned_cpus_str}")
+    if len(task.usage.resources) > 0:
+        resources_str = " ".join(f"{k}={v}" for k, v in task.usage.resources.items())
+        typer.echo(f"Resources: {resources_str}")
+    print_observed_usage(task)
     typer.echo()
 
+    expected_runtime = "N/A"
+    if task.expected_runtime_s is not None:
+        expected_runtime = format_timedelta(timedelta(seconds=task.expected_runtime_s))
+
     typer.echo(f"Task delay: {delay}")
+    typer.echo(f"Expected runtime: {expected_runtime}")
     typer.echo(f"Status: {status}")
     typer.echo(f"Priority: {priority}")
+    if task.effective_priority is not None:
+        typer.echo(f"Effective priority: {task.effective_priority:.1f}")
     typer.echo(f"Created by: {task.created_by}")
     typer.secho(f"Created at: {created_at}")
     typer.secho(f"Started at: {started_at}")
+
+
+def print_observed_usage(task: Task):
+    """
+    Prints the usage measured by the daemon, next to the declared usage above it
+    """
+    observed = task.observed
+    if observed is None or observed.samples_count < 1:
+        return
+
+    typer.echo(
+        f"Measured RAM usage: {format_bytes(observed.memory_peak_bytes)} peak, "
+        f"{format_bytes(observed.memory_mean_bytes)} mean "
+        f"({observed.samples_count} samples)"
+    )
+
+    gpu_usages = []
+    for gpu_id in sorted(observed.gpu_memory_peak_bytes.keys()):
+        peak = format_bytes(observed.gpu_memory_peak_bytes[gpu_id])
+        mean = format_bytes(observed.gpu_memory_mean_bytes.get(gpu_id, 0))
+        gpu_usages.append(f"{gpu_id}:{peak} peak, {mean} mean")
+    if len(gpu_usages) > 0:
+        typer.echo(f"Measured GPU usage: {'; '.join(gpu_usages)}")
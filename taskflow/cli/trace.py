@@ -0,0 +1,51 @@
+import typer
+import requests
+
+from enum import Enum
+from typing import Optional
+
+from taskflow import di
+from taskflow.model.tracing import TracingStatus
+
+
+class TraceAction(str, Enum):
+    ON = "on"
+    OFF = "off"
+
+
+def trace(
+    action: Optional[TraceAction] = typer.Argument(
+        None, help="Start or stop tracing. Shows the tracing status if omitted"
+    ),
+):
+    """
+    Controls the recording of task lifecycle traces, viewable in Perfetto
+    """
+    di.init_settings()
+    settings = di.settings()
+    base_url = f"http://localhost:{settings.api_port}/tracing"
+
+    try:
+        if action == TraceAction.ON:
+            response = requests.post(f"{base_url}/enable")
+        elif action == TraceAction.OFF:
+            response = requests.post(f"{base_url}/disable")
+        else:
+            response = requests.get(base_url)
+
+        if response.status_code == 404:
+            typer.secho("No trace directory is configured in taskflowd", fg="red")
+            raise typer.Exit(404)
+
+        if response.status_code != 200:
+            typer.secho(f"Got error response from daemon ({response.status_code})")
+            raise typer.Exit(response.status_code)
+
+        status = TracingStatus.parse_obj(response.json())
+        if status.enabled:
+            typer.echo(f"Tracing to {status.path}")
+        else:
+            typer.echo("Tracing is disabled")
+    except requests.RequestException:
+        typer.secho("Cannot connect to daemon. Is taskflowd running?", fg="red")
+        raise typer.Exit(10)
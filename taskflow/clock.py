@@ -0,0 +1,26 @@
+import time
+
+from taskflow.utils import get_timestamp_ms
+
+
+class Clock:
+    """
+    Source of the current time for the scheduler.
+    Simulations replace it with a virtual clock, to run days of workload in seconds.
+    """
+
+    def monotonic(self) -> float:
+        """
+        Get the current monotonic time in seconds
+
+        :rtype: float
+        """
+        return time.monotonic()
+
+    def timestamp_ms(self) -> int:
+        """
+        Get the current timestamp in milliseconds
+
+        :rtype: int
+        """
+        return get_timestamp_ms()
@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import List, Optional
 
-from taskflow.model.task import Task, TaskList
+from taskflow.model.task import Task, TaskList, TaskPriority
 
 
 class ITaskflowDb(ABC):
@@ -26,18 +26,25 @@ class ITaskflowDb(ABC):
         self,
         created_by: Optional[str] = None,
         is_running: Optional[bool] = None,
+        priority: Optional[TaskPriority] = None,
         start: int = 0,
         size: int = 20,
+        cursor: Optional[str] = None,
     ) -> TaskList:
         """
-        Search tasks in the database
+        Search tasks in the database, ordered by creation time
 
         :type created_by: Optional[str], optional
         :type is_running: Optional[bool], optional
-        :param start: Offset index, defaults to 0
+        :type priority: Optional[TaskPriority], optional
+        :param start: Offset index, counted from the cursor if given, defaults to 0
         :type start: int, optional
         :param size: Number of records to return, defaults to 20
         :type size: int, optional
+        :param cursor: Opaque cursor from the next_cursor field of a previous result.
+            Results start right after the last task of that result
+        :type cursor: Optional[str], optional
+        :raises ValueError: If the cursor is malformed
         :rtype: TaskList
         """
         raise NotImplementedError
@@ -115,3 +122,31 @@ class ITaskflowDb(ABC):
         :type task: Task
         """
         raise NotImplementedError
+
+    async def get_restored_task(self, id: str) -> Optional[Task]:
+        """
+        Get a pending task left by a previous daemon run. Such tasks are not loaded with the others,
+        and only show up in queries once they are inserted again
+
+        :type id: str
+        :return: The task, or None if there is no such task
+        :rtype: Optional[Task]
+        """
+        return None
+
+    async def get_restored_tasks_count(self) -> int:
+        """
+        Get the number of pending tasks left by a previous daemon run
+
+        :rtype: int
+        """
+        return 0
+
+    async def drop_restored_tasks(self) -> int:
+        """
+        Deletes the pending tasks left by a previous daemon run that were not inserted again
+
+        :return: Number of deleted tasks
+        :rtype: int
+        """
+        return 0
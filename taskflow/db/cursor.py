@@ -0,0 +1,45 @@
+import base64
+import binascii
+
+from typing import Tuple
+
+from taskflow.model.task import Task
+
+CursorKey = Tuple[int, str]
+
+
+def task_cursor_key(task: Task) -> CursorKey:
+    """
+    Get the key tasks are ordered by in search results
+
+    :type task: Task
+    :rtype: CursorKey
+    """
+    return (task.created_at, task.id)
+
+
+def encode_cursor(key: CursorKey) -> str:
+    """
+    Encodes a search position into an opaque cursor string
+
+    :type key: CursorKey
+    :rtype: str
+    """
+    raw = f"{key[0]}:{key[1]}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> CursorKey:
+    """
+    Decodes a cursor string created by encode_cursor
+
+    :type cursor: str
+    :raises ValueError: If the cursor is malformed
+    :rtype: CursorKey
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, id = raw.split(":", 1)
+        return (int(created_at), id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
@@ -1,69 +1,165 @@
-from typing import List, Optional
-from littletable import Table
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
 
-from taskflow.model.task import Task, TaskList
+from taskflow.model.task import Task, TaskList, TaskPriority
 from .base import ITaskflowDb
+from .cursor import CursorKey, decode_cursor, encode_cursor, task_cursor_key
+
+# Indexed values of a task: (created_by, is_running, priority)
+IndexValues = Tuple[str, bool, int]
+# Filter values of a search, None matching any value
+IndexFilter = Tuple[Optional[str], Optional[bool], Optional[int]]
+
+
+def get_index_filters(values: IndexValues) -> List[IndexFilter]:
+    """
+    Get every search filter a task matches, from the exact values to no filter at all
+
+    :type values: IndexValues
+    :rtype: List[IndexFilter]
+    """
+    created_by, is_running, priority = values
+    return [
+        (created_by, is_running, priority),
+        (created_by, is_running, None),
+        (created_by, None, priority),
+        (created_by, None, None),
+        (None, is_running, priority),
+        (None, is_running, None),
+        (None, None, priority),
+        (None, None, None),
+    ]
 
 
 class InMemoryDb(ITaskflowDb):
     """
-    In-memory implementation of ITaskflowDB
+    In-memory implementation of ITaskflowDB.
+
+    Tasks are partitioned into pending and running tasks, keyed by id,
+    so that lookups, counts and state transitions are O(1).
+
+    Searches are served from sorted indexes holding (created_at, id) keys, one for each combination
+    of the created_by, is_running and priority filters. A page is found by bisecting the index
+    of the search's filters, so its cost does not depend on the number of tasks.
     """
 
     def __init__(self) -> None:
         super().__init__()
-        self.__tasks = Table("tasks")
-        self.__tasks.create_index("id", unique=True)
+        self.__pending: Dict[str, Task] = {}
+        self.__running: Dict[str, Task] = {}
+
+        self.__indexes: Dict[IndexFilter, List[CursorKey]] = {}
+        # Values each task is currently indexed by, since tasks may be modified in place
+        self.__indexed: Dict[str, Tuple[CursorKey, IndexValues]] = {}
 
     async def search_tasks(
         self,
         created_by: Optional[str] = None,
         is_running: Optional[bool] = None,
+        priority: Optional[TaskPriority] = None,
         start: int = 0,
         size: int = 20,
+        cursor: Optional[str] = None,
     ) -> TaskList:
-        t = self.__tasks.clone()
-
-        if created_by is not None:
-            t = t.where(created_by=created_by)
-
-        if is_running is not None:
-            t = t.where(is_running=is_running)
-
-        t.sort("created_at")
-
-        total = len(t)
-
-        t = t[start : start + size]
-
-        return TaskList(tasks=list(t), total=total)
+        keys = self.__indexes.get(
+            (created_by, is_running, int(priority) if priority is not None else None),
+            [],
+        )
+
+        begin = 0
+        if cursor is not None:
+            begin = bisect_right(keys, decode_cursor(cursor))
+
+        page = keys[begin + start : begin + start + size]
+        has_more = begin + start + size < len(keys)
+
+        tasks = [self.__get(k[1]) for k in page]
+        next_cursor = None
+        if has_more and len(page) > 0:
+            next_cursor = encode_cursor(page[-1])
+
+        return TaskList(tasks=tasks, total=len(keys), next_cursor=next_cursor)
+
+    def _load(self, tasks: List[Task]):
+        """
+        Adds tasks to an empty database in one go, which is faster than inserting them one by one
+
+        :param tasks: Tasks sorted by creation time, then id
+        """
+        assert len(self.__indexed) < 1
+        for task in tasks:
+            if task.is_running:
+                self.__running[task.id] = task
+            else:
+                self.__pending[task.id] = task
+
+            key = task_cursor_key(task)
+            values = (task.created_by, task.is_running, int(task.priority))
+            self.__indexed[task.id] = (key, values)
+            for index_filter in get_index_filters(values):
+                self.__indexes.setdefault(index_filter, []).append(key)
 
     async def get_task_by_id(self, id: str) -> Optional[Task]:
-        try:
-            return self.__tasks.where(id=id)[0]
-        except IndexError:
-            return None
+        return self.__get(id)
 
     async def get_pending_tasks_count(self) -> int:
-        t = await self.get_pending_tasks()
-        return len(t)
+        return len(self.__pending)
 
     async def get_running_tasks_count(self) -> int:
-        t = await self.get_running_tasks()
-        return len(t)
+        return len(self.__running)
 
     async def get_pending_tasks(self) -> List[Task]:
-        return list(self.__tasks.where(lambda x: not x.is_running))
+        return list(self.__pending.values())
 
     async def get_running_tasks(self) -> List[Task]:
-        return list(self.__tasks.where(lambda x: x.is_running))
+        return list(self.__running.values())
 
     async def insert_task(self, task: Task):
-        self.__tasks.insert(task)
+        self.__store(task)
 
     async def update_task(self, task: Task):
-        self.__tasks.delete(id=task.id)
-        self.__tasks.insert(task)
+        self.__store(task)
 
     async def delete_task(self, task: Task):
-        self.__tasks.delete(id=task.id)
+        self.__pending.pop(task.id, None)
+        self.__running.pop(task.id, None)
+        self.__unindex(task.id)
+
+    def __get(self, id: str) -> Optional[Task]:
+        task = self.__pending.get(id)
+        if task is None:
+            task = self.__running.get(id)
+        return task
+
+    def __store(self, task: Task):
+        """
+        Puts a task in the partition matching its state, moving it out of the other one if needed
+        """
+        if task.is_running:
+            self.__pending.pop(task.id, None)
+            self.__running[task.id] = task
+        else:
+            self.__running.pop(task.id, None)
+            self.__pending[task.id] = task
+
+        key = task_cursor_key(task)
+        values = (task.created_by, task.is_running, int(task.priority))
+        if self.__indexed.get(task.id) == (key, values):
+            return
+
+        self.__unindex(task.id)
+        self.__indexed[task.id] = (key, values)
+        for index_filter in get_index_filters(values):
+            insort(self.__indexes.setdefault(index_filter, []), key)
+
+    def __unindex(self, id: str):
+        indexed = self.__indexed.pop(id, None)
+        if indexed is None:
+            return
+
+        key, values = indexed
+        for index_filter in get_index_filters(values):
+            keys = self.__indexes[index_filter]
+            del keys[bisect_left(keys, key)]
+            if len(keys) < 1:
+                self.__indexes.pop(index_filter)
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import sqlite3
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+from taskflow.model.task import (
+    Task,
+    TaskObservedUsage,
+    TaskPriority,
+    TaskResourceUsage,
+)
+from .mem import InMemoryDb
+
+
+def load_task(data: str) -> Task:
+    """
+    Rebuilds a task stored by :class:`SqliteDb`. Stored tasks were validated before being written,
+    so validation is skipped, which makes loading a large queue several times faster
+
+    :param data: The task's JSON
+    :rtype: Task
+    """
+    d = json.loads(data)
+    d["priority"] = TaskPriority(d["priority"])
+    d["usage"] = TaskResourceUsage.construct(**d["usage"])
+    if d.get("observed") is not None:
+        d["observed"] = TaskObservedUsage.construct(**d["observed"])
+    return Task.construct(**d)
+
+
+class SqliteDb(InMemoryDb):
+    """
+    SQLite-backed implementation of ITaskflowDB.
+
+    All tasks are kept in memory to serve queries. On startup, running tasks are loaded back from the
+    database file, while pending tasks stay on disk until their client reconnects
+    (see :meth:`get_restored_task`), so that startup time does not depend on the size of the queue.
+    Writes are coalesced per task and flushed in batches on a dedicated thread,
+    so the event loop never waits on disk.
+
+    :param path: Path to the database file
+    :param flush_interval_s: Time in seconds during which writes are batched before being flushed
+    """
+
+    def __init__(self, path: str, flush_interval_s: float = 0.05) -> None:
+        super().__init__()
+        self.path = path
+        self.flush_interval_s = flush_interval_s
+
+        self.__conn: Optional[sqlite3.Connection] = None
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        # Task id -> latest version of the task, or None if it was deleted
+        self.__pending_writes: Dict[str, Optional[Task]] = {}
+        self.__flush_task: Optional[asyncio.Future] = None
+        self.__restored_count = 0
+
+    async def init(self):
+        # A single worker thread owns the connection, which also keeps writes ordered
+        self.__executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="taskflow-sqlite"
+        )
+        loop = asyncio.get_event_loop()
+        tasks, self.__restored_count = await loop.run_in_executor(
+            self.__executor, self.__open
+        )
+
+        self._load(tasks)
+        logger.info(
+            f"Loaded {len(tasks)} running tasks from {self.path}, "
+            f"{self.__restored_count} pending tasks wait for their client"
+        )
+
+    async def shutdown(self):
+        if self.__executor is None:
+            return
+
+        if self.__flush_task is not None:
+            await self.__flush_task
+        await self.flush()
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.__executor, self.__close)
+        self.__executor.shutdown()
+        self.__executor = None
+
+    async def insert_task(self, task: Task):
+        await super().insert_task(task)
+        self.__write(task.id, task)
+
+    async def update_task(self, task: Task):
+        await super().update_task(task)
+        self.__write(task.id, task)
+
+    async def delete_task(self, task: Task):
+        await super().delete_task(task)
+        self.__write(task.id, None)
+
+    async def get_restored_task(self, id: str) -> Optional[Task]:
+        if self.__executor is None or id in self.__pending_writes:
+            return None
+        if await self.get_task_by_id(id) is not None:
+            return None
+
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(self.__executor, self.__select_pending, id)
+        return load_task(data) if data is not None else None
+
+    async def get_restored_tasks_count(self) -> int:
+        return self.__restored_count
+
+    async def drop_restored_tasks(self) -> int:
+        if self.__executor is None:
+            return 0
+
+        loop = asyncio.get_event_loop()
+        ids = await loop.run_in_executor(self.__executor, self.__select_pending_ids)
+        # Pending tasks of this run are all in memory, or being deleted
+        dropped = [
+            id
+            for id in ids
+            if id not in self.__pending_writes and await self.get_task_by_id(id) is None
+        ]
+        for id in dropped:
+            self.__write(id, None)
+        self.__restored_count = 0
+        return len(dropped)
+
+    async def flush(self):
+        """
+        Writes all pending changes to the database file
+        """
+        if len(self.__pending_writes) < 1 or self.__executor is None:
+            return
+
+        writes = self.__pending_writes
+        self.__pending_writes = {}
+
+        # Serialize on the loop thread, so the worker never sees a task being modified
+        upserts: List[Tuple] = []
+        deletes: List[Tuple] = []
+        for task_id, task in writes.items():
+            if task is None:
+                deletes.append((task_id,))
+            else:
+                upserts.append(
+                    (
+                        task.id,
+                        task.created_at,
+                        task.created_by,
+                        int(task.is_running),
+                        task.json(),
+                    )
+                )
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.__executor, self.__commit, upserts, deletes)
+
+    def __write(self, task_id: str, task: Optional[Task]):
+        self.__pending_writes[task_id] = task
+        if self.__flush_task is None and self.__executor is not None:
+            self.__flush_task = asyncio.ensure_future(self.__delayed_flush())
+
+    async def __delayed_flush(self):
+        try:
+            # Writes made while a batch is committing go into the next batch
+            while len(self.__pending_writes) > 0:
+                await asyncio.sleep(self.flush_interval_s)
+                await self.flush()
+        except Exception:
+            logger.exception("Failed to write tasks to database")
+        finally:
+            self.__flush_task = None
+
+    def __open(self) -> Tuple[List[Task], int]:
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id TEXT PRIMARY KEY, "
+            "created_at INTEGER NOT NULL, "
+            "created_by TEXT NOT NULL, "
+            "is_running INTEGER NOT NULL, "
+            "data TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_is_running ON tasks (is_running)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_created_by ON tasks (created_by)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at)"
+        )
+        conn.commit()
+        self.__conn = conn
+
+        cursor = conn.execute(
+            "SELECT data FROM tasks WHERE is_running = 1 ORDER BY created_at, id"
+        )
+        tasks = [load_task(row[0]) for row in cursor]
+        (pending_count,) = conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE is_running = 0"
+        ).fetchone()
+        return tasks, pending_count
+
+    def __select_pending(self, id: str) -> Optional[str]:
+        assert self.__conn is not None
+        row = self.__conn.execute(
+            "SELECT data FROM tasks WHERE id = ? AND is_running = 0", (id,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def __select_pending_ids(self) -> List[str]:
+        assert self.__conn is not None
+        cursor = self.__conn.execute("SELECT id FROM tasks WHERE is_running = 0")
+        return [row[0] for row in cursor]
+
+    def __commit(self, upserts: List[Tuple], deletes: List[Tuple]):
+        assert self.__conn is not None
+        with self.__conn:
+            if len(upserts) > 0:
+                self.__conn.executemany(
+                    "INSERT OR REPLACE INTO tasks "
+                    "(id, created_at, created_by, is_running, data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    upserts,
+                )
+            if len(deletes) > 0:
+                self.__conn.executemany("DELETE FROM tasks WHERE id = ?", deletes)
+
+    def __close(self):
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
@@ -2,13 +2,28 @@
 Simple dependency injection module
 """
 
-from typing import Optional
+from typing import List, Optional
 
-from taskflow.model.settings import TaskflowSettings
+from taskflow.archive import TaskArchive
+from taskflow.model.settings import DbBackend, GpuProbe, MemoryProbe, TaskflowSettings
 from taskflow.model.state import SystemState
+from taskflow.probe.base import IResourceProbe
+from taskflow.probe.cgroup import (
+    CgroupMemoryProbe,
+    find_cgroup_dir,
+    find_cgroup_mount,
+)
+from taskflow.probe.file import FileProbe
+from taskflow.probe.host import HostMemoryProbe
+from taskflow.probe.nvml import NvmlProbe
 from taskflow.db.base import ITaskflowDb
 from taskflow.db.mem import InMemoryDb
+from taskflow.db.sqlite import SqliteDb
+from taskflow.estimator import ResourceEstimator
+from taskflow.hub import UpdateHub
 from taskflow.utils import check_has_nvml
+from taskflow.sampler import TaskUsageSampler
+from taskflow.tracing import Tracer
 from taskflow.scheduler import TaskScheduler
 
 __settings: Optional[TaskflowSettings] = None
@@ -16,32 +31,143 @@ __nvml_available: bool = check_has_nvml()
 __state: Optional[SystemState] = None
 __db: Optional[ITaskflowDb] = None
 __scheduler: Optional[TaskScheduler] = None
+__hub: Optional[UpdateHub] = None
+__archive: Optional[TaskArchive] = None
+__sampler: Optional[TaskUsageSampler] = None
+__estimator: Optional[ResourceEstimator] = None
+__tracer: Optional[Tracer] = None
 
 
-def init(settings_path="/etc/taskflow/settings.yml"):
+def init_settings(settings_path="/etc/taskflow/settings.yml"):
     """
-    Initializes globals using the specified settings
+    Only loads the settings, for clients of the daemon that need nothing else
 
     :type settings_path: str, optional
     """
-
     global __settings
     with open(settings_path, "rt") as f:
         __settings = TaskflowSettings.from_yaml(f)
 
+
+def init(
+    settings_path="/etc/taskflow/settings.yml",
+    system_state: Optional[SystemState] = None,
+):
+    """
+    Initializes the daemon's globals using the specified settings
+
+    :type settings_path: str, optional
+    :param system_state: State to schedule tasks against instead of the local system's, eg. for benchmarks
+    :type system_state: Optional[SystemState], optional
+    """
+    init_settings(settings_path)
+
     global __state
-    __state = SystemState(gpu_available=nvml_available())
+    __state = (
+        system_state
+        if system_state is not None
+        else SystemState(gpu_available=nvml_available(), probes=create_probes())
+    )
 
     global __db
-    __db = InMemoryDb()
+    if settings().db_backend == DbBackend.SQLITE:
+        __db = SqliteDb(path=settings().db_path)
+    else:
+        __db = InMemoryDb()
+
+    global __tracer
+    __tracer = Tracer(
+        path=settings().trace_dir,
+        enabled=settings().trace_enabled and settings().trace_dir is not None,
+        max_bytes=settings().trace_max_bytes,
+        backup_count=settings().trace_backup_count,
+    )
 
     global __scheduler
-    __scheduler = TaskScheduler(
-        state=state(),
+    __scheduler = TaskScheduler.from_settings(
+        settings(), state=state(), db=db(), tracer=tracer()
+    )
+
+    global __hub
+    __hub = UpdateHub(db=db())
+
+    global __archive
+    __archive = TaskArchive(
+        path=settings().archive_dir, retention_days=settings().task_retention_days
+    )
+
+    global __sampler
+    __sampler = TaskUsageSampler(
         db=db(),
-        reserved_memory_bytes=settings().reserved_memory_bytes,
-        reserved_gpu_memory_bytes=settings().reserved_gpu_memory_bytes,
+        interval_s=settings().usage_sample_interval,
+        gpu_available=nvml_available(),
+        ramp_up_interval_s=settings().ramp_up_sample_interval,
+        ramping=scheduler().is_ramping_up,
+        on_sample=scheduler().task_sampled,
     )
+    # Measure started tasks right away, to notice early when they have ramped up
+    scheduler().on_ramp_up = sampler().wake
+
+    global __estimator
+    __estimator = ResourceEstimator(
+        path=settings().estimator_path, percentile=settings().estimate_percentile
+    )
+
+
+def create_probes() -> List[IResourceProbe]:
+    """
+    Creates the resource probes selected in the settings
+
+    :raises ValueError: If a selected probe is not available on this system
+    :rtype: List[IResourceProbe]
+    """
+    probes: List[IResourceProbe] = []
+
+    memory_probe = settings().memory_probe
+    if memory_probe in [MemoryProbe.AUTO, MemoryProbe.CGROUP]:
+        cgroup_root = find_cgroup_mount()
+        cgroup_path = settings().cgroup_path or find_cgroup_dir()
+        if cgroup_path is None:
+            if memory_probe == MemoryProbe.CGROUP:
+                raise ValueError("No cgroup v2 hierarchy found")
+            memory_probe = MemoryProbe.HOST
+        elif memory_probe == MemoryProbe.AUTO:
+            memory_probe = (
+                MemoryProbe.CGROUP
+                if CgroupMemoryProbe.has_limit(cgroup_path, root=cgroup_root)
+                else MemoryProbe.HOST
+            )
+
+        if memory_probe == MemoryProbe.CGROUP:
+            try:
+                probes.append(
+                    CgroupMemoryProbe(
+                        cgroup_path, root=cgroup_root, host=HostMemoryProbe()
+                    )
+                )
+            except ValueError:
+                if settings().memory_probe == MemoryProbe.CGROUP:
+                    raise
+                memory_probe = MemoryProbe.HOST
+
+    if memory_probe == MemoryProbe.HOST:
+        probes.append(HostMemoryProbe())
+
+    gpu_probe = settings().gpu_probe
+    if gpu_probe == GpuProbe.NVML and not nvml_available():
+        raise ValueError("NVML is not available")
+    if gpu_probe == GpuProbe.NVML or (gpu_probe == GpuProbe.AUTO and nvml_available()):
+        probes.append(NvmlProbe())
+
+    if MemoryProbe.FILE == memory_probe or GpuProbe.FILE == gpu_probe:
+        probes.append(
+            FileProbe(
+                settings().probe_file,
+                memory=memory_probe == MemoryProbe.FILE,
+                gpu=gpu_probe == GpuProbe.FILE,
+            )
+        )
+    return probes
 
 
 def settings() -> TaskflowSettings:
@@ -68,5 +194,35 @@ def scheduler() -> TaskScheduler:
     return __scheduler
 
 
+def hub() -> UpdateHub:
+    if __hub is None:
+        raise ValueError("Value not initialized")
+    return __hub
+
+
+def archive() -> TaskArchive:
+    if __archive is None:
+        raise ValueError("Value not initialized")
+    return __archive
+
+
+def sampler() -> TaskUsageSampler:
+    if __sampler is None:
+        raise ValueError("Value not initialized")
+    return __sampler
+
+
+def estimator() -> ResourceEstimator:
+    if __estimator is None:
+        raise ValueError("Value not initialized")
+    return __estimator
+
+
+def tracer() -> Tracer:
+    if __tracer is None:
+        raise ValueError("Value not initialized")
+    return __tracer
+
+
 def nvml_available() -> bool:
     return __nvml_available
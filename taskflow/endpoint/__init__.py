@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 
-from . import task
+from . import history, metrics, task, tracing, user
 
 
 def bind_app(app: FastAPI):
@@ -11,3 +11,7 @@ def bind_app(app: FastAPI):
     """
 
     app.include_router(task.router, prefix="/tasks")
+    app.include_router(history.router, prefix="/tasks/history")
+    app.include_router(user.router, prefix="/users")
+    app.include_router(metrics.router)
+    app.include_router(tracing.router, prefix="/tracing")
@@ -0,0 +1,51 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from taskflow import di
+from taskflow.archive import TaskArchive
+from taskflow.model.history import TaskRecord, TaskRecordList
+
+router = APIRouter()
+
+
+@router.get("/search", response_model=TaskRecordList)
+async def search_history(
+    created_by: Optional[str] = Query(None),
+    failed: Optional[bool] = Query(None),
+    since: Optional[int] = Query(None),
+    until: Optional[int] = Query(None),
+    size: int = Query(20),
+    cursor: Optional[str] = Query(None),
+    archive: TaskArchive = Depends(di.archive),
+):
+    """
+    Search endpoint for finished tasks, most recent first
+    """
+    if not archive.enabled:
+        raise HTTPException(404, detail="ARCHIVE_DISABLED")
+
+    try:
+        return await archive.search(
+            created_by=created_by,
+            failed=failed,
+            since=since,
+            until=until,
+            size=size,
+            cursor=cursor,
+        )
+    except ValueError:
+        raise HTTPException(400, detail="INVALID_CURSOR")
+
+
+@router.get("/id/{task_id}", response_model=TaskRecord)
+async def get_record_by_id(task_id: str, archive: TaskArchive = Depends(di.archive)):
+    """
+    Endpoint for getting the archived record of a finished task
+    """
+    if not archive.enabled:
+        raise HTTPException(404, detail="ARCHIVE_DISABLED")
+
+    record = await archive.get(task_id)
+    if record is None:
+        raise HTTPException(404, detail="TASK_NOT_FOUND")
+    return record
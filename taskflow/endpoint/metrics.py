@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from taskflow import metrics
+
+router = APIRouter()
+
+# The charset is appended by the response
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Endpoint for scraping daemon metrics, in the Prometheus text format
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=CONTENT_TYPE)
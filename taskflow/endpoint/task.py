@@ -1,5 +1,6 @@
-from taskflow.utils import get_timestamp_ms
-from typing import Optional
+import asyncio
+
+from typing import Dict, Optional
 from fastapi import (
     APIRouter,
     Depends,
@@ -7,15 +8,21 @@ from fastapi import (
     WebSocketDisconnect,
     Query,
     HTTPException,
+    status,
 )
 from loguru import logger
 from websockets.exceptions import ConnectionClosed
 
-from taskflow import di
-from taskflow.model.task import Task, NewTask, TaskList
+from taskflow import di, metrics
+from taskflow.archive import TaskArchive
+from taskflow.estimator import ResourceEstimator, get_usage_report
+from taskflow.model.task import Task, NewTask, TaskList, TaskPriority
 from taskflow.db.base import ITaskflowDb
+from taskflow.hub import UpdateHub
+from taskflow.model.estimate import ResourceEstimate
 from taskflow.scheduler import TaskScheduler
-from taskflow.model.ws import ClientUpdateInfo, MessageType, SocketMessage
+from taskflow.tracing import Tracer
+from taskflow.model.ws import MessageType, SocketMessage, TaskFinishInfo
 
 router = APIRouter()
 
@@ -24,20 +31,42 @@ router = APIRouter()
 async def search_tasks(
     created_by: Optional[str] = Query(None),
     is_running: Optional[bool] = Query(None),
+    priority: Optional[TaskPriority] = Query(None),
     start: int = Query(0),
     size: int = Query(20),
+    cursor: Optional[str] = Query(None),
     db: ITaskflowDb = Depends(di.db),
+    scheduler: TaskScheduler = Depends(di.scheduler),
 ):
     """
     Search endpoint for tasks
     """
-    return await db.search_tasks(
-        created_by=created_by, is_running=is_running, start=start, size=size
-    )
+    try:
+        task_list = await db.search_tasks(
+            created_by=created_by,
+            is_running=is_running,
+            priority=priority,
+            start=start,
+            size=size,
+            cursor=cursor,
+        )
+    except ValueError:
+        raise HTTPException(400, detail="INVALID_CURSOR")
+
+    # Penalties are the same for every task, and cost a pass over every user
+    penalties = scheduler.priority_penalties(scheduler.clock.monotonic())
+    task_list.tasks = [
+        with_effective_priority(t, scheduler, penalties) for t in task_list.tasks
+    ]
+    return task_list
 
 
 @router.get("/id/{task_id}", response_model=Task)
-async def get_task_by_id(task_id: str, db: ITaskflowDb = Depends(di.db)):
+async def get_task_by_id(
+    task_id: str,
+    db: ITaskflowDb = Depends(di.db),
+    scheduler: TaskScheduler = Depends(di.scheduler),
+):
     """
     Endpoint for getting a single task by its id
     """
@@ -45,7 +74,57 @@ async def get_task_by_id(task_id: str, db: ITaskflowDb = Depends(di.db)):
 
     if task is None:
         raise HTTPException(404, detail="TASK_NOT_FOUND")
-    return task
+    return with_effective_priority(task, scheduler)
+
+
+@router.get("/estimate", response_model=ResourceEstimate)
+async def estimate_resources(
+    cmd: str = Query(...),
+    created_by: str = Query(...),
+    cwd: Optional[str] = Query(None),
+    estimator: ResourceEstimator = Depends(di.estimator),
+):
+    """
+    Endpoint for getting the resources a command is expected to use, learned from its previous runs
+    """
+    estimate = estimator.estimate(created_by=created_by, cmd=cmd, cwd=cwd)
+
+    if estimate is None:
+        raise HTTPException(404, detail="NO_ESTIMATE")
+    return estimate
+
+
+def with_effective_priority(
+    task: Task,
+    scheduler: TaskScheduler,
+    penalties: Optional[Dict[str, float]] = None,
+) -> Task:
+    """
+    Get a copy of a task with its effective priority filled, if it is pending
+
+    :type task: Task
+    :type scheduler: TaskScheduler
+    :param penalties: Fair-share penalties shared by the tasks of a request, computed if None
+    :type penalties: Optional[Dict[str, float]]
+    :rtype: Task
+    """
+    if task.is_running:
+        return task
+    priority = scheduler.effective_priority(task, penalties)
+    return task.copy(update={"effective_priority": priority})
+
+
+async def get_stored_task(db: ITaskflowDb, task: Task) -> Task:
+    """
+    Get the stored version of a task, which holds the usage measured by the sampler
+
+    :type db: ITaskflowDb
+    :type task: Task
+    :return: The stored task, or the given one if it is not stored anymore
+    :rtype: Task
+    """
+    stored = await db.get_task_by_id(task.id)
+    return stored if stored is not None else task
 
 
 @router.websocket("/start")
@@ -53,12 +132,19 @@ async def handle_task(
     websocket: WebSocket,
     db: ITaskflowDb = Depends(di.db),
     scheduler: TaskScheduler = Depends(di.scheduler),
+    hub: UpdateHub = Depends(di.hub),
+    archive: TaskArchive = Depends(di.archive),
+    estimator: ResourceEstimator = Depends(di.estimator),
+    tracer: Tracer = Depends(di.tracer),
 ):
     """
     Websocket endpoint for starting a task
     """
 
     task = None
+    receive: Optional[asyncio.Future] = None
+    exit_code: Optional[int] = None
+    metrics.OPEN_WEBSOCKETS.inc()
     try:
         await websocket.accept()
 
@@ -66,48 +152,92 @@ async def handle_task(
         data = await websocket.receive_json()
         new_task = NewTask.parse_obj(data)
 
-        task_ = new_task.to_task()
-        await db.insert_task(task_)
+        unavailable = scheduler.unavailable_resources(new_task.usage)
+        if len(unavailable) > 0:
+            # The task could never start
+            logger.warning(f"Rejected task requesting {', '.join(unavailable)}")
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            metrics.OPEN_WEBSOCKETS.dec()
+            return
+
+        # Resume a task restored after a daemon restart, if possible
+        task_ = None
+        if new_task.id is not None:
+            task_ = await scheduler.reattach(
+                new_task.id, new_task.created_by, new_task.cmd
+            )
+
+        if task_ is None:
+            task_ = new_task.to_task()
+            await db.insert_task(task_)
+            scheduler.submit(task_)
         task = task_
+        tracer.task_submitted(task)
 
         # Sends the resolved task
         await websocket.send_text(task.json())
 
-        # Waits for execution and sends updates periodically
-        while True:
-            pending_tasks_count = await db.get_pending_tasks_count()
-            running_tasks_count = await db.get_running_tasks_count()
-            message = SocketMessage(
-                type=MessageType.INFO_UPDATE,
-                data=ClientUpdateInfo(
-                    pending_tasks_count=pending_tasks_count,
-                    running_tasks_count=running_tasks_count,
-                ),
-            )
-            await websocket.send_text(message.json())
+        # Waits for execution, while the hub sends queue updates
+        hub.notify()
+        await hub.subscribe(websocket)
+        try:
+            start_future = scheduler.wait_for_start(task)
+            while not start_future.done():
+                # Also listen to the client, to notice if it goes away
+                if receive is None:
+                    receive = asyncio.ensure_future(websocket.receive_json())
+                await asyncio.wait(
+                    [start_future, receive], return_when=asyncio.FIRST_COMPLETED
+                )
+                if receive.done() and not start_future.done():
+                    # Raises if the client disconnected, other messages are ignored until start
+                    receive.result()
+                    receive = None
+        finally:
+            hub.unsubscribe(websocket)
 
-            # Check if the task can be executed
-            can_start = await scheduler.wait_for_task_execution(task)
-            if can_start:
-                message = SocketMessage(type=MessageType.TASK_CAN_START)
-                await websocket.send_text(message.json())
+        message = SocketMessage(
+            type=MessageType.TASK_CAN_START, data=start_future.result()
+        )
+        await websocket.send_text(message.json())
+        tracer.task_start_sent(task)
 
-                task.is_running = True
-                task.started_at = get_timestamp_ms()
-                await db.update_task(task)
-
-                break
+        # The start time was set by the scheduler
+        task.is_running = True
+        await db.update_task(task)
+        hub.notify()
 
         # Wait for task finish
         can_finish = False
         while not can_finish:
-            data = await websocket.receive_json()
+            if receive is None:
+                receive = asyncio.ensure_future(websocket.receive_json())
+            data = await receive
+            receive = None
             try:
                 message = SocketMessage.parse_obj(data)
                 if message.type == MessageType.TASK_FINISH:
                     can_finish = True
+                    if message.data is not None:
+                        exit_code = TaskFinishInfo.parse_obj(message.data).exit_code
+                    task = await get_stored_task(db, task)
+
+                    # Failed runs may have stopped before reaching their usual peak
+                    if exit_code == 0:
+                        estimator.record(task)
+
+                    report = get_usage_report(task)
+                    if report is not None:
+                        message = SocketMessage(
+                            type=MessageType.TASK_REPORT, data=report
+                        )
+                        await websocket.send_text(message.json())
                 elif message.type == MessageType.TASK_UPDATE:
-                    task = Task.parse_obj(message.data)
+                    # Only take the fields owned by the client
+                    client_task = Task.parse_obj(message.data)
+                    task = await get_stored_task(db, task)
+                    task.pid = client_task.pid
+                    tracer.task_updated(task)
                     logger.debug(task.json())
                     await db.update_task(task)
             except ValueError:
@@ -121,8 +251,16 @@ async def handle_task(
         await websocket.close()
 
     # Cleanup
+    metrics.OPEN_WEBSOCKETS.dec()
+    if receive is not None:
+        receive.cancel()
     if task is not None:
         logger.info(f"Task {task.id} finished")
+        tracer.task_finished(task, exit_code)
+        if task.is_running:
+            await archive.append(task, exit_code)
         await db.delete_task(task)
+        scheduler.task_finished(task)
+        hub.notify()
 
     del task
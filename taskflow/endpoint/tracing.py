@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from taskflow import di
+from taskflow.model.tracing import TracingStatus
+from taskflow.tracing import Tracer
+
+router = APIRouter()
+
+
+def get_status(tracer: Tracer) -> TracingStatus:
+    return TracingStatus(enabled=tracer.enabled, path=tracer.file_path)
+
+
+@router.get("", response_model=TracingStatus)
+async def get_tracing(tracer: Tracer = Depends(di.tracer)):
+    """
+    Endpoint for getting the tracing status
+    """
+    return get_status(tracer)
+
+
+@router.post("/enable", response_model=TracingStatus)
+async def enable_tracing(tracer: Tracer = Depends(di.tracer)):
+    """
+    Endpoint for starting to record task lifecycle traces
+    """
+    try:
+        tracer.enable()
+    except ValueError:
+        raise HTTPException(404, detail="TRACING_DISABLED")
+    return get_status(tracer)
+
+
+@router.post("/disable", response_model=TracingStatus)
+async def disable_tracing(tracer: Tracer = Depends(di.tracer)):
+    """
+    Endpoint for stopping to record task lifecycle traces
+    """
+    tracer.disable()
+    return get_status(tracer)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+
+from taskflow import di
+from taskflow.model.user import UserUsageList
+from taskflow.scheduler import TaskScheduler
+
+router = APIRouter()
+
+
+@router.get("/usage", response_model=UserUsageList)
+async def get_user_usage(scheduler: TaskScheduler = Depends(di.scheduler)):
+    """
+    Endpoint for getting the fair-share usage of every user
+    """
+    return UserUsageList(users=scheduler.user_usage())
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import math
+import os
+import shlex
+
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+from loguru import logger
+
+from taskflow.model.estimate import ResourceEstimate
+from taskflow.model.task import Task
+from taskflow.model.ws import TaskUsageReport
+
+# Peak main memory, peak memory on a single GPU, number of GPUs used
+RunPeaks = Tuple[int, int, int]
+
+# A resource is reported as over-declared when the declared amount is at least
+# this many times the peak, and wastes at least MIN_WASTED_BYTES
+OVER_DECLARED_RATIO = 2
+MIN_WASTED_BYTES = 512 * (1024**2)
+
+
+def normalize_cmd(cmd: str) -> str:
+    """
+    Normalizes a command line, so that quoting and spacing differences do not matter
+
+    :type cmd: str
+    :rtype: str
+    """
+    try:
+        return " ".join(shlex.split(cmd))
+    except ValueError:
+        return " ".join(cmd.split())
+
+
+def profile_key(created_by: str, cmd: str, cwd: Optional[str]) -> str:
+    return "\0".join([created_by, cwd or "", normalize_cmd(cmd)])
+
+
+def percentile(values: List[int], p: float) -> int:
+    """
+    Nearest-rank percentile of a list of values
+
+    :param p: Percentile, between 0 and 100
+    :rtype: int
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def get_usage_report(task: Task) -> Optional[TaskUsageReport]:
+    """
+    Compares the declared usage of a finished task with its measured peaks
+
+    :type task: Task
+    :return: A report if any resource was over-declared, None otherwise
+    :rtype: Optional[TaskUsageReport]
+    """
+    observed = task.observed
+    if observed is None or observed.samples_count < 1:
+        return None
+
+    def is_over_declared(declared: int, peak: int) -> bool:
+        return declared >= OVER_DECLARED_RATIO * peak and (
+            declared - peak >= MIN_WASTED_BYTES
+        )
+
+    over_declared = False
+    declared_memory = task.usage.memory_bytes
+    if declared_memory is not None:
+        over_declared = is_over_declared(declared_memory, observed.memory_peak_bytes)
+
+    declared_gpu_memory = task.gpu_assignment or {}
+    for gpu_id, declared in declared_gpu_memory.items():
+        peak = observed.gpu_memory_peak_bytes.get(gpu_id, 0)
+        over_declared = over_declared or is_over_declared(declared, peak)
+
+    if not over_declared:
+        return None
+
+    return TaskUsageReport(
+        declared_memory_bytes=declared_memory,
+        peak_memory_bytes=observed.memory_peak_bytes,
+        declared_gpu_memory_bytes=declared_gpu_memory,
+        peak_gpu_memory_bytes=observed.gpu_memory_peak_bytes,
+    )
+
+
+class ResourceEstimator:
+    """
+    Learns the resource profile of commands from the peaks measured in their previous runs.
+
+    Profiles are keyed by user, working directory and normalized command line,
+    and hold the peaks of the last ``MAX_RUNS`` successful runs. The estimate for a command
+    is a high percentile of those peaks, plus some headroom.
+
+    :param path: JSON file in which profiles are saved, or None to keep them in memory only
+    :param percentile: Percentile of the previous peaks used as the estimate
+    :param headroom: Fraction added on top of the percentile
+    """
+
+    MAX_RUNS = 20
+    MAX_PROFILES = 10000
+    SAVE_DELAY_S = 5
+
+    def __init__(
+        self, path: Optional[str] = None, percentile: float = 95, headroom: float = 0.1
+    ) -> None:
+        self.path = path
+        self.percentile = percentile
+        self.headroom = headroom
+
+        # Least recently updated profiles first
+        self.__profiles: "OrderedDict[str, Deque[RunPeaks]]" = OrderedDict()
+        self.__save_task: Optional[asyncio.Future] = None
+        self.__dirty = False
+
+    def __len__(self) -> int:
+        return len(self.__profiles)
+
+    async def init(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+
+        loop = asyncio.get_event_loop()
+        try:
+            data = await loop.run_in_executor(None, self.__read)
+        except (OSError, ValueError):
+            logger.exception(f"Cannot load resource profiles from {self.path}")
+            return
+
+        for key, runs in data.get("profiles", {}).items():
+            self.__profiles[key] = deque((tuple(r) for r in runs), maxlen=self.MAX_RUNS)
+        logger.info(f"Loaded {len(self.__profiles)} resource profiles")
+
+    async def shutdown(self):
+        if self.__save_task is not None:
+            self.__save_task.cancel()
+            self.__save_task = None
+
+        try:
+            await self.save()
+        except OSError:
+            logger.exception("Failed to save resource profiles")
+
+    def record(self, task: Task):
+        """
+        Adds the measured peaks of a successfully finished task to its command's profile
+
+        :type task: Task
+        """
+        observed = task.observed
+        if observed is None or observed.samples_count < 1:
+            return
+
+        gpu_peaks = [p for p in observed.gpu_memory_peak_bytes.values() if p > 0]
+        peaks = (
+            observed.memory_peak_bytes,
+            max(gpu_peaks, default=0),
+            len(gpu_peaks),
+        )
+
+        key = profile_key(task.created_by, task.cmd, task.cwd)
+        runs = self.__profiles.pop(key, None)
+        if runs is None:
+            runs = deque(maxlen=self.MAX_RUNS)
+        runs.append(peaks)
+        self.__profiles[key] = runs
+
+        while len(self.__profiles) > self.MAX_PROFILES:
+            self.__profiles.popitem(last=False)
+
+        self.__dirty = True
+
+        if self.path is not None and self.__save_task is None:
+            self.__save_task = asyncio.ensure_future(self.__delayed_save())
+
+    def estimate(
+        self, created_by: str, cmd: str, cwd: Optional[str]
+    ) -> Optional[ResourceEstimate]:
+        """
+        Estimates the resources a command will use, from its previous runs
+
+        :type created_by: str
+        :type cmd: str
+        :type cwd: Optional[str]
+        :return: The estimate, or None if the command never ran successfully
+        :rtype: Optional[ResourceEstimate]
+        """
+        runs = self.__profiles.get(profile_key(created_by, cmd, cwd))
+        if runs is None or len(runs) < 1:
+            return None
+
+        memory_bytes = percentile([r[0] for r in runs], self.percentile)
+        gpu_memory_bytes = percentile([r[1] for r in runs], self.percentile)
+
+        return ResourceEstimate(
+            samples_count=len(runs),
+            memory_bytes=self.__with_headroom(memory_bytes),
+            gpu_memory_bytes=(
+                self.__with_headroom(gpu_memory_bytes) if gpu_memory_bytes > 0 else None
+            ),
+            gpu_count=max(1, max(r[2] for r in runs)),
+        )
+
+    async def save(self):
+        """
+        Writes all profiles to the profile file, if they changed
+        """
+        if self.path is None or not self.__dirty:
+            return
+
+        self.__dirty = False
+        data = {"profiles": {k: list(v) for k, v in self.__profiles.items()}}
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.__write, data)
+
+    def __with_headroom(self, value: int) -> int:
+        # Rounded up to a whole MiB
+        mib = 1024**2
+        return math.ceil(value * (1 + self.headroom) / mib) * mib
+
+    async def __delayed_save(self):
+        try:
+            await asyncio.sleep(self.SAVE_DELAY_S)
+        except asyncio.CancelledError:
+            return
+
+        # Changes recorded while writing schedule another save
+        self.__save_task = None
+        try:
+            await self.save()
+        except Exception:
+            logger.exception("Failed to save resource profiles")
+
+    def __read(self) -> dict:
+        assert self.path is not None
+        with open(self.path, "rt") as f:
+            return json.load(f)
+
+    def __write(self, data: dict):
+        assert self.path is not None
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        # Replace the file at once, so a crash never leaves it half-written
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wt") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,82 @@
+import math
+
+from typing import Dict, Iterator, Tuple
+
+from taskflow.model.state import SystemState
+from taskflow.model.task import Task
+
+
+class FairShareTracker:
+    """
+    Tracks the resource-seconds consumed by each user, with exponential decay
+
+    :param half_life_s: Time in seconds after which past usage counts for half
+    """
+
+    # Share charged to tasks that do not declare any usage
+    MIN_TASK_SHARE = 0.01
+
+    def __init__(self, half_life_s: float) -> None:
+        self.half_life_s = half_life_s
+        # User -> (usage at the last update, monotonic time of the last update)
+        self.__usage: Dict[str, Tuple[float, float]] = {}
+
+    def usage(self, user: str, now: float) -> float:
+        """
+        Get the decayed usage of a user
+
+        :type user: str
+        :param now: Current monotonic time in seconds
+        :rtype: float
+        """
+        value, updated_at = self.__usage.get(user, (0.0, now))
+        return value * self.__decay(now - updated_at)
+
+    def charge(self, user: str, amount: float, now: float):
+        """
+        Adds usage to a user
+
+        :type user: str
+        :param amount: Resource-seconds to add
+        :param now: Current monotonic time in seconds
+        """
+        self.__usage[user] = (self.usage(user, now) + amount, now)
+
+    def shares(self, now: float) -> Iterator[Tuple[str, float, float]]:
+        """
+        Iterates over known users
+
+        :param now: Current monotonic time in seconds
+        :return: Tuples of (user, decayed usage, fraction of the total usage)
+        :rtype: Iterator[Tuple[str, float, float]]
+        """
+        usages = [(user, self.usage(user, now)) for user in self.__usage.keys()]
+        total = sum(u for _, u in usages)
+        for user, usage in usages:
+            yield user, usage, (usage / total if total > 0 else 0.0)
+
+    @classmethod
+    def task_share(cls, task: Task, state: SystemState) -> float:
+        """
+        Computes the dominant share of the system a task occupies:
+        the largest fraction among its declared RAM and GPU memory.
+
+        :type task: Task
+        :type state: SystemState
+        :rtype: float
+        """
+        share = cls.MIN_TASK_SHARE
+
+        if task.usage.memory_bytes and state.memory_total_bytes > 0:
+            share = max(share, task.usage.memory_bytes / state.memory_total_bytes)
+
+        gpu_total = sum(state.gpu_memory_total_bytes.values())
+        if task.gpu_assignment and gpu_total > 0:
+            share = max(share, sum(task.gpu_assignment.values()) / gpu_total)
+
+        return min(share, 1.0)
+
+    def __decay(self, elapsed_s: float) -> float:
+        if self.half_life_s <= 0:
+            return 1.0
+        return math.pow(0.5, max(0.0, elapsed_s) / self.half_life_s)
@@ -0,0 +1,118 @@
+import asyncio
+
+from typing import Optional, Set
+from loguru import logger
+from fastapi import WebSocket
+
+from taskflow.db.base import ITaskflowDb
+from taskflow.model.ws import ClientUpdateInfo, MessageType, SocketMessage
+
+
+class UpdateHub:
+    """
+    Broadcasts queue updates to the clients of every pending task.
+
+    The update is computed once per change, serialized once, and sent to all subscribers concurrently,
+    instead of each connection polling the database on its own.
+
+    :param db: An instance of ITaskflowDb holding the tasks
+
+    Changes are signalled through :meth:`notify`, and bursts of changes are coalesced
+    into at most one broadcast every ``MIN_BROADCAST_INTERVAL_S``. The counts are also
+    re-checked every ``REFRESH_INTERVAL_S`` as a fallback for missed events, and only
+    broadcast if they changed.
+    """
+
+    MIN_BROADCAST_INTERVAL_S = 0.1
+    REFRESH_INTERVAL_S = 5
+
+    def __init__(self, db: ITaskflowDb) -> None:
+        self.db = db
+        self.__subscribers: Set[WebSocket] = set()
+        self.__message: Optional[str] = None
+        self.__dirty = asyncio.Event()
+        self.__should_stop = False
+
+    def __len__(self) -> int:
+        return len(self.__subscribers)
+
+    def notify(self):
+        """
+        Signals that the task counts may have changed.
+        Should be called whenever a task is inserted, started or deleted.
+        """
+        self.__dirty.set()
+
+    def stop(self):
+        """
+        Stops the loop
+        """
+        self.__should_stop = True
+        self.__dirty.set()
+
+    async def run(self):
+        """
+        Runs the broadcast loop
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self.__dirty.wait(), self.REFRESH_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+            self.__dirty.clear()
+            if self.__should_stop:
+                break
+
+            try:
+                await self.broadcast()
+            except Exception:
+                logger.exception("Failed to broadcast update")
+            await asyncio.sleep(self.MIN_BROADCAST_INTERVAL_S)
+
+    async def subscribe(self, websocket: WebSocket):
+        """
+        Sends the latest update to a client, and adds it to the broadcast list
+
+        :type websocket: WebSocket
+        """
+        if self.__message is None:
+            self.__message = await self.__compute()
+        await websocket.send_text(self.__message)
+        self.__subscribers.add(websocket)
+
+    def unsubscribe(self, websocket: WebSocket):
+        """
+        Removes a client from the broadcast list
+
+        :type websocket: WebSocket
+        """
+        self.__subscribers.discard(websocket)
+
+    async def broadcast(self):
+        """
+        Computes the current update, and sends it to every subscriber if it changed
+        """
+        message = await self.__compute()
+        if message == self.__message:
+            return
+        self.__message = message
+
+        subscribers = list(self.__subscribers)
+        results = await asyncio.gather(
+            *[ws.send_text(message) for ws in subscribers], return_exceptions=True
+        )
+
+        # Drop clients that went away, their handler cleans up the rest
+        for ws, result in zip(subscribers, results):
+            if isinstance(result, Exception):
+                self.__subscribers.discard(ws)
+
+    async def __compute(self) -> str:
+        message = SocketMessage(
+            type=MessageType.INFO_UPDATE,
+            data=ClientUpdateInfo(
+                pending_tasks_count=await self.db.get_pending_tasks_count(),
+                running_tasks_count=await self.db.get_running_tasks_count(),
+            ),
+        )
+        return message.json()
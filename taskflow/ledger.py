@@ -0,0 +1,328 @@
+from typing import Dict, Optional, Tuple
+
+from taskflow.model.state import SystemState
+from taskflow.model.task import Task
+
+# Usage of a started task is considered to plateau once it grows by less than
+# PLATEAU_TOLERANCE_BYTES over PLATEAU_SAMPLES consecutive samples
+PLATEAU_SAMPLES = 4
+PLATEAU_TOLERANCE_BYTES = 16 * (1024**2)
+
+
+class Reservation:
+    """
+    Resources promised to a running task
+
+    While the task ramps up, the whole promise is held. Afterwards, only the part
+    the task has not used yet according to its last sample is held (see :meth:`unclaimed`).
+
+    :param task_id: Id of the started task
+    :param memory_bytes: Promised amount of main memory
+    :param gpu_memory_bytes: Promised amount of memory for each GPU id
+    :param expires_at: Monotonic time in seconds after which the ramp-up is considered over
+    """
+
+    __slots__ = [
+        "task_id",
+        "memory_bytes",
+        "gpu_memory_bytes",
+        "expires_at",
+        "memory_target",
+        "gpu_memory_targets",
+        "observed_memory_bytes",
+        "observed_gpu_memory_bytes",
+        "stable_samples",
+        "held_memory_bytes",
+        "held_gpu_memory_bytes",
+    ]
+
+    def __init__(
+        self,
+        task_id: str,
+        memory_bytes: int,
+        gpu_memory_bytes: Dict[str, int],
+        expires_at: float,
+    ) -> None:
+        self.task_id = task_id
+        self.memory_bytes = memory_bytes
+        self.gpu_memory_bytes = gpu_memory_bytes
+        self.expires_at = expires_at
+
+        # Free memory values at or below which the promise is considered claimed
+        self.memory_target = 0
+        self.gpu_memory_targets: Dict[str, int] = {}
+
+        # Last usage measured on the task's own processes
+        self.observed_memory_bytes: Optional[int] = None
+        self.observed_gpu_memory_bytes: Dict[str, int] = {}
+        self.stable_samples = 0
+
+        # Amounts currently counted in the ledger's totals
+        self.held_memory_bytes = 0
+        self.held_gpu_memory_bytes: Dict[str, int] = {}
+
+    def is_claimed(self, state: SystemState) -> bool:
+        """
+        Checks if the promised usage has shown up in the system state
+
+        :type state: SystemState
+        :rtype: bool
+        """
+        if self.memory_bytes > 0 and state.memory_free_bytes > self.memory_target:
+            return False
+
+        for gpu_id, target in self.gpu_memory_targets.items():
+            if state.gpu_memory_free_bytes.get(gpu_id, 0) > target:
+                return False
+
+        return True
+
+    def observe(self, memory_bytes: int, gpu_memory_bytes: Dict[str, int]):
+        """
+        Records a usage sample of the task's process tree
+
+        :param memory_bytes: Main memory used by the task
+        :param gpu_memory_bytes: Memory used by the task on each GPU id
+        """
+        grew = self.observed_memory_bytes is None or (
+            memory_bytes - self.observed_memory_bytes > PLATEAU_TOLERANCE_BYTES
+        )
+        for gpu_id, usage_bytes in gpu_memory_bytes.items():
+            previous = self.observed_gpu_memory_bytes.get(gpu_id, 0)
+            grew = grew or usage_bytes - previous > PLATEAU_TOLERANCE_BYTES
+
+        self.stable_samples = 0 if grew else self.stable_samples + 1
+        self.observed_memory_bytes = memory_bytes
+        self.observed_gpu_memory_bytes = dict(gpu_memory_bytes)
+
+    def is_ramped_up(self) -> bool:
+        """
+        Checks if the task's measured usage reached the promised amount, or stopped growing
+
+        :rtype: bool
+        """
+        if self.observed_memory_bytes is None:
+            return False
+        if self.stable_samples >= PLATEAU_SAMPLES:
+            return True
+
+        if self.observed_memory_bytes < self.memory_bytes:
+            return False
+        for gpu_id, usage_bytes in self.gpu_memory_bytes.items():
+            if self.observed_gpu_memory_bytes.get(gpu_id, 0) < usage_bytes:
+                return False
+        return True
+
+    def unclaimed(self) -> Tuple[int, Dict[str, int]]:
+        """
+        Get the part of the promise that the task has not used yet, according to its last sample.
+        Without any sample, the promise is assumed to be fully used.
+
+        :return: Main memory, and memory for each GPU id, in bytes
+        :rtype: Tuple[int, Dict[str, int]]
+        """
+        if self.observed_memory_bytes is None:
+            return 0, {}
+
+        gpu_memory_bytes = {
+            gpu_id: max(0, usage_bytes - self.observed_gpu_memory_bytes.get(gpu_id, 0))
+            for gpu_id, usage_bytes in self.gpu_memory_bytes.items()
+        }
+        return max(0, self.memory_bytes - self.observed_memory_bytes), gpu_memory_bytes
+
+
+class ReservationLedger:
+    """
+    Keeps track of resources promised to running tasks that are not visible in the SystemState.
+
+    A newly started task holds its whole declared usage until it has ramped up, ie. until
+    its usage shows up in the system state, its measured usage reaches the declared amount or
+    stops growing, or its promise expires. For the rest of its lifetime, it holds the declared
+    usage minus its measured usage, so that a task which has not touched its memory yet
+    does not make that memory look free. ``len()`` only counts tasks still ramping up.
+
+    Totals are maintained incrementally so lookups are O(1).
+    """
+
+    def __init__(self) -> None:
+        # Tasks still ramping up
+        self.__reservations: Dict[str, Reservation] = {}
+        # Tasks that have ramped up
+        self.__holds: Dict[str, Reservation] = {}
+        self.__memory_bytes = 0
+        self.__gpu_memory_bytes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.__reservations)
+
+    @property
+    def memory_bytes(self) -> int:
+        """
+        Total amount of promised main memory
+        """
+        return self.__memory_bytes
+
+    def gpu_memory_bytes(self, gpu_id: str) -> int:
+        """
+        Total amount of memory promised on a GPU
+
+        :type gpu_id: str
+        :rtype: int
+        """
+        return self.__gpu_memory_bytes.get(gpu_id, 0)
+
+    def reserve(self, task: Task, state: SystemState, expires_at: float):
+        """
+        Records the declared usage of a task that is about to start.
+        GPU memory is taken from the task's GPU assignment.
+        Tasks that do not declare any usage are not recorded.
+
+        :type task: Task
+        :param state: The current system state, used to detect when the usage has been claimed
+        :param expires_at: Monotonic time in seconds after which the ramp-up is considered over
+        """
+        reservation = self.__create(task, expires_at)
+        if reservation is None:
+            return
+
+        self.__reservations[task.id] = reservation
+        self.__hold(reservation, reservation.memory_bytes, reservation.gpu_memory_bytes)
+
+        # The promise is claimed once free memory drops by the amount of every
+        # promise still outstanding, since those tasks start allocating first
+        reservation.memory_target = state.memory_free_bytes - self.__memory_bytes
+        for gpu_id in reservation.gpu_memory_bytes.keys():
+            reservation.gpu_memory_targets[gpu_id] = state.gpu_memory_free_bytes.get(
+                gpu_id, 0
+            ) - self.gpu_memory_bytes(gpu_id)
+
+    def hold(self, task: Task):
+        """
+        Records the declared usage of a task that has already ramped up, eg. when restoring
+        running tasks. Nothing is held until the task's usage is sampled.
+
+        :type task: Task
+        """
+        reservation = self.__create(task, expires_at=0)
+        if reservation is not None:
+            self.__holds[task.id] = reservation
+
+    def release(self, task_id: str) -> bool:
+        """
+        Drops the promise made to a task
+
+        :type task_id: str
+        :return: True if the task had a promise
+        :rtype: bool
+        """
+        reservation = self.__reservations.pop(task_id, None)
+        if reservation is None:
+            reservation = self.__holds.pop(task_id, None)
+        if reservation is None:
+            return False
+
+        self.__hold(reservation, 0, {})
+        return True
+
+    def observe(
+        self, task_id: str, memory_bytes: int, gpu_memory_bytes: Dict[str, int]
+    ) -> bool:
+        """
+        Records a usage sample of a running task. Ends its ramp-up once its usage
+        reaches the declared amount or stops growing, and updates the unclaimed part
+        of its promise afterwards.
+
+        :type task_id: str
+        :param memory_bytes: Main memory used by the task
+        :param gpu_memory_bytes: Memory used by the task on each GPU id
+        :return: True if the task has just ramped up
+        :rtype: bool
+        """
+        reservation = self.__holds.get(task_id)
+        if reservation is not None:
+            reservation.observe(memory_bytes, gpu_memory_bytes)
+            self.__hold(reservation, *reservation.unclaimed())
+            return False
+
+        reservation = self.__reservations.get(task_id)
+        if reservation is None:
+            return False
+
+        reservation.observe(memory_bytes, gpu_memory_bytes)
+        if not reservation.is_ramped_up():
+            return False
+        self.__end_ramp_up(reservation)
+        return True
+
+    def refresh(self, state: SystemState, now: float) -> int:
+        """
+        Ends the ramp-up of tasks whose promise has expired or shown up in the system state
+
+        :type state: SystemState
+        :param now: Current monotonic time in seconds
+        :return: Number of tasks that ramped up
+        :rtype: int
+        """
+        ramped_up = [
+            r
+            for r in self.__reservations.values()
+            if r.expires_at <= now or r.is_claimed(state)
+        ]
+        for reservation in ramped_up:
+            self.__end_ramp_up(reservation)
+        return len(ramped_up)
+
+    def next_expiry(self) -> Optional[float]:
+        """
+        Get the earliest expiry time among tasks still ramping up
+
+        :return: Monotonic time in seconds, or None if no task is ramping up
+        :rtype: Optional[float]
+        """
+        if len(self.__reservations) < 1:
+            return None
+        return min(r.expires_at for r in self.__reservations.values())
+
+    def __create(self, task: Task, expires_at: float) -> Optional[Reservation]:
+        memory_bytes = task.usage.memory_bytes or 0
+        gpu_memory_bytes = dict(task.gpu_assignment or {})
+
+        if memory_bytes <= 0 and not gpu_memory_bytes:
+            return None
+
+        self.release(task.id)
+        return Reservation(
+            task_id=task.id,
+            memory_bytes=memory_bytes,
+            gpu_memory_bytes=gpu_memory_bytes,
+            expires_at=expires_at,
+        )
+
+    def __end_ramp_up(self, reservation: Reservation):
+        self.__reservations.pop(reservation.task_id)
+        self.__holds[reservation.task_id] = reservation
+        self.__hold(reservation, *reservation.unclaimed())
+
+    def __hold(
+        self,
+        reservation: Reservation,
+        memory_bytes: int,
+        gpu_memory_bytes: Dict[str, int],
+    ):
+        # Replaces the amounts held by a reservation in the totals
+        self.__memory_bytes += memory_bytes - reservation.held_memory_bytes
+        reservation.held_memory_bytes = memory_bytes
+
+        for gpu_id, usage_bytes in reservation.held_gpu_memory_bytes.items():
+            self.__gpu_memory_bytes[gpu_id] -= usage_bytes
+            if self.__gpu_memory_bytes[gpu_id] <= 0:
+                self.__gpu_memory_bytes.pop(gpu_id)
+        reservation.held_gpu_memory_bytes = {
+            gpu_id: usage_bytes
+            for gpu_id, usage_bytes in gpu_memory_bytes.items()
+            if usage_bytes > 0
+        }
+        for gpu_id, usage_bytes in reservation.held_gpu_memory_bytes.items():
+            self.__gpu_memory_bytes[gpu_id] = (
+                self.__gpu_memory_bytes.get(gpu_id, 0) + usage_bytes
+            )
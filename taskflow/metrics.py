@@ -0,0 +1,289 @@
+import asyncio
+import time
+
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from loguru import logger
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """
+    Base class for metrics exposed in the Prometheus text format.
+
+    Values are kept per set of label values, and updated in O(1) on the hot path.
+    Label values are given as a tuple in the order of ``label_names``.
+
+    :param name: Metric name
+    :param documentation: Help text
+    :param label_names: Names of the labels of each sample
+    """
+
+    type_name = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+    def render(self) -> List[str]:
+        """
+        Get the text format lines of the metric
+
+        :rtype: List[str]
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError()
+
+    def _format_labels(
+        self, labels: LabelValues, extra: Optional[Tuple[str, str]] = None
+    ) -> str:
+        pairs = [
+            f'{name}="{escape_label_value(value)}"'
+            for name, value in zip(self.label_names, labels)
+        ]
+        if extra is not None:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        if len(pairs) < 1:
+            return ""
+        return "{" + ",".join(pairs) + "}"
+
+
+class Counter(Metric):
+    """
+    Value that only goes up
+    """
+
+    type_name = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.__values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, labels: LabelValues = ()):
+        self.__values[labels] = self.__values.get(labels, 0) + amount
+
+    def get(self, labels: LabelValues = ()) -> float:
+        return self.__values.get(labels, 0)
+
+    def _render_samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._format_labels(labels)} {format_value(value)}"
+            for labels, value in self.__values.items()
+        ]
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.__values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, labels: LabelValues = ()):
+        self.__values[labels] = value
+
+    def inc(self, amount: float = 1, labels: LabelValues = ()):
+        self.__values[labels] = self.__values.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, labels: LabelValues = ()):
+        self.inc(-amount, labels)
+
+    def get(self, labels: LabelValues = ()) -> float:
+        return self.__values.get(labels, 0)
+
+    def _render_samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._format_labels(labels)} {format_value(value)}"
+            for labels, value in self.__values.items()
+        ]
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values, counted in cumulative buckets
+
+    :param buckets: Upper bounds of the buckets, in increasing order
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # Per label values: count in each bucket (not cumulative), sum of values
+        self.__counts: Dict[LabelValues, List[int]] = {}
+        self.__sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()):
+        counts = self.__counts.get(labels)
+        if counts is None:
+            counts = self.__counts[labels] = [0] * len(self.buckets)
+        counts[bisect_left(self.buckets, value)] += 1
+        self.__sums[labels] = self.__sums.get(labels, 0) + value
+
+    def count(self, labels: LabelValues = ()) -> int:
+        return sum(self.__counts.get(labels, []))
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for labels, counts in self.__counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = self._format_labels(labels, ("le", format_value(bound)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_str = self._format_labels(labels)
+            lines.append(
+                f"{self.name}_sum{label_str} {format_value(self.__sums[labels])}"
+            )
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together
+    """
+
+    def __init__(self) -> None:
+        self.__metrics: List[Metric] = []
+
+    def register(self, metric: M) -> M:
+        self.__metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format
+
+        :rtype: str
+        """
+        lines: List[str] = []
+        for metric in self.__metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+QUEUE_TASKS = REGISTRY.register(
+    Gauge("taskflow_queue_tasks", "Number of pending tasks", ["priority", "user"])
+)
+RUNNING_TASKS = REGISTRY.register(
+    Gauge("taskflow_running_tasks", "Number of running tasks")
+)
+TASKS_STARTED = REGISTRY.register(
+    Counter("taskflow_tasks_started_total", "Number of started tasks")
+)
+QUEUE_WAIT = REGISTRY.register(
+    Histogram(
+        "taskflow_queue_wait_seconds",
+        "Time spent by tasks in the queue before starting",
+        buckets=(1, 5, 15, 60, 300, 900, 3600, 4 * 3600, 24 * 3600),
+    )
+)
+SCHEDULER_PASS = REGISTRY.register(
+    Histogram("taskflow_scheduler_pass_seconds", "Duration of scheduling passes")
+)
+SCHEDULER_PLACEMENTS = REGISTRY.register(
+    Histogram(
+        "taskflow_scheduler_pass_placements",
+        "Number of tasks evaluated for placement in each scheduling pass",
+        buckets=(0, 1, 5, 10, 50, 100, 500, 1000),
+    )
+)
+STATE_PROBE = REGISTRY.register(
+    Histogram("taskflow_state_probe_seconds", "Duration of system state queries")
+)
+OPEN_WEBSOCKETS = REGISTRY.register(
+    Gauge("taskflow_open_websockets", "Number of connected clients")
+)
+EVENT_LOOP_LAG = REGISTRY.register(
+    Histogram(
+        "taskflow_event_loop_lag_seconds",
+        "Delay between when a timer was due on the event loop and when it ran",
+    )
+)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a timer, which grows when a coroutine
+    blocks the loop or when the loop is overloaded
+
+    :param interval_s: Time in seconds between each measurement
+    :param warn_threshold_s: Lag above which a warning is logged
+    """
+
+    def __init__(self, interval_s: float = 0.5, warn_threshold_s: float = 0.5) -> None:
+        self.interval_s = interval_s
+        self.warn_threshold_s = warn_threshold_s
+        self.__stop_signal = asyncio.Event()
+
+    async def run(self):
+        """
+        Runs the measurement loop asynchronously
+        """
+        self.__stop_signal.clear()
+
+        while True:
+            due = time.monotonic() + self.interval_s
+            try:
+                await asyncio.wait_for(self.__stop_signal.wait(), self.interval_s)
+                break
+            except asyncio.TimeoutError:
+                pass
+
+            lag = max(0, time.monotonic() - due)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag > self.warn_threshold_s:
+                logger.warning(f"Event loop lagged by {lag:.3f}s")
+
+    def stop(self):
+        """
+        Stop the current loop
+        """
+        self.__stop_signal.set()
@@ -0,0 +1,16 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ResourceEstimate(BaseModel):
+    """
+    Resource usage expected for a command, learned from its previous runs
+    """
+
+    # Number of previous runs the estimate is based on
+    samples_count: int
+    memory_bytes: int
+    # Memory needed on each GPU, or None if the command does not use GPUs
+    gpu_memory_bytes: Optional[int] = None
+    gpu_count: int = 1
@@ -0,0 +1,38 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from taskflow.model.task import TaskPriority
+
+
+class TaskRecord(BaseModel):
+    """
+    Archived record of a finished task
+    """
+
+    id: str
+    cmd: str
+    created_by: str
+    cwd: Optional[str] = None
+    priority: TaskPriority
+    created_at: int
+    started_at: Optional[int] = None
+    finished_at: int
+    # None if the client did not report it, eg. if it disconnected
+    exit_code: Optional[int] = None
+    # Declared main memory usage
+    memory_bytes: Optional[int] = None
+    gpu_ids: List[str] = []
+
+    @property
+    def runtime_ms(self) -> Optional[int]:
+        if self.started_at is None:
+            return None
+        return max(0, self.finished_at - self.started_at)
+
+
+class TaskRecordList(BaseModel):
+    records: List[TaskRecord]
+    total: int
+    # Cursor for fetching the next page, or None if this is the last page
+    next_cursor: Optional[str] = None
@@ -1,10 +1,62 @@
 import yaml
 
+from enum import Enum
 from pydantic import BaseModel, validator
+from typing import Dict, Optional
 
 from taskflow.utils import convert_byte_any
 
 
+class GpuPlacement(str, Enum):
+    """
+    Policy for picking devices for tasks requesting "any" GPU
+    """
+
+    # Pick the GPU with the least free memory that fits, keeping large GPUs free
+    BEST_FIT = "best-fit"
+    # Pick the GPU with the most free memory, spreading tasks out
+    WORST_FIT = "worst-fit"
+
+
+class DbBackend(str, Enum):
+    """
+    Storage backend for tasks
+    """
+
+    # Tasks are lost when the daemon stops
+    MEMORY = "memory"
+    # Tasks are persisted to an SQLite database file
+    SQLITE = "sqlite"
+
+
+class MemoryProbe(str, Enum):
+    """
+    Source of the main memory tasks can use
+    """
+
+    # cgroup if the daemon's cgroup or one of its parents has a memory limit, host otherwise
+    AUTO = "auto"
+    # Memory of the whole host
+    HOST = "host"
+    # Memory left to a cgroup v2, eg. a container or a systemd slice
+    CGROUP = "cgroup"
+    # Values read from probe_file
+    FILE = "file"
+
+
+class GpuProbe(str, Enum):
+    """
+    Source of the GPU memory tasks can use
+    """
+
+    # NVML if it is available, no GPUs otherwise
+    AUTO = "auto"
+    NVML = "nvml"
+    # Values read from probe_file
+    FILE = "file"
+    NONE = "none"
+
+
 class TaskflowSettings(BaseModel):
     """
     Class containing Taskflow's global settings
@@ -14,9 +66,35 @@ class TaskflowSettings(BaseModel):
     task_retention_days: int = 30
     api_host: str = "127.0.0.1"
     api_port: int = 4305
-    reserved_memory_bytes: int = 100 * (1024 ** 2)  # 100MB
-    reserved_gpu_memory_bytes: int = 1 * (1024 ** 2)  # 1MB
-    system_query_interval: float = 2
+    reserved_memory_bytes: int = 100 * (1024**2)  # 100MB
+    reserved_gpu_memory_bytes: int = 1 * (1024**2)  # 1MB
+    system_query_interval: float = 5
+    system_query_min_interval: float = 0.1
+    usage_sample_interval: float = 5
+    ramp_up_sample_interval: float = 0.5
+    state_change_threshold_bytes: int = 50 * (1024**2)  # 50MB
+    memory_probe: MemoryProbe = MemoryProbe.AUTO
+    gpu_probe: GpuProbe = GpuProbe.AUTO
+    # Directory of the cgroup tasks run in. Defaults to the daemon's own cgroup
+    cgroup_path: Optional[str] = None
+    probe_file: Optional[str] = None
+    gpu_placement: GpuPlacement = GpuPlacement.BEST_FIT
+    backfill: bool = False
+    fair_share: bool = False
+    fair_share_half_life_s: float = 24 * 3600  # 1 day
+    fair_share_weight: float = 100
+    priority_aging_per_minute: float = 0
+    db_backend: DbBackend = DbBackend.MEMORY
+    db_path: str = "/var/lib/taskflow/tasks.db"
+    archive_dir: Optional[str] = "/var/lib/taskflow/archive"
+    estimator_path: Optional[str] = "/var/lib/taskflow/profiles.json"
+    estimate_percentile: float = 95
+    trace_dir: Optional[str] = "/var/lib/taskflow/traces"
+    trace_enabled: bool = False
+    trace_max_bytes: int = 100 * (1024**2)  # 100MB
+    trace_backup_count: int = 5
+    # Counted resources that tasks can request by name, with their number of units
+    resources: Dict[str, int] = {}
 
     @classmethod
     def from_yaml(cls, f) -> "TaskflowSettings":
@@ -24,7 +102,28 @@ class TaskflowSettings(BaseModel):
         return cls.parse_obj(d)
 
     @validator(
-        "reserved_memory_bytes", "reserved_gpu_memory_bytes", pre=True, always=True
+        "reserved_memory_bytes",
+        "reserved_gpu_memory_bytes",
+        "state_change_threshold_bytes",
+        "trace_max_bytes",
+        pre=True,
+        always=True,
     )
     def convert_byte_value(cls, v):
         return convert_byte_any(v)
+
+    @validator("probe_file", always=True)
+    def check_probe_file(cls, v, values):
+        if v is None and (
+            values.get("memory_probe") == MemoryProbe.FILE
+            or values.get("gpu_probe") == GpuProbe.FILE
+        ):
+            raise ValueError("probe_file is required by file probes")
+        return v
+
+    @validator("resources")
+    def check_resources(cls, v):
+        for name, count in v.items():
+            if count < 0:
+                raise ValueError(f"Resource {name} cannot have a negative count")
+        return v
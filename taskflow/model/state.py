@@ -1,87 +1,286 @@
 import asyncio
+import time
 import threading
 import psutil
 
 from loguru import logger
-from py3nvml.py3nvml import *
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional
 
-from taskflow.utils import format_bytes
+from taskflow import metrics
+from taskflow.probe.base import IResourceProbe
+from taskflow.probe.host import HostMemoryProbe
+from taskflow.probe.nvml import NvmlProbe
+from taskflow.utils import format_bytes, get_online_cpu_ids
+
+
+class SystemStateSnapshot(NamedTuple):
+    """
+    Immutable view of the system's resources at a point in time
+    """
+
+    memory_free_bytes: int = 0
+    memory_total_bytes: int = 0
+    gpu_memory_free_bytes: Mapping[str, int] = MappingProxyType({})
+    gpu_memory_total_bytes: Mapping[str, int] = MappingProxyType({})
+    # Utilization in percent of each online CPU core the daemon may run on
+    cpu_load_percent: Mapping[int, float] = MappingProxyType({})
 
 
 class SystemState:
     """
     Class for managing the local system's state
+
+    The current values are held in an immutable :class:`SystemStateSnapshot`, which is replaced as a whole
+    by :meth:`publish`. Probing the system (see :meth:`probe`) is thread-safe and may run on a worker thread,
+    while publishing happens on the event loop, so readers never see a partially updated state.
+
+    Memory is measured by a list of :class:`IResourceProbe`. When several probes measure the same resource,
+    the last one wins. By default, the host's memory is measured, and GPU memory through NVML.
+
+    :param gpu_available: Whether to measure GPU memory through NVML, when no probes are given
+    :param probes: Probes measuring the memory tasks can use
     """
 
-    __slots__ = ["memory_free_bytes", "gpu_memory_free_bytes", "gpu_available"]
+    __slots__ = ["snapshot", "gpu_available", "probes"]
 
-    def __init__(self, gpu_available=True) -> None:
-        self.memory_free_bytes = 0
-        self.gpu_memory_free_bytes: Dict[str, int] = {}
+    def __init__(
+        self, gpu_available=True, probes: Optional[List[IResourceProbe]] = None
+    ) -> None:
+        self.snapshot = SystemStateSnapshot()
         self.gpu_available = gpu_available
+        if probes is None:
+            probes = [HostMemoryProbe()]
+            if gpu_available:
+                probes.append(NvmlProbe())
+        self.probes = probes
+
+    @property
+    def memory_free_bytes(self) -> int:
+        return self.snapshot.memory_free_bytes
+
+    @memory_free_bytes.setter
+    def memory_free_bytes(self, value: int):
+        self.snapshot = self.snapshot._replace(memory_free_bytes=value)
 
-    def update(self):
+    @property
+    def memory_total_bytes(self) -> int:
+        return self.snapshot.memory_total_bytes
+
+    @memory_total_bytes.setter
+    def memory_total_bytes(self, value: int):
+        self.snapshot = self.snapshot._replace(memory_total_bytes=value)
+
+    @property
+    def gpu_memory_free_bytes(self) -> Mapping[str, int]:
+        return self.snapshot.gpu_memory_free_bytes
+
+    @gpu_memory_free_bytes.setter
+    def gpu_memory_free_bytes(self, value: Dict[str, int]):
+        self.snapshot = self.snapshot._replace(
+            gpu_memory_free_bytes=MappingProxyType(dict(value))
+        )
+
+    @property
+    def gpu_memory_total_bytes(self) -> Mapping[str, int]:
+        return self.snapshot.gpu_memory_total_bytes
+
+    @gpu_memory_total_bytes.setter
+    def gpu_memory_total_bytes(self, value: Dict[str, int]):
+        self.snapshot = self.snapshot._replace(
+            gpu_memory_total_bytes=MappingProxyType(dict(value))
+        )
+
+    @property
+    def cpu_load_percent(self) -> Mapping[int, float]:
+        return self.snapshot.cpu_load_percent
+
+    @cpu_load_percent.setter
+    def cpu_load_percent(self, value: Dict[int, float]):
+        self.snapshot = self.snapshot._replace(
+            cpu_load_percent=MappingProxyType(dict(value))
+        )
+
+    def update(self, change_threshold_bytes: int = 0) -> bool:
         """
-        Update the state by running OS queries
+        Update the state by running OS queries on the current thread
+
+        :param change_threshold_bytes: Minimum change in free memory for the update to count as significant
+        :return: True if free memory on any device changed by more than the threshold
+        :rtype: bool
         """
-        self._update_free_memory()
-        if self.gpu_available:
-            self._update_gpu_free_memory()
+        return self.publish(self.probe(), change_threshold_bytes)
 
-    def _update_free_memory(self):
+    def probe(self) -> SystemStateSnapshot:
         """
-        Update the amount of available memory
+        Queries the system's resources, without changing the current state.
+        Safe to call from a worker thread.
+
+        :rtype: SystemStateSnapshot
         """
-        svmem = psutil.virtual_memory()
-        self.memory_free_bytes = svmem.available
+        memory_free_bytes = 0
+        memory_total_bytes = 0
+        gpu_memory_free_bytes: Dict[str, int] = {}
+        gpu_memory_total_bytes: Dict[str, int] = {}
 
-    def _update_gpu_free_memory(self):
+        for probe in self.probes:
+            result = probe.probe()
+            if result.memory_free_bytes is not None:
+                memory_free_bytes = result.memory_free_bytes
+            if result.memory_total_bytes is not None:
+                memory_total_bytes = result.memory_total_bytes
+            if result.gpu_memory_free_bytes is not None:
+                gpu_memory_free_bytes = dict(result.gpu_memory_free_bytes)
+            if result.gpu_memory_total_bytes is not None:
+                gpu_memory_total_bytes = dict(result.gpu_memory_total_bytes)
+
+        # Load since the previous probe. Only cores this process may run on are
+        # reported, since tasks inherit the daemon's affinity through their client
+        per_cpu = psutil.cpu_percent(percpu=True)
+        cpu_ids = get_online_cpu_ids()
+        cpu_load_percent = {i: per_cpu[i] for i in cpu_ids if i < len(per_cpu)}
+
+        return SystemStateSnapshot(
+            memory_free_bytes=memory_free_bytes,
+            memory_total_bytes=memory_total_bytes,
+            gpu_memory_free_bytes=MappingProxyType(gpu_memory_free_bytes),
+            gpu_memory_total_bytes=MappingProxyType(gpu_memory_total_bytes),
+            cpu_load_percent=MappingProxyType(cpu_load_percent),
+        )
+
+    def publish(
+        self, snapshot: SystemStateSnapshot, change_threshold_bytes: int = 0
+    ) -> bool:
         """
-        Update the amount of available GPU memory
+        Replaces the current state with a new snapshot
+
+        :type snapshot: SystemStateSnapshot
+        :param change_threshold_bytes: Minimum change in free memory for the update to count as significant
+        :return: True if free memory on any device changed by more than the threshold
+        :rtype: bool
         """
-        device_count = nvmlDeviceGetCount()
-        for i in range(device_count):
-            handle = nvmlDeviceGetHandleByIndex(i)
-            self.gpu_memory_free_bytes[str(i)] = nvmlDeviceGetMemoryInfo(handle).free
+        old = self.snapshot
+        self.snapshot = snapshot
+
+        if (
+            abs(snapshot.memory_free_bytes - old.memory_free_bytes)
+            > change_threshold_bytes
+        ):
+            return True
+        for gpu_id, free_bytes in snapshot.gpu_memory_free_bytes.items():
+            old_free_bytes = old.gpu_memory_free_bytes.get(gpu_id, 0)
+            if abs(free_bytes - old_free_bytes) > change_threshold_bytes:
+                return True
+        return False
 
 
 class SystemStateUpdateCoroutine:
     """
     Class encapsulating a system state loop
 
+    The update rate adapts to demand when ``min_interval_s`` and ``demand`` are given.
+    While ``demand`` returns True, the state is updated every ``min_interval_s`` seconds,
+    backing off exponentially up to ``interval_s`` as long as nothing changes.
+    Without demand, the state is updated every ``interval_s`` seconds.
+    :meth:`wake` triggers an update right away and resets the fast rate.
+
     :param state: The state to continually update
-    :param interval_s: Time in seconds between each update
+    :param interval_s: Time in seconds between each update, when idle
+    :param on_change: Callback invoked when an update changes the state significantly
+    :param change_threshold_bytes: Minimum change in free memory that counts as significant
+    :param min_interval_s: Time in seconds between each update while there is demand,
+        or None for a fixed rate
+    :param demand: Callback telling whether state changes are currently awaited
     """
 
-    def __init__(self, state: SystemState, interval_s: float = 5) -> None:
+    BACKOFF_FACTOR = 2
+
+    def __init__(
+        self,
+        state: SystemState,
+        interval_s: float = 5,
+        on_change: Optional[Callable[[], None]] = None,
+        change_threshold_bytes: int = 0,
+        min_interval_s: Optional[float] = None,
+        demand: Optional[Callable[[], bool]] = None,
+    ) -> None:
         self.state = state
         self.interval_s = interval_s
-        self.__stop_signal = asyncio.Event()
+        self.on_change = on_change
+        self.change_threshold_bytes = change_threshold_bytes
+        self.min_interval_s = min_interval_s
+        self.demand = demand
+        self.__should_stop = False
+        self.__wake_signal = asyncio.Event()
 
     async def run(self):
         """
         Runs the update loop asynchronously
         """
-        self.__stop_signal.clear()
-        self.state.update()
-
-        while True:
-            should_stop = True
-            try:
-                await asyncio.wait_for(self.__stop_signal.wait(), self.interval_s)
-            except asyncio.TimeoutError:
-                should_stop = False
-            if should_stop:
-                break
-
-            self.state.update()
-            # logger.debug(f"Free memory: {format_bytes(self.state.memory_free_bytes)}")
-            # used_mem_bytes = psutil.Process(os.getpid()).memory_info().rss
-            # logger.debug(f"Used memory; {format_bytes(used_mem_bytes)}")
+        self.__should_stop = False
+
+        # A dedicated thread, so that a slow NVML call never stalls the event loop
+        executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="taskflow-probe"
+        )
+        loop = asyncio.get_event_loop()
+        try:
+            snapshot = await loop.run_in_executor(executor, self.state.probe)
+            self.state.publish(snapshot)
+
+            interval = self.interval_s
+            while True:
+                try:
+                    await asyncio.wait_for(self.__wake_signal.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+                woken = self.__wake_signal.is_set()
+                self.__wake_signal.clear()
+                if self.__should_stop:
+                    break
+
+                try:
+                    probe_start = time.monotonic()
+                    snapshot = await loop.run_in_executor(executor, self.state.probe)
+                    metrics.STATE_PROBE.observe(time.monotonic() - probe_start)
+                except Exception:
+                    logger.exception("Failed to query system state")
+                    continue
+
+                changed = self.state.publish(snapshot, self.change_threshold_bytes)
+                if changed and self.on_change is not None:
+                    self.on_change()
+
+                interval = self.next_interval(interval, changed or woken)
+        finally:
+            executor.shutdown(wait=False)
+
+    def next_interval(self, interval: float, reset: bool) -> float:
+        """
+        Computes the time to wait before the next update
+
+        :param interval: The time waited before the last update
+        :param reset: Whether the last update was requested or changed the state
+        :rtype: float
+        """
+        if self.min_interval_s is None or self.demand is None or not self.demand():
+            return self.interval_s
+        if reset:
+            return self.min_interval_s
+        return min(
+            max(interval, self.min_interval_s) * self.BACKOFF_FACTOR, self.interval_s
+        )
+
+    def wake(self):
+        """
+        Updates the state right away, and samples at the fast rate while there is demand
+        """
+        self.__wake_signal.set()
 
     def stop(self):
         """
         Stop the current loop
         """
-        self.__stop_signal.set()
+        self.__should_stop = True
+        self.__wake_signal.set()
@@ -20,6 +20,12 @@ class TaskResourceUsage(BaseModel):
 
     memory_bytes: Optional[int] = None
     gpu_memory_bytes: Optional[Dict[str, int]] = None
+    # Number of distinct GPUs that the "any" entry of gpu_memory_bytes applies to
+    gpu_count: int = 1
+    # Number of CPU cores to pin the task to, or None to run on any core
+    cpu_count: Optional[int] = None
+    # Units of each counted resource declared in the daemon settings
+    resources: Dict[str, int] = {}
 
     @validator("memory_bytes", pre=True, always=True)
     def convert_byte_value(cls, v):
@@ -32,6 +38,60 @@ class TaskResourceUsage(BaseModel):
 
         return dict([(k, convert_byte_any(x)) for k, x in v.items()])
 
+    @validator("gpu_count")
+    def check_gpu_count(cls, v):
+        if v < 1:
+            raise ValueError("gpu_count must be at least 1")
+        return v
+
+    @validator("cpu_count")
+    def check_cpu_count(cls, v):
+        if v is not None and v < 1:
+            raise ValueError("cpu_count must be at least 1")
+        return v
+
+    @validator("resources")
+    def check_resources(cls, v):
+        for name, count in v.items():
+            if count < 1:
+                raise ValueError(f"Resource {name} must be requested at least once")
+        return v
+
+
+class TaskObservedUsage(BaseModel):
+    """
+    Resource usage measured while a task runs, over its whole process tree
+    """
+
+    samples_count: int = 0
+    memory_peak_bytes: int = 0
+    memory_mean_bytes: float = 0
+    gpu_memory_peak_bytes: Dict[str, int] = {}
+    gpu_memory_mean_bytes: Dict[str, float] = {}
+
+    def add_sample(self, memory_bytes: int, gpu_memory_bytes: Dict[str, int]):
+        """
+        Folds a new measurement into the peak and mean values.
+        GPUs missing from a sample count as using no memory at that time.
+
+        :param memory_bytes: Main memory in use
+        :param gpu_memory_bytes: Memory in use on each GPU
+        """
+        self.samples_count += 1
+        n = self.samples_count
+
+        self.memory_peak_bytes = max(self.memory_peak_bytes, memory_bytes)
+        self.memory_mean_bytes += (memory_bytes - self.memory_mean_bytes) / n
+
+        gpu_ids = set(self.gpu_memory_mean_bytes.keys()) | set(gpu_memory_bytes.keys())
+        for gpu_id in gpu_ids:
+            usage_bytes = gpu_memory_bytes.get(gpu_id, 0)
+            self.gpu_memory_peak_bytes[gpu_id] = max(
+                self.gpu_memory_peak_bytes.get(gpu_id, 0), usage_bytes
+            )
+            mean = self.gpu_memory_mean_bytes.get(gpu_id, 0)
+            self.gpu_memory_mean_bytes[gpu_id] = mean + (usage_bytes - mean) / n
+
 
 class Task(BaseModel):
     """
@@ -47,24 +107,59 @@ class Task(BaseModel):
     started_at: Optional[int] = None
     is_running: bool = False
     init_delay_s: int = 15
+    expected_runtime_s: Optional[int] = None
     pid: Optional[int] = None
     cwd: Optional[str] = None
+    # GPU memory reserved on each device, as decided by the scheduler
+    gpu_assignment: Optional[Dict[str, int]] = None
+    # CPU cores the task is pinned to, as decided by the scheduler
+    cpu_assignment: Optional[List[int]] = None
+    # Priority after aging and fair-share penalties. Only filled for pending tasks in API responses
+    effective_priority: Optional[float] = None
+    # Usage measured by the daemon while the task runs
+    observed: Optional[TaskObservedUsage] = None
+
+    def visible_gpu_ids(self) -> List[str]:
+        """
+        Get the GPU ids that should be exposed to the task through CUDA_VISIBLE_DEVICES.
+        Only tasks requesting "any" GPU are pinned, so that explicit ids keep their meaning.
+        Tasks also requesting explicit ids (rejected by :class:`NewTask`) are not pinned,
+        as pinning would renumber the explicit devices.
+
+        :rtype: List[str]
+        """
+        gpu_memory_bytes = self.usage.gpu_memory_bytes or {}
+        if list(gpu_memory_bytes.keys()) != ["any"] or self.gpu_assignment is None:
+            return []
+        return list(self.gpu_assignment.keys())
 
 
 class TaskList(BaseModel):
     tasks: List[Task]
     total: int
+    # Cursor for fetching the next page, or None if this is the last page
+    next_cursor: Optional[str] = None
 
 
 class NewTask(BaseModel):
+    # Id of a previously submitted task to resume, when reconnecting after a daemon restart
+    id: Optional[str] = None
     cmd: str
     created_by: str
     priority: TaskPriority
     usage: TaskResourceUsage
     init_delay_s: int = 5
+    expected_runtime_s: Optional[int] = None
     pid: Optional[int] = None
     cwd: Optional[str] = None
 
+    @validator("usage")
+    def check_gpu_ids(cls, v):
+        gpu_memory_bytes = v.gpu_memory_bytes or {}
+        if "any" in gpu_memory_bytes.keys() and len(gpu_memory_bytes) > 1:
+            raise ValueError('GPU "any" cannot be combined with explicit GPU ids')
+        return v
+
     @staticmethod
     def generate_id() -> str:
         return str(uuid.uuid4())[:8]
@@ -78,6 +173,7 @@ class NewTask(BaseModel):
             priority=self.priority,
             usage=self.usage,
             init_delay_s=self.init_delay_s,
+            expected_runtime_s=self.expected_runtime_s,
             pid=self.pid,
             cwd=self.cwd,
         )
@@ -0,0 +1,13 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class TracingStatus(BaseModel):
+    """
+    Whether the daemon records task lifecycle traces, and where
+    """
+
+    enabled: bool
+    # Current trace file, or None if no trace directory is configured
+    path: Optional[str] = None
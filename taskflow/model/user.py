@@ -0,0 +1,23 @@
+from typing import List
+
+from pydantic import BaseModel
+
+
+class UserUsage(BaseModel):
+    """
+    Fair-share usage info for a user
+    """
+
+    user: str
+    # Decayed resource-seconds consumed by the user's tasks
+    usage: float = 0
+    # Fraction of the usage of all users
+    share: float = 0
+    # Amount subtracted from the priority of the user's pending tasks
+    priority_penalty: float = 0
+    pending_tasks_count: int = 0
+    running_tasks_count: int = 0
+
+
+class UserUsageList(BaseModel):
+    users: List[UserUsage]
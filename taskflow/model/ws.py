@@ -1,7 +1,9 @@
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 from enum import IntEnum
 
+from taskflow.utils import format_bytes
+
 
 class MessageType(IntEnum):
     """
@@ -13,6 +15,7 @@ class MessageType(IntEnum):
     TASK_FINISH = 3
     TASK_UPDATE = 4
     PING = 5
+    TASK_REPORT = 6
 
 
 class SocketMessage(BaseModel):
@@ -31,3 +34,65 @@ class ClientUpdateInfo(BaseModel):
 
     pending_tasks_count: int = 0
     running_tasks_count: int = 0
+
+
+class TaskStartInfo(BaseModel):
+    """
+    Data sent along with the TASK_CAN_START message
+    """
+
+    # GPUs to expose through CUDA_VISIBLE_DEVICES. Empty means no pinning
+    gpu_ids: List[str] = []
+    # CPU cores to pin the task to with sched_setaffinity. Empty means no pinning
+    cpu_ids: List[int] = []
+
+
+class TaskFinishInfo(BaseModel):
+    """
+    Data sent along with the TASK_FINISH message
+    """
+
+    # Exit code of the task's process, if known
+    exit_code: Optional[int] = None
+
+
+class TaskUsageReport(BaseModel):
+    """
+    Data sent along with the TASK_REPORT message, after a task that declared
+    much more resources than it used has finished
+    """
+
+    declared_memory_bytes: Optional[int] = None
+    peak_memory_bytes: int = 0
+    declared_gpu_memory_bytes: Dict[str, int] = {}
+    peak_gpu_memory_bytes: Dict[str, int] = {}
+
+    def describe(self) -> List[str]:
+        """
+        Get a human-readable line for each declared resource
+
+        :rtype: List[str]
+        """
+        lines = []
+        if self.declared_memory_bytes is not None:
+            lines.append(
+                f"RAM: declared {format_bytes(self.declared_memory_bytes)}, "
+                f"peaked at {format_bytes(self.peak_memory_bytes)}"
+            )
+        for gpu_id, declared in self.declared_gpu_memory_bytes.items():
+            peak = self.peak_gpu_memory_bytes.get(gpu_id, 0)
+            lines.append(
+                f"GPU {gpu_id}: declared {format_bytes(declared)}, "
+                f"peaked at {format_bytes(peak)}"
+            )
+        return lines
+
+    def summary(self) -> str:
+        """
+        Get the text shown to the user when the task finishes
+
+        :rtype: str
+        """
+        lines = ["This task used much less than it declared"]
+        lines.extend(f"  {line}" for line in self.describe())
+        return "\n".join(lines)
@@ -0,0 +1,121 @@
+import heapq
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from taskflow.model.task import Task
+
+QueueKey = Tuple[float, int, str]
+
+
+class PendingQueue:
+    """
+    Pending tasks kept in scheduling order: higher priority first, then older tasks first.
+    The order is maintained incrementally on push and remove, so walking the queue never requires sorting.
+
+    Tasks are partitioned by user, so that a per-user priority penalty can be applied
+    by merging the users' partitions instead of re-sorting every task.
+
+    :param aging_per_minute: Priority gained by a task for each minute it waits
+
+    Since every task ages at the same rate, aging does not require updating keys over time:
+    ordering by effective priority is the same as ordering by ``priority - aging * created_at``.
+    """
+
+    def __init__(self, aging_per_minute: float = 0) -> None:
+        self.aging_per_minute = aging_per_minute
+        self.__keys: Dict[str, List[QueueKey]] = {}
+        self.__tasks: Dict[str, Task] = {}
+        self.__task_keys: Dict[str, QueueKey] = {}
+        self.__task_users: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.__tasks)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self.__tasks
+
+    def __iter__(self) -> Iterator[Task]:
+        return self.ordered()
+
+    def ordered(self, penalties: Optional[Dict[str, float]] = None) -> Iterator[Task]:
+        """
+        Walks the queue in scheduling order. The queue must not be modified while iterating.
+
+        :param penalties: Amount subtracted from the priority of each user's tasks
+        :type penalties: Optional[Dict[str, float]], optional
+        :rtype: Iterator[Task]
+        """
+        if len(self.__keys) == 1:
+            # Penalties do not change the order within a single user
+            for keys in self.__keys.values():
+                for key in keys:
+                    yield self.__tasks[key[2]]
+            return
+
+        penalties = penalties or {}
+        streams = [
+            self.__penalized(keys, penalties.get(user, 0))
+            for user, keys in self.__keys.items()
+        ]
+
+        for key in heapq.merge(*streams):
+            yield self.__tasks[key[2]]
+
+    @staticmethod
+    def __penalized(keys: List[QueueKey], penalty: float) -> Iterator[QueueKey]:
+        for key in keys:
+            yield (key[0] + penalty, key[1], key[2])
+
+    def user_count(self, user: str) -> int:
+        """
+        Counts the pending tasks of a user
+
+        :type user: str
+        :rtype: int
+        """
+        return len(self.__keys.get(user, []))
+
+    def task_key(self, task: Task) -> QueueKey:
+        aging = self.aging_per_minute * task.created_at / 60000
+        return (aging - int(task.priority), task.created_at, task.id)
+
+    def push(self, task: Task):
+        """
+        Adds a task to the queue, or updates it if it is already queued
+
+        :type task: Task
+        """
+        key = self.task_key(task)
+        old_key = self.__task_keys.get(task.id)
+        old_user = self.__task_users.get(task.id)
+        if old_key != key or old_user != task.created_by:
+            if old_key is not None and old_user is not None:
+                self.__remove_key(old_user, old_key)
+            insort(self.__keys.setdefault(task.created_by, []), key)
+            self.__task_keys[task.id] = key
+            self.__task_users[task.id] = task.created_by
+
+        self.__tasks[task.id] = task
+
+    def remove(self, task_id: str) -> Optional[Task]:
+        """
+        Removes a task from the queue
+
+        :type task_id: str
+        :return: The removed task, or None if it was not queued
+        :rtype: Optional[Task]
+        """
+        key = self.__task_keys.pop(task_id, None)
+        if key is None:
+            return None
+
+        self.__remove_key(self.__task_users.pop(task_id), key)
+        return self.__tasks.pop(task_id)
+
+    def __remove_key(self, user: str, key: QueueKey):
+        keys = self.__keys[user]
+        index = bisect_left(keys, key)
+        del keys[index]
+        if len(keys) < 1:
+            self.__keys.pop(user)
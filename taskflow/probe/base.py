@@ -0,0 +1,29 @@
+from abc import ABC, abstractmethod
+from typing import Dict, NamedTuple, Optional
+
+
+class ProbeResult(NamedTuple):
+    """
+    Resources measured by a probe. Resources the probe does not measure are left to None
+    """
+
+    memory_free_bytes: Optional[int] = None
+    memory_total_bytes: Optional[int] = None
+    gpu_memory_free_bytes: Optional[Dict[str, int]] = None
+    gpu_memory_total_bytes: Optional[Dict[str, int]] = None
+
+
+class IResourceProbe(ABC):
+    """
+    Interface for measuring the free resources tasks can use.
+    Probes run on the system state's worker thread, and must not use the event loop
+    """
+
+    @abstractmethod
+    def probe(self) -> ProbeResult:
+        """
+        Measures the resources
+
+        :rtype: ProbeResult
+        """
+        pass
@@ -0,0 +1,189 @@
+import os
+
+from loguru import logger
+from typing import Dict, List, Optional
+
+from taskflow.probe.base import IResourceProbe, ProbeResult
+
+# Page cache the kernel reclaims before the cgroup hits its limit
+RECLAIMABLE_STATS = ["inactive_file"]
+
+
+def find_cgroup_mount(mountinfo_path: str = "/proc/self/mountinfo") -> Optional[str]:
+    """
+    Get where the cgroup v2 hierarchy is mounted
+
+    :param mountinfo_path: Mount table of the process
+    :return: The root directory of the hierarchy, or None if it is not mounted
+        or the mount table cannot be read (eg. without /proc)
+    :rtype: Optional[str]
+    """
+    try:
+        with open(mountinfo_path, "rt") as f:
+            for line in f:
+                # Optional fields end with a "-" separator, followed by the filesystem type
+                fields = line.split()
+                if "-" in fields and fields[fields.index("-") + 1] == "cgroup2":
+                    return fields[4]
+    except OSError:
+        logger.debug(f"Cannot read {mountinfo_path}")
+    return None
+
+
+def find_cgroup_dir(
+    mountinfo_path: str = "/proc/self/mountinfo",
+    cgroup_path: str = "/proc/self/cgroup",
+) -> Optional[str]:
+    """
+    Get the directory of the cgroup v2 the current process belongs to
+
+    :param mountinfo_path: Mount table of the process
+    :param cgroup_path: Cgroup membership of the process
+    :return: The directory, or None if no cgroup v2 hierarchy is mounted
+        or the process's cgroup cannot be read
+    :rtype: Optional[str]
+    """
+    mount_dir = find_cgroup_mount(mountinfo_path)
+    if mount_dir is None:
+        return None
+
+    try:
+        with open(cgroup_path, "rt") as f:
+            for line in f:
+                hierarchy_id, _, path = line.rstrip("\n").split(":", 2)
+                if hierarchy_id == "0":
+                    cgroup_dir = os.path.join(mount_dir, path.lstrip("/"))
+                    # Without a cgroup namespace, a container sees the host's path to its cgroup,
+                    # which is mounted as the root of the hierarchy
+                    return cgroup_dir if os.path.isdir(cgroup_dir) else mount_dir
+    except OSError:
+        logger.debug(f"Cannot read {cgroup_path}")
+    return None
+
+
+def read_memory_stat(path: str) -> Dict[str, int]:
+    """
+    Parses a memory.stat file
+
+    :rtype: Dict[str, int]
+    """
+    stats = {}
+    with open(path, "rt") as f:
+        for line in f:
+            key, value = line.split()
+            stats[key] = int(value)
+    return stats
+
+
+class CgroupMemoryProbe(IResourceProbe):
+    """
+    Measures the main memory left to a cgroup v2, eg. a container or a systemd slice.
+
+    Each level from the cgroup up to the root of the hierarchy may set a limit in ``memory.max``.
+    The free memory of a level is its limit minus ``memory.current``, plus the page cache the kernel
+    would reclaim before hitting the limit, and the tightest level wins. Free memory never exceeds
+    the host's, as a limit may be larger than the machine.
+
+    :param path: Directory of the cgroup tasks run in
+    :param root: Root of the cgroup hierarchy, where the search for limits stops
+    :param host: Probe of the host's memory, or None to ignore it
+    :raises ValueError: If neither the cgroup nor its parents have a memory controller
+    """
+
+    def __init__(
+        self,
+        path: str,
+        root: Optional[str] = None,
+        host: Optional[IResourceProbe] = None,
+    ) -> None:
+        self.path = os.path.abspath(path)
+        self.root = os.path.abspath(root) if root is not None else self.path
+        self.host = host
+
+        self.__dirs: List[str] = []
+        current = self.path
+        while True:
+            self.__dirs.append(current)
+            if current == self.root or os.path.dirname(current) == current:
+                break
+            current = os.path.dirname(current)
+
+        # The memory controller may only be enabled in parents of the cgroup
+        if not any(
+            os.path.exists(os.path.join(d, "memory.current")) for d in self.__dirs
+        ):
+            raise ValueError(f"No memory controller in cgroup {self.path}")
+        logger.info(f"Measuring memory in cgroup {self.path}")
+
+    @staticmethod
+    def has_limit(path: str, root: Optional[str] = None) -> bool:
+        """
+        Determines whether a cgroup or one of its parents sets a memory limit
+
+        :param path: Directory of the cgroup
+        :param root: Root of the cgroup hierarchy
+        :rtype: bool
+        """
+        path = os.path.abspath(path)
+        root = os.path.abspath(root) if root is not None else path
+        while True:
+            limit = CgroupMemoryProbe.read_limit(path)
+            if limit is not None:
+                return True
+            if path == root or os.path.dirname(path) == path:
+                return False
+            path = os.path.dirname(path)
+
+    @staticmethod
+    def read_limit(path: str) -> Optional[int]:
+        """
+        Get the memory limit of a single cgroup
+
+        :param path: Directory of the cgroup
+        :return: The limit, or None if it is unlimited
+        :rtype: Optional[int]
+        """
+        try:
+            with open(os.path.join(path, "memory.max"), "rt") as f:
+                value = f.read().strip()
+        except FileNotFoundError:
+            # The root cgroup has no limit
+            return None
+        if value == "max":
+            return None
+        return int(value)
+
+    def probe(self) -> ProbeResult:
+        free_bytes: Optional[int] = None
+        total_bytes: Optional[int] = None
+
+        for path in self.__dirs:
+            limit = self.read_limit(path)
+            if limit is None:
+                continue
+
+            with open(os.path.join(path, "memory.current"), "rt") as f:
+                current = int(f.read())
+            stats = read_memory_stat(os.path.join(path, "memory.stat"))
+            reclaimable = sum(stats.get(key, 0) for key in RECLAIMABLE_STATS)
+
+            level_free = min(limit, max(0, limit - current + reclaimable))
+            free_bytes = (
+                level_free if free_bytes is None else min(free_bytes, level_free)
+            )
+            total_bytes = limit if total_bytes is None else min(total_bytes, limit)
+
+        if self.host is not None:
+            host = self.host.probe()
+            if host.memory_free_bytes is not None:
+                free_bytes = min(
+                    host.memory_free_bytes,
+                    free_bytes if free_bytes is not None else host.memory_free_bytes,
+                )
+            if host.memory_total_bytes is not None:
+                total_bytes = min(
+                    host.memory_total_bytes,
+                    total_bytes if total_bytes is not None else host.memory_total_bytes,
+                )
+
+        return ProbeResult(memory_free_bytes=free_bytes, memory_total_bytes=total_bytes)
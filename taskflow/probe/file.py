@@ -0,0 +1,52 @@
+import yaml
+
+from typing import Dict, Optional
+
+from taskflow.probe.base import IResourceProbe, ProbeResult
+from taskflow.utils import convert_byte_any
+
+
+class FileProbe(IResourceProbe):
+    """
+    Reads the resources from a YAML file, eg. to test the scheduler against a fake machine.
+    The file is read again on each probe, so that it can be edited while the daemon runs.
+
+    .. code-block:: yaml
+
+        memory_free: 16G
+        memory_total: 64G
+        gpu_memory_free: {"0": 10G}
+        gpu_memory_total: {"0": 24G}
+
+    :param path: Path of the YAML file
+    :param memory: Whether to report main memory
+    :param gpu: Whether to report GPU memory
+    """
+
+    def __init__(self, path: str, memory: bool = True, gpu: bool = True) -> None:
+        self.path = path
+        self.memory = memory
+        self.gpu = gpu
+
+    def probe(self) -> ProbeResult:
+        with open(self.path, "rt") as f:
+            d = yaml.full_load(f) or {}
+
+        result = ProbeResult()
+        if self.memory:
+            result = result._replace(
+                memory_free_bytes=convert_byte_any(d.get("memory_free")),
+                memory_total_bytes=convert_byte_any(d.get("memory_total")),
+            )
+        if self.gpu:
+            result = result._replace(
+                gpu_memory_free_bytes=self.__convert_gpus(d.get("gpu_memory_free")),
+                gpu_memory_total_bytes=self.__convert_gpus(d.get("gpu_memory_total")),
+            )
+        return result
+
+    @staticmethod
+    def __convert_gpus(d: Optional[dict]) -> Optional[Dict[str, int]]:
+        if d is None:
+            return None
+        return {str(k): convert_byte_any(v) or 0 for k, v in d.items()}
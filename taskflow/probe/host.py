@@ -0,0 +1,16 @@
+import psutil
+
+from taskflow.probe.base import IResourceProbe, ProbeResult
+
+
+class HostMemoryProbe(IResourceProbe):
+    """
+    Measures the main memory of the whole host.
+    Inside a container or a memory-limited cgroup, this overestimates the memory tasks can use
+    """
+
+    def probe(self) -> ProbeResult:
+        svmem = psutil.virtual_memory()
+        return ProbeResult(
+            memory_free_bytes=svmem.available, memory_total_bytes=svmem.total
+        )
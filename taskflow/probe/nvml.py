@@ -0,0 +1,33 @@
+from py3nvml.py3nvml import *
+from typing import Any, Dict, List, Optional, Tuple
+
+from taskflow.probe.base import IResourceProbe, ProbeResult
+
+
+class NvmlProbe(IResourceProbe):
+    """
+    Measures the memory of each GPU through NVML, which must be initialized
+    """
+
+    def __init__(self) -> None:
+        # NVML device handles by GPU id, looked up on the first probe
+        self.__gpu_handles: Optional[List[Tuple[str, Any]]] = None
+
+    def probe(self) -> ProbeResult:
+        if self.__gpu_handles is None:
+            self.__gpu_handles = [
+                (str(i), nvmlDeviceGetHandleByIndex(i))
+                for i in range(nvmlDeviceGetCount())
+            ]
+
+        gpu_memory_free_bytes: Dict[str, int] = {}
+        gpu_memory_total_bytes: Dict[str, int] = {}
+        for gpu_id, handle in self.__gpu_handles:
+            info = nvmlDeviceGetMemoryInfo(handle)
+            gpu_memory_free_bytes[gpu_id] = info.free
+            gpu_memory_total_bytes[gpu_id] = info.total
+
+        return ProbeResult(
+            gpu_memory_free_bytes=gpu_memory_free_bytes,
+            gpu_memory_total_bytes=gpu_memory_total_bytes,
+        )
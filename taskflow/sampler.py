@@ -0,0 +1,203 @@
+import asyncio
+import psutil
+
+from loguru import logger
+from py3nvml.py3nvml import *
+from typing import Callable, Dict, List, Optional, Tuple
+
+from taskflow.db.base import ITaskflowDb
+from taskflow.model.task import TaskObservedUsage
+
+# pid -> (main memory bytes, GPU id -> GPU memory bytes)
+UsageSample = Tuple[int, Dict[str, int]]
+
+
+def get_process_tree_pids(pid: int) -> List[int]:
+    """
+    Get the ids of a process and all of its descendants
+
+    :type pid: int
+    :return: The process ids, or an empty list if the process does not exist
+    :rtype: List[int]
+    """
+    try:
+        process = psutil.Process(pid)
+        return [pid] + [p.pid for p in process.children(recursive=True)]
+    except psutil.NoSuchProcess:
+        return []
+
+
+def get_processes_rss(pids: List[int]) -> int:
+    """
+    Get the total resident memory of a set of processes.
+    Processes that exit during the query are skipped.
+
+    :type pids: List[int]
+    :rtype: int
+    """
+    total = 0
+    for pid in pids:
+        try:
+            total += psutil.Process(pid).memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total
+
+
+def get_gpu_processes_memory() -> Dict[int, Dict[str, int]]:
+    """
+    Get the GPU memory used by every process running on a GPU
+
+    :return: GPU id -> memory in bytes, for each process id
+    :rtype: Dict[int, Dict[str, int]]
+    """
+    usage: Dict[int, Dict[str, int]] = {}
+    for i in range(nvmlDeviceGetCount()):
+        handle = nvmlDeviceGetHandleByIndex(i)
+        for process in nvmlDeviceGetComputeRunningProcesses(handle):
+            # Not reported in some containerized environments
+            if process.usedGpuMemory is None:
+                continue
+            per_gpu = usage.setdefault(process.pid, {})
+            per_gpu[str(i)] = per_gpu.get(str(i), 0) + process.usedGpuMemory
+    return usage
+
+
+class TaskUsageSampler:
+    """
+    Periodically measures the resources actually used by running tasks,
+    and stores the peak and mean values in each task's observed usage.
+
+    Each task is measured over its whole process tree, since `taskflow run` starts commands through a shell.
+    Queries run on a worker thread, as listing processes can take a while on a busy system.
+
+    While ``ramping`` returns True, tasks are sampled every ``ramp_up_interval_s`` seconds
+    instead, and each sample is passed to ``on_sample``. This lets the scheduler notice
+    early when newly started tasks have ramped up. :meth:`wake` samples right away.
+
+    :param db: An instance of ITaskflowDb holding the tasks
+    :param interval_s: Time in seconds between each sample. Periodic sampling is disabled if 0 or less
+    :param gpu_available: Whether to query GPU memory through NVML
+    :param ramp_up_interval_s: Time in seconds between each sample while tasks are ramping up.
+        Disabled if 0 or less
+    :param ramping: Callback telling whether started tasks are ramping up
+    :param on_sample: Callback invoked with the id, main memory and GPU memory of each sampled task
+    """
+
+    def __init__(
+        self,
+        db: ITaskflowDb,
+        interval_s: float = 5,
+        gpu_available: bool = True,
+        ramp_up_interval_s: float = 0.5,
+        ramping: Optional[Callable[[], bool]] = None,
+        on_sample: Optional[Callable[[str, int, Dict[str, int]], None]] = None,
+    ) -> None:
+        self.db = db
+        self.interval_s = interval_s
+        self.gpu_available = gpu_available
+        self.ramp_up_interval_s = ramp_up_interval_s
+        self.ramping = ramping
+        self.on_sample = on_sample
+        self.__should_stop = False
+        self.__wake_signal = asyncio.Event()
+
+    async def run(self):
+        """
+        Runs the sampling loop asynchronously
+        """
+        if self.interval_s <= 0 and self.ramp_up_interval_s <= 0:
+            return
+        self.__should_stop = False
+
+        while True:
+            try:
+                await asyncio.wait_for(self.__wake_signal.wait(), self.next_interval())
+            except asyncio.TimeoutError:
+                pass
+            self.__wake_signal.clear()
+            if self.__should_stop:
+                break
+
+            try:
+                await self.sample()
+            except Exception:
+                logger.exception("Failed to sample task usage")
+
+    def next_interval(self) -> Optional[float]:
+        """
+        Get the time to wait before the next sample
+
+        :return: Time in seconds, or None to wait until woken up
+        :rtype: Optional[float]
+        """
+        if self.ramp_up_interval_s > 0 and self.ramping is not None and self.ramping():
+            return self.ramp_up_interval_s
+        return self.interval_s if self.interval_s > 0 else None
+
+    def wake(self):
+        """
+        Samples right away, eg. when tasks have just been started
+        """
+        self.__wake_signal.set()
+
+    def stop(self):
+        """
+        Stop the current loop
+        """
+        self.__should_stop = True
+        self.__wake_signal.set()
+
+    async def sample(self):
+        """
+        Measures every running task once
+        """
+        tasks = [t for t in await self.db.get_running_tasks() if t.pid is not None]
+        if len(tasks) < 1:
+            return
+
+        pids = [t.pid for t in tasks]
+        loop = asyncio.get_event_loop()
+        samples = await loop.run_in_executor(None, self.__probe, pids)
+
+        for pid, sampled_task in zip(pids, tasks):
+            sample = samples.get(pid)
+            if sample is None:
+                continue
+
+            # The task may have finished while the probe ran, and must not be stored again
+            task = await self.db.get_task_by_id(sampled_task.id)
+            if task is None or not task.is_running or task.pid != pid:
+                continue
+
+            if task.observed is None:
+                task.observed = TaskObservedUsage()
+            task.observed.add_sample(*sample)
+            await self.db.update_task(task)
+
+            if self.on_sample is not None:
+                self.on_sample(task.id, *sample)
+
+    def __probe(self, pids: List[int]) -> Dict[int, UsageSample]:
+        gpu_usage: Dict[int, Dict[str, int]] = {}
+        if self.gpu_available:
+            try:
+                gpu_usage = get_gpu_processes_memory()
+            except NVMLError:
+                logger.exception("Failed to query GPU processes")
+
+        samples: Dict[int, UsageSample] = {}
+        for pid in pids:
+            tree = get_process_tree_pids(pid)
+            if len(tree) < 1:
+                continue
+
+            gpu_memory_bytes: Dict[str, int] = {}
+            for tree_pid in tree:
+                for gpu_id, usage_bytes in gpu_usage.get(tree_pid, {}).items():
+                    gpu_memory_bytes[gpu_id] = (
+                        gpu_memory_bytes.get(gpu_id, 0) + usage_bytes
+                    )
+
+            samples[pid] = (get_processes_rss(tree), gpu_memory_bytes)
+        return samples
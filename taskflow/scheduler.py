@@ -1,12 +1,23 @@
 import asyncio
+import time
+import psutil
 
-from typing import Dict, List, Optional
-from functools import cmp_to_key
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from loguru import logger
 
+from taskflow.capacity import Capacity
+from taskflow.clock import Clock
 from taskflow.db.base import ITaskflowDb
+from taskflow.fairshare import FairShareTracker
+from taskflow import metrics
+from taskflow.ledger import ReservationLedger
+from taskflow.model.settings import GpuPlacement, TaskflowSettings
 from taskflow.model.state import SystemState
-from taskflow.model.task import TaskPriority, Task
+from taskflow.model.task import Task, TaskResourceUsage
+from taskflow.model.user import UserUsage
+from taskflow.model.ws import TaskStartInfo
+from taskflow.pending import PendingQueue
+from taskflow.tracing import Tracer, get_trace_timestamp
 
 
 class TaskScheduler:
@@ -14,12 +25,44 @@ class TaskScheduler:
     Core task scheduler
 
     :param state: The SystemState to query
-    :param db: An instance of ITaskflowDb to query pending tasks
+    :param db: An instance of ITaskflowDb holding the tasks
     :param reserved_memory_bytes: Number of bytes to leave free in memory when scheduling tasks
     :param reserved_gpu_memory_bytes: Number of bytes to leave free in each GPU's memory when scheduling tasks
+    :param gpu_placement: Policy for picking devices for tasks requesting "any" GPU
+    :param backfill: Whether to use EASY backfilling. The first pending task that does not fit gets
+        a reserved start time, and later tasks may only start if they do not delay it
+    :param fair_share: Whether to lower the priority of users according to their past usage
+    :param fair_share_half_life_s: Time in seconds after which past usage counts for half
+    :param fair_share_weight: Priority penalty for a user with all of the past usage
+    :param priority_aging_per_minute: Priority gained by a pending task for each minute it waits
+    :param resources: Number of units of each counted resource that tasks may request
+    :param tracer: Tracer recording scheduling passes and the outcome of task evaluations
+    :param clock: Source of the current time. Defaults to the system clock
+
+    The loop runs a pass whenever it is notified (see :meth:`notify`). The
+    ``DEFAULT_LOOP_INTERVAL_S`` timer is only a fallback for missed events.
+
+    Pending tasks are kept in a :class:`PendingQueue`, which is fed through
+    :meth:`submit` and :meth:`task_finished`. Each pass walks the queue in order
+    (with fair-share penalties applied per user, if enabled) and starts every task that fits. Resources of started tasks are
+    held in a :class:`ReservationLedger` until they show up in the system state,
+    until the usage measured on the task's processes reaches them or stops growing
+    (see :meth:`task_sampled`), or at the latest after ``init_delay_s`` seconds.
+    From then on, the part of the declared usage that the task has not used yet stays
+    held until it finishes.
+
+    ``on_state_demand``, if set, is called whenever a fresh system state would let the
+    scheduler react faster: when a task is submitted or finishes while tasks are pending,
+    and when tasks are started. See :meth:`needs_fresh_state`. ``on_ramp_up``, if set,
+    is called when started tasks begin ramping up (see :meth:`is_ramping_up`).
     """
 
     DEFAULT_LOOP_INTERVAL_S = 5
+    RAMP_UP_GRACE_S = 2
+    # Time given to clients to reconnect to their pending tasks after a restart
+    ORPHAN_GRACE_S = 60
+    # CPU cores busier than this are not assigned to tasks requesting cores
+    CPU_BUSY_PERCENT = 50
 
     def __init__(
         self,
@@ -27,142 +70,700 @@ class TaskScheduler:
         db: ITaskflowDb,
         reserved_memory_bytes: int,
         reserved_gpu_memory_bytes: int,
+        gpu_placement: GpuPlacement = GpuPlacement.BEST_FIT,
+        backfill: bool = False,
+        fair_share: bool = False,
+        fair_share_half_life_s: float = 86400,
+        fair_share_weight: float = 100,
+        priority_aging_per_minute: float = 0,
+        resources: Optional[Dict[str, int]] = None,
+        tracer: Optional[Tracer] = None,
+        clock: Optional[Clock] = None,
     ) -> None:
         self.state = state
         self.db = db
         self.reserved_memory_bytes = reserved_memory_bytes
         self.reserved_gpu_memory_bytes = reserved_gpu_memory_bytes
-
-        self.__stop_signal = asyncio.Event()
-        self.__task_locks: Dict[str, asyncio.Event] = {}
+        self.gpu_placement = gpu_placement
+        self.backfill = backfill
+        self.fair_share = fair_share
+        self.fair_share_weight = fair_share_weight
+        self.resources = dict(resources or {})
+        self.tracer = tracer
+        self.clock = clock if clock is not None else Clock()
+        self.usage_tracker = FairShareTracker(half_life_s=fair_share_half_life_s)
+
+        self.__should_stop = False
+        self.__wake_signal = asyncio.Event()
+        self.queue = PendingQueue(aging_per_minute=priority_aging_per_minute)
+        self.ledger = ReservationLedger()
+        self.__running: Dict[str, Task] = {}
+        # Monotonic time at which each running task was last charged to its user
+        self.__charged_at: Dict[str, float] = {}
+        # Running tasks restored from the database, which have no connected client
+        self.__detached: Dict[str, Task] = {}
+        # Monotonic time at which restored pending tasks whose client did not reconnect are dropped
+        self.__orphans_until: Optional[float] = None
+        # Resolved with the start info of each task once it is started
+        self.__start_futures: Dict[str, asyncio.Future] = {}
+        self.on_state_demand: Optional[Callable[[], None]] = None
+        self.on_ramp_up: Optional[Callable[[], None]] = None
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: TaskflowSettings,
+        state: SystemState,
+        db: ITaskflowDb,
+        tracer: Optional[Tracer] = None,
+        clock: Optional[Clock] = None,
+    ) -> "TaskScheduler":
+        """
+        Creates a scheduler with the scheduling policies of the given settings
+
+        :type settings: TaskflowSettings
+        :type state: SystemState
+        :type db: ITaskflowDb
+        :type tracer: Optional[Tracer], optional
+        :type clock: Optional[Clock], optional
+        :rtype: TaskScheduler
+        """
+        return cls(
+            state=state,
+            db=db,
+            reserved_memory_bytes=settings.reserved_memory_bytes,
+            reserved_gpu_memory_bytes=settings.reserved_gpu_memory_bytes,
+            gpu_placement=settings.gpu_placement,
+            backfill=settings.backfill,
+            fair_share=settings.fair_share,
+            fair_share_half_life_s=settings.fair_share_half_life_s,
+            fair_share_weight=settings.fair_share_weight,
+            priority_aging_per_minute=settings.priority_aging_per_minute,
+            resources=settings.resources,
+            tracer=tracer,
+            clock=clock,
+        )
 
     def stop(self):
         """
         Stops the loop
         """
-        self.__stop_signal.set()
+        self.__should_stop = True
+        self.__wake_signal.set()
+
+    def notify(self):
+        """
+        Wakes the loop up for a new scheduling pass.
+        Should be called whenever a task is inserted, finished or deleted,
+        or when the system state changes significantly.
+        """
+        self.__wake_signal.set()
+
+    def needs_fresh_state(self) -> bool:
+        """
+        Whether changes in the system state are currently awaited, because tasks
+        are pending or started tasks are still ramping up
+
+        :rtype: bool
+        """
+        return len(self.queue) > 0 or len(self.ledger) > 0
+
+    def is_ramping_up(self) -> bool:
+        """
+        Whether resources are still promised to started tasks
+
+        :rtype: bool
+        """
+        return len(self.ledger) > 0
+
+    def task_sampled(
+        self, task_id: str, memory_bytes: int, gpu_memory_bytes: Dict[str, int]
+    ):
+        """
+        Feeds a usage sample of a running task to the ledger, and wakes the loop up
+        if the task has ramped up
+
+        :type task_id: str
+        :param memory_bytes: Main memory used by the task's processes
+        :param gpu_memory_bytes: Memory used by the task's processes on each GPU id
+        """
+        if self.ledger.observe(task_id, memory_bytes, gpu_memory_bytes):
+            logger.debug(f"Task {task_id} ramped up")
+            self.notify()
+
+    def _request_fresh_state(self):
+        if self.on_state_demand is not None and self.needs_fresh_state():
+            self.on_state_demand()
 
     async def loop(self):
         """
         Runs the loop
         """
 
-        loop_interval = 0
+        loop_interval: float = 0
 
         logger.debug("Scheduler started")
         while True:
-            should_stop = True
             try:
-                await asyncio.wait_for(self.__stop_signal.wait(), loop_interval)
+                await asyncio.wait_for(self.__wake_signal.wait(), loop_interval)
             except asyncio.TimeoutError:
-                should_stop = False
-            if should_stop:
+                pass
+            self.__wake_signal.clear()
+            if self.__should_stop:
                 break
 
-            loop_interval = self.DEFAULT_LOOP_INTERVAL_S
+            await self._reap_restored_tasks()
+            loop_interval = self.run_pass()
+            if self.__orphans_until is not None or len(self.__detached) > 0:
+                loop_interval = min(loop_interval, self.DEFAULT_LOOP_INTERVAL_S)
+
+    def run_pass(self) -> float:
+        """
+        Runs a single scheduling pass, starting every pending task that fits
 
-            # Query pending tasks
-            pending_tasks = await self.db.get_pending_tasks()
-            self.clean_task_locks(pending_tasks)
-            if len(pending_tasks) < 1:
-                logger.debug("No tasks pending")
+        :return: Number of seconds until the next pass is due, unless notified earlier
+        :rtype: float
+        """
+        pass_started_at = time.monotonic()
+        now = self.clock.monotonic()
+        now_ms = self.clock.timestamp_ms()
+        self.ledger.refresh(self.state, now)
+        self._charge_running_tasks(now)
+        loop_interval: float = self.DEFAULT_LOOP_INTERVAL_S
+
+        if len(self.queue) < 1:
+            logger.debug("No tasks pending")
+
+        tracer = (
+            self.tracer if self.tracer is not None and self.tracer.enabled else None
+        )
+        trace_started_at = get_trace_timestamp() if tracer is not None else 0
+
+        capacity = self._capacity()
+        shadow: Optional[Tuple[int, Capacity]] = None
+        head_blocked = False
+
+        started_tasks = []
+        placements_count = 0
+        for task in self.queue.ordered(self.priority_penalties(now)):
+            placements_count += 1
+            assignment, reason = self.try_place_task(task, capacity)
+            if tracer is not None and assignment is None:
+                tracer.task_evaluated(task, reason)
+            if assignment is None:
+                if self.backfill and not head_blocked:
+                    # Reserve a start slot for the first task that does not fit
+                    head_blocked = True
+                    shadow = self._find_shadow(task, capacity, now_ms)
+                    if shadow is None:
+                        logger.debug(f"Cannot reserve a start slot for task {task.id}")
                 continue
 
-            sorted_pending_tasks = self._sort_tasks_by_priority(pending_tasks)
+            task.gpu_assignment = assignment
+            task.cpu_assignment = self.place_cpus(task, capacity) or None
+            if shadow is not None and not self._can_backfill(task, shadow, now_ms):
+                task.gpu_assignment = None
+                task.cpu_assignment = None
+                if tracer is not None:
+                    tracer.task_evaluated(task, "backfill")
+                continue
 
-            for task in sorted_pending_tasks:
-                if self.can_task_run(task):
-                    logger.info(f"Starting task {task.id}")
+            logger.info(f"Starting task {task.id}")
+            task.started_at = now_ms
+            capacity.take(task)
+            # Promise the task's resources until they show up in the system state
+            self.ledger.reserve(
+                task,
+                self.state,
+                expires_at=now + self.RAMP_UP_GRACE_S + task.init_delay_s,
+            )
+            started_tasks.append(task)
+
+        for task in started_tasks:
+            self._dequeue(task.id)
+            self.__running[task.id] = task
+            self.__charged_at[task.id] = now
+            metrics.TASKS_STARTED.inc()
+            metrics.QUEUE_WAIT.observe(max(0, now_ms - task.created_at) / 1000)
+
+            # Hand the start signal over to the task's client
+            future = self.wait_for_start(task)
+            if not future.done():
+                future.set_result(
+                    TaskStartInfo(
+                        gpu_ids=task.visible_gpu_ids(),
+                        cpu_ids=task.cpu_assignment or [],
+                    )
+                )
+
+        if len(started_tasks) > 0:
+            # Follow the ramp-up of the started tasks closely
+            self._request_fresh_state()
+            if self.on_ramp_up is not None and self.is_ramping_up():
+                self.on_ramp_up()
+
+        # Wake up again when the next promise expires
+        next_expiry = self.ledger.next_expiry()
+        if next_expiry is not None:
+            loop_interval = max(0, min(loop_interval, next_expiry - now))
+
+        metrics.RUNNING_TASKS.set(len(self.__running))
+        metrics.SCHEDULER_PLACEMENTS.observe(placements_count)
+        metrics.SCHEDULER_PASS.observe(time.monotonic() - pass_started_at)
+        if tracer is not None:
+            tracer.scheduler_pass(
+                trace_started_at,
+                get_trace_timestamp() - trace_started_at,
+                placements_count,
+                len(started_tasks),
+            )
+        return loop_interval
+
+    def priority_penalties(self, now: float) -> Dict[str, float]:
+        """
+        Computes the amount subtracted from the priority of each user's tasks
 
-                    # Open the task's lock for it to run
-                    task_lock = self.__task_locks.get(task.id)
-                    if task_lock is None:
-                        task_lock = asyncio.Event()
-                        self.__task_locks[task.id] = task_lock
-                    task_lock.set()
+        :param now: Current monotonic time in seconds
+        :rtype: Dict[str, float]
+        """
+        if not self.fair_share:
+            return {}
+
+        return {
+            user: share * self.fair_share_weight
+            for user, _, share in self.usage_tracker.shares(now)
+        }
 
-                    loop_interval = 2 + task.init_delay_s
-                    break
+    def effective_priority(
+        self, task: Task, penalties: Optional[Dict[str, float]] = None
+    ) -> float:
+        """
+        Computes the priority a pending task is scheduled with, after aging and fair-share penalties
 
-    def clean_task_locks(self, pending_tasks: List[Task]):
+        :type task: Task
+        :param penalties: Penalties from :meth:`priority_penalties`, to compute them only once
+            when getting the priority of several tasks. Computed if None
+        :type penalties: Optional[Dict[str, float]]
+        :rtype: float
         """
-        Removes all locks belonging to tasks that are no longer pending
+        if penalties is None:
+            penalties = self.priority_penalties(self.clock.monotonic())
+        waited_ms = max(0, self.clock.timestamp_ms() - task.created_at)
+        aging = self.queue.aging_per_minute * waited_ms / 60000
+        return int(task.priority) + aging - penalties.get(task.created_by, 0)
 
-        :param pending_tasks: List of currently pending tasks
-        :type pending_tasks: List[Task]
+    def user_usage(self) -> List[UserUsage]:
         """
-        pending_ids = set([t.id for t in pending_tasks])
-        removed_ids = []
-        for task_id in self.__task_locks.keys():
-            if task_id not in pending_ids:
-                removed_ids.append(task_id)
+        Get the fair-share usage info of every known user
 
-        if len(removed_ids) > 0:
-            logger.debug(f"Cleaning {len(removed_ids)} task locks")
-            for id in removed_ids:
-                self.__task_locks.pop(id)
+        :rtype: List[UserUsage]
+        """
+        now = self.clock.monotonic()
+        self._charge_running_tasks(now)
+
+        running_counts: Dict[str, int] = {}
+        for task in self.__running.values():
+            running_counts[task.created_by] = running_counts.get(task.created_by, 0) + 1
+
+        users = []
+        for user, usage, share in self.usage_tracker.shares(now):
+            users.append(
+                UserUsage(
+                    user=user,
+                    usage=usage,
+                    share=share,
+                    priority_penalty=share * self.fair_share_weight
+                    if self.fair_share
+                    else 0,
+                    pending_tasks_count=self.queue.user_count(user),
+                    running_tasks_count=running_counts.get(user, 0),
+                )
+            )
+        return users
+
+    def _charge_running_tasks(self, now: float):
+        """
+        Charges each running task's user for the time elapsed since the last charge
+        """
+        for task in self.__running.values():
+            charged_at = self.__charged_at.get(task.id, now)
+            share = FairShareTracker.task_share(task, self.state)
+            self.usage_tracker.charge(task.created_by, share * (now - charged_at), now)
+            self.__charged_at[task.id] = now
+
+    def _find_shadow(
+        self, head: Task, capacity: Capacity, now_ms: int
+    ) -> Optional[Tuple[int, Capacity]]:
+        """
+        Finds the earliest time at which the head task can start, assuming running tasks
+        end when their expected runtime elapses. Tasks without an estimate never end.
 
-    def _sort_tasks_by_priority(self, tasks: List[Task]) -> List[Task]:
-        return sorted(tasks, key=cmp_to_key(self.compare_tasks))
+        :return: The shadow time in milliseconds, and the resources left over once the head task starts.
+            None if no start time can be guaranteed
+        :rtype: Optional[Tuple[int, Capacity]]
+        """
+        ending_tasks = []
+        for task in self.__running.values():
+            if task.expected_runtime_s is None:
+                continue
+            started_at = task.started_at or now_ms
+            end_ms = max(now_ms, started_at + task.expected_runtime_s * 1000)
+            ending_tasks.append((end_ms, task))
+        ending_tasks.sort(key=lambda x: x[0])
+
+        future = capacity.copy()
+        for end_ms, task in ending_tasks:
+            future.give(task)
+            assignment = self.place_task(head, future)
+            if assignment is None:
+                continue
 
-    @staticmethod
-    def compare_tasks(t1: Task, t2: Task) -> int:
-        # Look at priority first
-        if t1.priority > t2.priority:
-            return -1
-        elif t2.priority > t1.priority:
-            return 1
+            head_placed = head.copy(
+                update={
+                    "gpu_assignment": assignment,
+                    "cpu_assignment": self.place_cpus(head, future) or None,
+                }
+            )
+            future.take(head_placed)
+            return end_ms, future
 
-        # Older tasks get prioritized
-        return t1.created_at - t2.created_at
+        return None
 
-    def can_task_run(self, task: Task) -> bool:
+    def _can_backfill(
+        self, task: Task, shadow: Tuple[int, Capacity], now_ms: int
+    ) -> bool:
         """
-        Check if a task can be run given the current system's state
+        Checks if a placed task can start without delaying the head task's reserved start.
+        The task must either end before the shadow time, or only use resources left over at that time.
+        Leftover resources used by the task are taken from the shadow capacity.
 
-        :type task: Task
         :rtype: bool
         """
+        shadow_ms, extra = shadow
+        if task.expected_runtime_s is not None:
+            if now_ms + task.expected_runtime_s * 1000 <= shadow_ms:
+                return True
+
         task_mem = task.usage.memory_bytes or 0
-        if self.state.memory_free_bytes - task_mem <= self.reserved_memory_bytes:
+        if extra.memory_free_bytes - task_mem <= self.reserved_memory_bytes:
             return False
+        for gpu_id, usage_bytes in (task.gpu_assignment or {}).items():
+            avail = extra.gpu_memory_free_bytes.get(gpu_id, 0)
+            if avail - usage_bytes <= self.reserved_gpu_memory_bytes:
+                return False
+        for cpu_id in task.cpu_assignment or []:
+            if cpu_id not in extra.cpu_load_percent:
+                return False
+        for name, count in task.usage.resources.items():
+            if extra.resources_free.get(name, 0) < count:
+                return False
+
+        extra.take(task)
+        return True
+
+    async def restore(self):
+        """
+        Takes over tasks left in the database by a previous daemon run.
+        Running tasks whose process is still alive are tracked until it exits.
+        Pending tasks stay in the database until their client reconnects (see :meth:`reattach`),
+        and are dropped after ``ORPHAN_GRACE_S`` seconds.
+        """
+        now = self.clock.monotonic()
+
+        for task in await self.db.get_running_tasks():
+            if task.pid is None or not psutil.pid_exists(task.pid):
+                await self.db.delete_task(task)
+                continue
+            self.__running[task.id] = task
+            self.__charged_at[task.id] = now
+            self.__detached[task.id] = task
+            self.ledger.hold(task)
+
+        pending_count = await self.db.get_restored_tasks_count()
+        if pending_count > 0:
+            self.__orphans_until = now + self.ORPHAN_GRACE_S
 
-        if task.usage.gpu_memory_bytes is not None:
-            # Check if there's enough space on gpus
-            for gpu_id, usage_bytes in task.usage.gpu_memory_bytes.items():
-                if gpu_id == "any":
-                    is_any_avail = False
-                    for avail in self.state.gpu_memory_free_bytes.values():
-                        if avail - usage_bytes >= self.reserved_gpu_memory_bytes:
-                            is_any_avail = True
-                            break
-                    if not is_any_avail:
-                        return False
+        if len(self.__detached) > 0 or pending_count > 0:
+            logger.info(
+                f"Restored {len(self.__detached)} running and {pending_count} pending tasks"
+            )
+
+    async def reattach(self, task_id: str, created_by: str, cmd: str) -> Optional[Task]:
+        """
+        Hands a restored pending task over to its reconnected client, and queues it again.
+        Task ids are public, so the task is only handed over to a client submitting the same command
+        as the same user
+
+        :param task_id: Id of the task, as sent by the client
+        :param created_by: User of the client
+        :param cmd: Command of the client
+        :return: The restored task, or None if there is no such task for this client
+        :rtype: Optional[Task]
+        """
+        if self.__orphans_until is None:
+            return None
+
+        task = await self.db.get_restored_task(task_id)
+        # Another client may have reattached it in the meantime
+        if task is None or await self.db.get_task_by_id(task_id) is not None:
+            return None
+        if task.created_by != created_by or task.cmd != cmd:
+            logger.warning(
+                f"Not resuming task {task_id} for {created_by}, it belongs to another client"
+            )
+            return None
+
+        await self.db.insert_task(task)
+        self.submit(task)
+        return task
+
+    async def _reap_restored_tasks(self):
+        """
+        Deletes restored tasks whose process has exited, or whose client never reconnected
+        """
+        now = self.clock.monotonic()
+
+        if self.__orphans_until is not None and self.__orphans_until <= now:
+            self.__orphans_until = None
+            dropped = await self.db.drop_restored_tasks()
+            if dropped > 0:
+                logger.info(f"Dropped {dropped} tasks whose client did not reconnect")
+
+        exited = [
+            t
+            for t in self.__detached.values()
+            if t.pid is None or not psutil.pid_exists(t.pid)
+        ]
+        for task in exited:
+            logger.info(f"Task {task.id} finished")
+            self.__detached.pop(task.id)
+            await self.db.delete_task(task)
+            self.task_finished(task)
+
+    def submit(self, task: Task):
+        """
+        Adds a newly inserted task to the pending queue, and wakes the loop up
+
+        :type task: Task
+        """
+        if task.id not in self.queue:
+            metrics.QUEUE_TASKS.inc(labels=(task.priority.name, task.created_by))
+        self.queue.push(task)
+        self.notify()
+        self._request_fresh_state()
+
+    def _dequeue(self, task_id: str):
+        task = self.queue.remove(task_id)
+        if task is not None:
+            metrics.QUEUE_TASKS.dec(labels=(task.priority.name, task.created_by))
+
+    def task_finished(self, task: Task):
+        """
+        Removes a finished or deleted task from the scheduler,
+        releases the resources promised to it, and wakes the loop up
+
+        :type task: Task
+        """
+        self._dequeue(task.id)
+        self.ledger.release(task.id)
+        if task.id in self.__running:
+            self._charge_running_tasks(self.clock.monotonic())
+        self.__running.pop(task.id, None)
+        self.__charged_at.pop(task.id, None)
+        self.__start_futures.pop(task.id, None)
+        metrics.RUNNING_TASKS.set(len(self.__running))
+        self.notify()
+        self._request_fresh_state()
+
+    def running_tasks(self) -> List[Task]:
+        """
+        Get the tasks started by the scheduler that have not finished yet
+
+        :rtype: List[Task]
+        """
+        return list(self.__running.values())
+
+    def assigned_cpu_ids(self) -> Set[int]:
+        """
+        Get the CPU cores assigned to running tasks
+
+        :rtype: Set[int]
+        """
+        cpu_ids: Set[int] = set()
+        for task in self.__running.values():
+            cpu_ids.update(task.cpu_assignment or [])
+        return cpu_ids
+
+    def resources_in_use(self) -> Dict[str, int]:
+        """
+        Get the units of each counted resource held by running tasks
+
+        :rtype: Dict[str, int]
+        """
+        in_use: Dict[str, int] = {}
+        for task in self.__running.values():
+            for name, count in task.usage.resources.items():
+                in_use[name] = in_use.get(name, 0) + count
+        return in_use
+
+    def unavailable_resources(self, usage: TaskResourceUsage) -> List[str]:
+        """
+        Get the counted resources requested by a task that could never be granted,
+        because they are not declared in the settings or have fewer units
+
+        :type usage: TaskResourceUsage
+        :rtype: List[str]
+        """
+        return [
+            name
+            for name, count in usage.resources.items()
+            if count > self.resources.get(name, 0)
+        ]
+
+    def _capacity(self) -> Capacity:
+        in_use = self.resources_in_use()
+        resources_free = {
+            name: total - in_use.get(name, 0) for name, total in self.resources.items()
+        }
+        return Capacity.from_state(
+            self.state, self.ledger, self.assigned_cpu_ids(), resources_free
+        )
+
+    def can_task_run(self, task: Task) -> bool:
+        """
+        Check if a task can be run given the current system's state,
+        minus the resources promised to recently started tasks
+
+        :type task: Task
+        :rtype: bool
+        """
+        return self.place_task(task) is not None
+
+    def place_task(
+        self, task: Task, capacity: Optional[Capacity] = None
+    ) -> Optional[Dict[str, int]]:
+        """
+        Decides where a task would run given the available resources.
+        Devices for "any" GPU are picked according to the placement policy.
+
+        :type task: Task
+        :param capacity: Available resources. Defaults to the current system's state,
+            minus the resources promised to recently started tasks
+        :return: GPU memory to reserve on each device, or None if the task cannot run
+        :rtype: Optional[Dict[str, int]]
+        """
+        return self.try_place_task(task, capacity)[0]
+
+    def try_place_task(
+        self, task: Task, capacity: Optional[Capacity] = None
+    ) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+        """
+        Same as :meth:`place_task`, but also tells which resource prevents the task from running
+
+        :type task: Task
+        :type capacity: Optional[Capacity], optional
+        :return: The GPU assignment, or None and the name of the missing resource
+            (eg. "memory", "cpu", "gpu:0", "resource:license")
+        :rtype: Tuple[Optional[Dict[str, int]], Optional[str]]
+        """
+        if capacity is None:
+            capacity = self._capacity()
+
+        task_mem = task.usage.memory_bytes or 0
+        if capacity.memory_free_bytes - task_mem <= self.reserved_memory_bytes:
+            return None, "memory"
+        if self.place_cpus(task, capacity) is None:
+            return None, "cpu"
+        for name, count in task.usage.resources.items():
+            if capacity.resources_free.get(name, 0) < count:
+                return None, f"resource:{name}"
+
+        assignment: Dict[str, int] = {}
+        gpu_memory_bytes = task.usage.gpu_memory_bytes or {}
+
+        # Check if there's enough space on explicitly requested gpus
+        for gpu_id, usage_bytes in gpu_memory_bytes.items():
+            if gpu_id == "any":
+                continue
+            avail = capacity.gpu_memory_free_bytes.get(gpu_id, 0)
+            if avail - usage_bytes <= self.reserved_gpu_memory_bytes:
+                return None, f"gpu:{gpu_id}"
+            assignment[gpu_id] = usage_bytes
+
+        usage_bytes = gpu_memory_bytes.get("any")
+        if usage_bytes is not None:
+            candidates: List[Tuple[int, str]] = []
+            for gpu_id, avail in capacity.gpu_memory_free_bytes.items():
+                if gpu_id in assignment:
                     continue
+                if avail - usage_bytes >= self.reserved_gpu_memory_bytes:
+                    candidates.append((avail, gpu_id))
 
-                avail = self.state.gpu_memory_free_bytes.get(gpu_id, 0)
-                if avail - usage_bytes <= self.reserved_gpu_memory_bytes:
-                    return False
+            if len(candidates) < task.usage.gpu_count:
+                return None, "gpu:any"
 
-        return True
+            if self.gpu_placement == GpuPlacement.WORST_FIT:
+                candidates.sort(key=lambda c: (-c[0], c[1]))
+            else:
+                candidates.sort()
+
+            for _, gpu_id in candidates[: task.usage.gpu_count]:
+                assignment[gpu_id] = usage_bytes
+
+        return assignment, None
+
+    def place_cpus(self, task: Task, capacity: Capacity) -> Optional[List[int]]:
+        """
+        Picks the CPU cores a task would be pinned to. Only cores that are not assigned to
+        another task and whose observed load is below ``CPU_BUSY_PERCENT`` are picked,
+        least loaded first.
+
+        :type task: Task
+        :param capacity: Available resources
+        :return: The sorted core ids, an empty list if the task does not request cores,
+            or None if not enough cores are idle
+        :rtype: Optional[List[int]]
+        """
+        cpu_count = task.usage.cpu_count
+        if cpu_count is None:
+            return []
+
+        idle = sorted(
+            (load, cpu_id)
+            for cpu_id, load in capacity.cpu_load_percent.items()
+            if load < self.CPU_BUSY_PERCENT
+        )
+        if len(idle) < cpu_count:
+            return None
+        return sorted(cpu_id for _, cpu_id in idle[:cpu_count])
+
+    def wait_for_start(self, task: Task) -> "asyncio.Future[TaskStartInfo]":
+        """
+        Get a future resolved with the task's start info once the scheduler starts it
+
+        :type task: Task
+        :rtype: asyncio.Future[TaskStartInfo]
+        """
+        future = self.__start_futures.get(task.id)
+        if future is None:
+            future = asyncio.get_event_loop().create_future()
+            self.__start_futures[task.id] = future
+        return future
 
     async def wait_for_task_execution(self, task: Task, timeout=1) -> bool:
         """
-        Asynchronously blocks until the lock for the given task is released, or until the timeout elapses.
+        Asynchronously blocks until the given task is started, or until the timeout elapses.
 
         :type task: Task
         :param timeout: Timeout in seconds, defaults to 1
         :type timeout: int, optional
-        :return: True if the lock has been released, False otherwise
+        :return: True if the task has been started, False otherwise
         :rtype: bool
         """
-        task_lock = self.__task_locks.get(task.id)
-        if task_lock is None:
-            task_lock = asyncio.Event()
-            self.__task_locks[task.id] = task_lock
+        future = self.wait_for_start(task)
 
         try:
-            await asyncio.wait_for(task_lock.wait(), timeout)
+            await asyncio.wait_for(asyncio.shield(future), timeout)
             return True
         except asyncio.TimeoutError:
             return False
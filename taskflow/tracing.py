@@ -0,0 +1,293 @@
+import asyncio
+import json
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from taskflow.model.task import Task
+
+# Track ids of the daemon's own activities in the trace
+SCHEDULER_TID = 1
+TASKS_TID = 2
+
+# Every file ends with this, so that it is valid JSON after each flush
+TRACE_END = b"\n]\n"
+
+
+def get_trace_timestamp() -> int:
+    """
+    Get the current wall-clock time in microseconds, the time unit of trace events
+
+    :rtype: int
+    """
+    return int(time.time() * 1000000)
+
+
+class Tracer:
+    """
+    Records the lifecycle of tasks and scheduler passes as Chrome trace events,
+    which can be opened in Perfetto or chrome://tracing.
+
+    Each task gets an async track holding a "pending" span and a "running" span,
+    and instant events for scheduler evaluations, start signals and client updates.
+    An evaluation event is only recorded when the resource blocking the task changes,
+    so that a task waiting for hours does not produce an event on every pass.
+
+    Events are buffered in memory, and written every ``FLUSH_INTERVAL_S`` seconds on a dedicated thread
+    (see :meth:`run`). The trace file is rotated once it grows over ``max_bytes``, keeping ``backup_count``
+    previous files. When tracing is disabled, every method returns right away.
+
+    :param path: Directory holding the trace files, or None to disable tracing
+    :param enabled: Whether to start tracing right away
+    :param max_bytes: Size above which the trace file is rotated
+    :param backup_count: Number of rotated files to keep
+    """
+
+    FLUSH_INTERVAL_S = 1
+    FILE_NAME = "taskflow-trace.json"
+
+    def __init__(
+        self,
+        path: Optional[str],
+        enabled: bool = False,
+        max_bytes: int = 100 * (1024**2),
+        backup_count: int = 5,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self.__enabled = False
+        self.__pid = os.getpid()
+        self.__buffer: List[str] = []
+        # Last reason recorded for each pending task
+        self.__block_reasons: Dict[str, Optional[str]] = {}
+        self.__executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="taskflow-trace"
+        )
+        self.__stop_signal = asyncio.Event()
+
+        if enabled:
+            self.enable()
+
+    @property
+    def enabled(self) -> bool:
+        return self.__enabled
+
+    @property
+    def file_path(self) -> Optional[str]:
+        """
+        Path of the current trace file
+        """
+        if self.path is None:
+            return None
+        return os.path.join(self.path, self.FILE_NAME)
+
+    def enable(self):
+        """
+        Starts recording events
+
+        :raises ValueError: If no trace directory is configured
+        """
+        if self.path is None:
+            raise ValueError("No trace directory configured")
+        if self.__enabled:
+            return
+
+        self.__enabled = True
+        logger.info(f"Tracing to {self.file_path}")
+
+    def disable(self):
+        """
+        Stops recording events. Buffered events are still written
+        """
+        if self.__enabled:
+            logger.info("Tracing disabled")
+        self.__enabled = False
+        self.__block_reasons.clear()
+
+    async def run(self):
+        """
+        Runs the flush loop asynchronously
+        """
+        self.__stop_signal.clear()
+
+        while True:
+            try:
+                await asyncio.wait_for(self.__stop_signal.wait(), self.FLUSH_INTERVAL_S)
+                break
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.flush()
+            except OSError:
+                logger.exception("Failed to write trace events, disabling tracing")
+                self.disable()
+
+    def stop(self):
+        """
+        Stop the current loop
+        """
+        self.__stop_signal.set()
+
+    async def shutdown(self):
+        try:
+            await self.flush()
+        except OSError:
+            logger.exception("Failed to write trace events")
+        self.__executor.shutdown(wait=True)
+
+    async def flush(self):
+        """
+        Writes buffered events to the trace file
+        """
+        if len(self.__buffer) < 1:
+            return
+
+        events, self.__buffer = self.__buffer, []
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.__executor, self.__write, events)
+
+    def task_submitted(self, task: Task):
+        if not self.__enabled:
+            return
+        args = {
+            "cmd": task.cmd,
+            "created_by": task.created_by,
+            "priority": task.priority.name,
+        }
+        self.__task_event(task, f"task {task.id}", "b", args)
+        self.__task_event(task, "pending", "b")
+
+    def task_evaluated(self, task: Task, reason: Optional[str]):
+        """
+        Records the outcome of a scheduler evaluation, if it changed since the last one
+
+        :type task: Task
+        :param reason: Resource preventing the task from starting, or None if it can start
+        """
+        if not self.__enabled:
+            return
+        if task.id in self.__block_reasons and self.__block_reasons[task.id] == reason:
+            return
+
+        self.__block_reasons[task.id] = reason
+        name = f"blocked by {reason}" if reason is not None else "placed"
+        self.__task_event(task, name, "n")
+
+    def task_start_sent(self, task: Task):
+        if not self.__enabled:
+            return
+        self.__block_reasons.pop(task.id, None)
+        args = {
+            "gpu_ids": task.visible_gpu_ids(),
+            "cpu_ids": task.cpu_assignment or [],
+        }
+        self.__task_event(task, "pending", "e")
+        self.__task_event(task, "start signal sent", "n", args)
+        self.__task_event(task, "running", "b")
+
+    def task_updated(self, task: Task):
+        if not self.__enabled:
+            return
+        self.__task_event(task, "TASK_UPDATE received", "n", {"pid": task.pid})
+
+    def task_finished(self, task: Task, exit_code: Optional[int]):
+        if not self.__enabled:
+            return
+        self.__block_reasons.pop(task.id, None)
+        self.__task_event(task, "running" if task.is_running else "pending", "e")
+        self.__task_event(task, f"task {task.id}", "e", {"exit_code": exit_code})
+
+    def scheduler_pass(
+        self, started_at: int, duration_us: int, placements: int, started: int
+    ):
+        """
+        Records a scheduling pass
+
+        :param started_at: Start time of the pass, in microseconds
+        :param duration_us: Duration of the pass, in microseconds
+        :param placements: Number of tasks evaluated
+        :param started: Number of tasks started
+        """
+        if not self.__enabled:
+            return
+        self.__record(
+            {
+                "name": "scheduler pass",
+                "ph": "X",
+                "ts": started_at,
+                "dur": duration_us,
+                "tid": SCHEDULER_TID,
+                "args": {"placements": placements, "started": started},
+            }
+        )
+
+    def __task_event(
+        self, task: Task, name: str, ph: str, args: Optional[Dict[str, Any]] = None
+    ):
+        event: Dict[str, Any] = {
+            "name": name,
+            "cat": "task",
+            "ph": ph,
+            "id": task.id,
+            "ts": get_trace_timestamp(),
+            "tid": TASKS_TID,
+        }
+        if args is not None:
+            event["args"] = args
+        self.__record(event)
+
+    def __record(self, event: Dict[str, Any]):
+        event["pid"] = self.__pid
+        event.setdefault("ts", get_trace_timestamp())
+        self.__buffer.append(json.dumps(event))
+
+    def __write(self, events: List[str]):
+        file_path = self.file_path
+        assert file_path is not None
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        data = ",\n".join(events).encode()
+        size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        if size > 0 and size + len(data) > self.max_bytes:
+            self.__rotate(file_path)
+            size = 0
+
+        if size < len(TRACE_END):
+            # Every file names the tracks it uses, so that rotated files open on their own
+            metadata = ",\n".join(self.__metadata_events()).encode()
+            with open(file_path, "wb") as f:
+                f.write(b"[\n" + metadata + b",\n" + data + TRACE_END)
+            return
+
+        # Append before the closing bracket
+        with open(file_path, "r+b") as f:
+            f.seek(-len(TRACE_END), os.SEEK_END)
+            f.write(b",\n" + data + TRACE_END)
+
+    def __metadata_events(self) -> List[str]:
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "args": {"name": "taskflowd"}}
+        ]
+        for tid, name in [(SCHEDULER_TID, "scheduler"), (TASKS_TID, "tasks")]:
+            events.append(
+                {"name": "thread_name", "ph": "M", "tid": tid, "args": {"name": name}}
+            )
+        return [json.dumps(dict(e, pid=self.__pid, ts=0)) for e in events]
+
+    def __rotate(self, file_path: str):
+        base, ext = os.path.splitext(file_path)
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{base}.{i}{ext}"
+            if os.path.exists(src):
+                os.replace(src, f"{base}.{i + 1}{ext}")
+        if self.backup_count > 0:
+            os.replace(file_path, f"{base}.1{ext}")
+        else:
+            os.remove(file_path)
@@ -1,7 +1,8 @@
+import os
 import time
 import humanfriendly as hf
 
-from typing import Optional
+from typing import Dict, List, Optional
 from py3nvml.py3nvml import NVMLError, nvmlInit
 from datetime import timedelta, datetime
 
@@ -29,6 +30,81 @@ def check_has_nvml() -> bool:
         return False
 
 
+def get_gpu_env(gpu_ids: List[str]) -> Dict[str, str]:
+    """
+    Get the environment variables that restrict CUDA to the given GPUs.
+    Device ordering is set to PCI bus order to match NVML's indices.
+
+    :param gpu_ids: NVML indices of the GPUs to expose
+    :type gpu_ids: List[str]
+    :rtype: Dict[str, str]
+    """
+    return {
+        "CUDA_DEVICE_ORDER": "PCI_BUS_ID",
+        "CUDA_VISIBLE_DEVICES": ",".join(gpu_ids),
+    }
+
+
+def get_online_cpu_ids() -> List[int]:
+    """
+    Get the ids of the CPU cores the current process may run on
+
+    :rtype: List[int]
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin_to_cpus(cpu_ids: List[int]):
+    """
+    Restricts every thread of the current process, and the threads and processes started
+    afterwards, to the given CPU cores. sched_setaffinity only applies to a single thread,
+    so the threads are listed from /proc/self/task, or only the calling thread is pinned
+    where it is not available. Does nothing on platforms without sched_setaffinity.
+
+    :type cpu_ids: List[int]
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    try:
+        os.listdir("/proc/self/task")
+    except OSError:
+        os.sched_setaffinity(0, cpu_ids)
+        return
+
+    # List the threads again until no new thread was started while pinning,
+    # since new threads inherit the mask of the thread starting them
+    pinned = set()
+    while True:
+        thread_ids = set(int(t) for t in os.listdir("/proc/self/task")) - pinned
+        if len(thread_ids) == 0:
+            break
+        for thread_id in thread_ids:
+            try:
+                os.sched_setaffinity(thread_id, cpu_ids)
+            except ProcessLookupError:
+                # The thread exited meanwhile
+                pass
+        pinned |= thread_ids
+
+
+def format_cpu_ids(cpu_ids: List[int]) -> str:
+    """
+    Formats CPU core ids as ranges, like the taskset command (eg. 0-3,8)
+
+    :type cpu_ids: List[int]
+    :rtype: str
+    """
+    ranges: List[List[int]] = []
+    for cpu_id in sorted(cpu_ids):
+        if len(ranges) > 0 and ranges[-1][1] == cpu_id - 1:
+            ranges[-1][1] = cpu_id
+        else:
+            ranges.append([cpu_id, cpu_id])
+    return ",".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+
+
 def format_bytes(b: float) -> str:
     """
     Formats an amount of bytes into a string containing the value in the highest possible unit
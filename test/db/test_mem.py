@@ -4,6 +4,7 @@ from asynctest import TestCase
 
 from taskflow.model.task import Task, TaskPriority, TaskResourceUsage
 from taskflow.db.mem import InMemoryDb
+from test.helpers import make_task
 
 
 class InMemoryDbTestCase(TestCase):
@@ -83,3 +84,73 @@ class InMemoryDbTestCase(TestCase):
             l4 = await db.search_tasks(size=1)
             self.assertEqual(l4.total, 2)
             self.assertEqual(len(l4.tasks), 1)
+
+    async def test_counts(self):
+        async with self.with_db() as db:
+            tasks = [make_task(str(i), created_at=i) for i in range(3)]
+            for t in tasks:
+                await db.insert_task(t)
+
+            tasks[0].is_running = True
+            await db.update_task(tasks[0])
+            self.assertEqual(await db.get_pending_tasks_count(), 2)
+            self.assertEqual(await db.get_running_tasks_count(), 1)
+
+            # Updates happen in place
+            self.assertIs(await db.get_task_by_id("0"), tasks[0])
+
+            await db.delete_task(tasks[0])
+            await db.delete_task(tasks[1])
+            self.assertEqual(await db.get_pending_tasks_count(), 1)
+            self.assertEqual(await db.get_running_tasks_count(), 0)
+            self.assertIsNone(await db.get_task_by_id("1"))
+
+    async def test_cursor_pagination(self):
+        async with self.with_db() as db:
+            tasks = [
+                make_task(
+                    str(i),
+                    created_at=i,
+                    created_by="a" if i % 2 == 0 else "b",
+                    priority=TaskPriority.HIGH if i < 5 else TaskPriority.LOW,
+                )
+                for i in range(10)
+            ]
+            for t in reversed(tasks):
+                await db.insert_task(t)
+
+            ids = []
+            cursor = None
+            while True:
+                page = await db.search_tasks(size=3, cursor=cursor)
+                ids.extend(t.id for t in page.tasks)
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+            self.assertEqual(ids, [str(i) for i in range(10)])
+
+            l1 = await db.search_tasks(created_by="a", priority=TaskPriority.HIGH)
+            self.assertEqual([t.id for t in l1.tasks], ["0", "2", "4"])
+
+            # Tasks are re-indexed when their indexed fields change
+            tasks[0].is_running = True
+            await db.update_task(tasks[0])
+            l2 = await db.search_tasks(created_by="a", is_running=False, size=1)
+            self.assertEqual(l2.total, 4)
+            self.assertEqual([t.id for t in l2.tasks], ["2"])
+
+            l3 = await db.search_tasks(
+                created_by="a", is_running=False, size=10, cursor=l2.next_cursor
+            )
+            self.assertEqual([t.id for t in l3.tasks], ["4", "6", "8"])
+            self.assertIsNone(l3.next_cursor)
+
+            await db.delete_task(tasks[2])
+            l4 = await db.search_tasks(
+                created_by="a", is_running=False, priority=TaskPriority.HIGH
+            )
+            self.assertEqual(l4.total, 1)
+            self.assertEqual([t.id for t in l4.tasks], ["4"])
+
+            with self.assertRaises(ValueError):
+                await db.search_tasks(cursor="not a cursor")
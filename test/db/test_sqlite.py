@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from asynctest import TestCase
+
+from taskflow.model.task import Task, TaskPriority, TaskResourceUsage
+from taskflow.db.sqlite import SqliteDb
+from test.helpers import make_task
+
+
+class SqliteDbTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "tasks.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    @asynccontextmanager
+    async def with_db(self) -> AsyncIterator[SqliteDb]:
+        db = SqliteDb(path=self.path)
+        await db.init()
+
+        yield db
+
+        await db.shutdown()
+
+    async def test_persist(self):
+        async with self.with_db() as db:
+            t1 = Task(
+                id="1",
+                cmd="",
+                created_at=0,
+                created_by="",
+                priority=TaskPriority.MEDIUM,
+                usage=TaskResourceUsage(memory_bytes="1G"),
+            )
+            t2 = Task(
+                id="2",
+                cmd="",
+                created_at=1,
+                created_by="a",
+                priority=TaskPriority.HIGH,
+                usage=TaskResourceUsage(),
+            )
+            t3 = Task(
+                id="3",
+                cmd="",
+                created_at=2,
+                created_by="a",
+                priority=TaskPriority.LOW,
+                usage=TaskResourceUsage(),
+            )
+
+            await db.insert_task(t1)
+            await db.insert_task(t2)
+            await db.insert_task(t3)
+
+            t2.is_running = True
+            await db.update_task(t2)
+            await db.delete_task(t3)
+
+        async with self.with_db() as db:
+            # Pending tasks stay on disk until their client reconnects
+            self.assertEqual(await db.get_pending_tasks(), [])
+            self.assertEqual(await db.get_restored_tasks_count(), 1)
+
+            running = await db.get_running_tasks()
+            self.assertEqual([t.id for t in running], ["2"])
+
+            self.assertIsNone(await db.get_restored_task("2"))
+            restored = await db.get_restored_task("1")
+            assert restored is not None
+            self.assertEqual(restored.usage.memory_bytes, 1024**3)
+            await db.insert_task(restored)
+            self.assertIsNone(await db.get_restored_task("1"))
+
+            l1 = await db.search_tasks(created_by="a")
+            self.assertEqual(l1.total, 1)
+
+    async def test_drop_restored(self):
+        async with self.with_db() as db:
+            for i in range(3):
+                await db.insert_task(make_task(str(i), created_at=i))
+
+        async with self.with_db() as db:
+            restored = await db.get_restored_task("0")
+            assert restored is not None
+            await db.insert_task(restored)
+            self.assertEqual(await db.drop_restored_tasks(), 2)
+            self.assertEqual(await db.get_restored_tasks_count(), 0)
+
+        async with self.with_db() as db:
+            self.assertEqual(await db.get_restored_tasks_count(), 1)
+            self.assertIsNotNone(await db.get_restored_task("0"))
+            self.assertIsNone(await db.get_restored_task("1"))
+
+    async def test_write_during_commit(self):
+        async with self.with_db() as db:
+            commit = db._SqliteDb__commit
+
+            def slow_commit(*args):
+                time.sleep(0.2)
+                commit(*args)
+
+            db._SqliteDb__commit = slow_commit
+
+            await db.insert_task(make_task("1"))
+            # The first batch is committing
+            await asyncio.sleep(0.1)
+            await db.insert_task(make_task("2", created_at=1))
+            await asyncio.sleep(0.6)
+
+            # Both tasks are on disk before shutdown
+            conn = sqlite3.connect(self.path)
+            try:
+                ids = [row[0] for row in conn.execute("SELECT id FROM tasks")]
+            finally:
+                conn.close()
+            self.assertEqual(sorted(ids), ["1", "2"])
@@ -0,0 +1,33 @@
+from taskflow.model.task import Task, TaskPriority, TaskResourceUsage
+
+
+def make_task(
+    id: str = "1",
+    created_at: int = 0,
+    priority: TaskPriority = TaskPriority.MEDIUM,
+    created_by: str = "",
+    cmd: str = "",
+    init_delay_s: int = 0,
+    **fields,
+) -> Task:
+    """
+    Builds a task for tests. Keyword arguments naming a :class:`TaskResourceUsage` field
+    set the requested usage, the other ones set :class:`Task` fields.
+
+    :rtype: Task
+    """
+    usage = {
+        name: fields.pop(name)
+        for name in list(fields)
+        if name in TaskResourceUsage.__fields__
+    }
+    return Task(
+        id=id,
+        cmd=cmd,
+        created_at=created_at,
+        created_by=created_by,
+        priority=priority,
+        usage=TaskResourceUsage(**usage),
+        init_delay_s=init_delay_s,
+        **fields,
+    )
@@ -0,0 +1,140 @@
+import os
+import tempfile
+
+from asynctest import TestCase
+
+from taskflow.archive import TaskArchive
+from test.helpers import make_task
+
+DAY_MS = 24 * 3600 * 1000
+
+
+class TaskArchiveTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    async def test_search(self):
+        archive = TaskArchive(path=self.tmpdir.name, retention_days=0)
+        await archive.init()
+
+        for i in range(5):
+            await archive.append(
+                make_task(
+                    str(i),
+                    created_by="a" if i < 3 else "b",
+                    cmd=f"echo {i}",
+                    memory_bytes="1G",
+                    started_at=1000,
+                    cwd="/tmp",
+                ),
+                exit_code=i % 2,
+                finished_at=2000 + i,
+            )
+        await archive.append(make_task("5"), exit_code=None, finished_at=3000)
+
+        l1 = await archive.search(size=4)
+        self.assertEqual(l1.total, 6)
+        self.assertEqual([r.id for r in l1.records], ["5", "4", "3", "2"])
+        self.assertIsNone(l1.records[0].exit_code)
+        self.assertEqual(l1.records[1].runtime_ms, 1004)
+        self.assertEqual(l1.records[1].memory_bytes, 1024**3)
+
+        l2 = await archive.search(size=4, cursor=l1.next_cursor)
+        self.assertEqual([r.id for r in l2.records], ["1", "0"])
+        self.assertIsNone(l2.next_cursor)
+
+        l3 = await archive.search(created_by="b")
+        self.assertEqual([r.id for r in l3.records], ["4", "3"])
+
+        l4 = await archive.search(failed=True)
+        self.assertEqual([r.id for r in l4.records], ["3", "1"])
+        l4 = await archive.search(failed=True, size=1, cursor=l4.next_cursor)
+        self.assertEqual(l4.total, 2)
+        l4 = await archive.search(failed=True, created_by="a")
+        self.assertEqual((l4.total, [r.id for r in l4.records]), (1, ["1"]))
+        l4 = await archive.search(failed=False, created_by="a")
+        self.assertEqual([r.id for r in l4.records], ["2", "0"])
+
+        l5 = await archive.search(since=2001, until=2003)
+        self.assertEqual([r.id for r in l5.records], ["2", "1"])
+
+        record = await archive.get("2")
+        assert record is not None
+        self.assertEqual(record.cmd, "echo 2")
+        self.assertEqual(record.cwd, "/tmp")
+
+        # Records survive a restart
+        await archive.shutdown()
+        archive = TaskArchive(path=self.tmpdir.name, retention_days=0)
+        await archive.init()
+        await archive.append(make_task("6"), exit_code=0, finished_at=4000)
+        l6 = await archive.search(size=2)
+        self.assertEqual([r.id for r in l6.records], ["6", "5"])
+        await archive.shutdown()
+
+    async def test_user_hash_collision(self):
+        archive = TaskArchive(path=self.tmpdir.name, retention_days=0)
+        await archive.init()
+
+        # Both names have the same crc32
+        for i in range(4):
+            user = "buckeroo" if i == 1 else "plumless"
+            await archive.append(make_task(str(i), created_by=user), exit_code=0)
+
+        for _ in range(2):
+            l1 = await archive.search(created_by="plumless", size=2)
+            self.assertEqual(l1.total, 3)
+            self.assertEqual([r.id for r in l1.records], ["3", "2"])
+            l2 = await archive.search(created_by="plumless", cursor=l1.next_cursor)
+            self.assertEqual([r.id for r in l2.records], ["0"])
+
+            l3 = await archive.search(created_by="buckeroo", failed=False)
+            self.assertEqual(l3.total, 1)
+            self.assertEqual([r.id for r in l3.records], ["1"])
+
+            # The in-memory index is rebuilt from the files on restart
+            await archive.shutdown()
+            archive = TaskArchive(path=self.tmpdir.name, retention_days=0)
+            await archive.init()
+        await archive.shutdown()
+
+    async def test_compact(self):
+        archive = TaskArchive(path=self.tmpdir.name, retention_days=1)
+        await archive.init()
+
+        await archive.append(
+            make_task("old", created_by="x"), exit_code=0, finished_at=1000
+        )
+        await archive.append(
+            make_task("new", created_by="y", cmd="echo new"), exit_code=0
+        )
+
+        removed = await archive.compact()
+        self.assertEqual(removed, 1)
+
+        l1 = await archive.search()
+        self.assertEqual([r.id for r in l1.records], ["new"])
+        self.assertEqual(l1.records[0].cmd, "echo new")
+
+        # Only the new generation is left
+        self.assertEqual(
+            sorted(os.listdir(self.tmpdir.name)),
+            ["tasks-1.dat", "tasks-1.idx", "tasks-1.usr"],
+        )
+
+        await archive.append(make_task("newer", created_by="x"), exit_code=0)
+        l2 = await archive.search()
+        self.assertEqual([r.id for r in l2.records], ["newer", "new"])
+
+        # Users are numbered again in the new generation
+        await archive.shutdown()
+        archive = TaskArchive(path=self.tmpdir.name, retention_days=1)
+        await archive.init()
+        for user, ids in [("x", ["newer"]), ("y", ["new"])]:
+            l3 = await archive.search(created_by=user)
+            self.assertEqual([r.id for r in l3.records], ids)
+            self.assertEqual(l3.records[0].created_by, user)
+        await archive.shutdown()
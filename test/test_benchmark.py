@@ -0,0 +1,94 @@
+import io
+
+from unittest import TestCase
+
+from benchmark.fake_daemon import ScriptedSystemState, get_running_usage, load_script
+from benchmark.loadgen import parse_histogram
+from benchmark.utils import parse_range, percentiles
+from taskflow.model.task import Task, TaskPriority, TaskResourceUsage
+
+GB = 1024**3
+
+METRICS = """# HELP taskflow_event_loop_lag_seconds Lag
+# TYPE taskflow_event_loop_lag_seconds histogram
+taskflow_event_loop_lag_seconds_bucket{le="0.001"} 8
+taskflow_event_loop_lag_seconds_bucket{le="0.01"} 9
+taskflow_event_loop_lag_seconds_bucket{le="+Inf"} 10
+taskflow_event_loop_lag_seconds_sum 0.5
+taskflow_event_loop_lag_seconds_count 10
+"""
+
+
+class ScriptedSystemStateTestCase(TestCase):
+    def test_script(self):
+        steps = load_script(
+            io.StringIO(
+                """
+- at_s: 10
+  memory_free: 2G
+  gpu_memory_free: {"0": 1G}
+- at_s: 0
+  memory_free: 16G
+"""
+            )
+        )
+        self.assertEqual([s.at_s for s in steps], [0, 10])
+
+        state = ScriptedSystemState(
+            memory_total_bytes=8 * GB,
+            gpu_memory_total_bytes={"0": 4 * GB, "1": 4 * GB},
+            cpu_count=2,
+            steps=steps,
+        )
+        snapshot = state.probe()
+        self.assertEqual(snapshot.memory_free_bytes, 8 * GB)
+        self.assertEqual(dict(snapshot.cpu_load_percent), {0: 0, 1: 0})
+
+        state.started_at -= 10
+        snapshot = state.probe()
+        self.assertEqual(snapshot.memory_free_bytes, 2 * GB)
+        self.assertEqual(
+            dict(snapshot.gpu_memory_free_bytes), {"0": 1 * GB, "1": 4 * GB}
+        )
+
+    def test_running_usage(self):
+        task = Task(
+            id="1",
+            cmd="",
+            created_at=0,
+            created_by="",
+            priority=TaskPriority.MEDIUM,
+            usage=TaskResourceUsage(memory_bytes=3 * GB),
+            gpu_assignment={"0": 1 * GB},
+        )
+        state = ScriptedSystemState(
+            memory_total_bytes=8 * GB,
+            gpu_memory_total_bytes={"0": 4 * GB},
+            usage=lambda: get_running_usage([task]),
+        )
+
+        self.assertTrue(state.publish(state.probe()))
+        self.assertEqual(state.memory_free_bytes, 5 * GB)
+        self.assertEqual(dict(state.gpu_memory_free_bytes), {"0": 3 * GB})
+
+
+class LoadgenTestCase(TestCase):
+    def test_parse_histogram(self):
+        histogram = parse_histogram(METRICS, "taskflow_event_loop_lag_seconds")
+        self.assertEqual(histogram.count, 10)
+        self.assertEqual(histogram.mean(), 0.05)
+        self.assertEqual(histogram.quantile(0.5), 0.001)
+        self.assertEqual(histogram.quantile(0.99), float("inf"))
+
+        empty = parse_histogram("", "taskflow_event_loop_lag_seconds")
+        self.assertEqual((histogram - empty).count, 10)
+        self.assertEqual((histogram - histogram).quantile(0.99), 0.001)
+
+    def test_utils(self):
+        self.assertEqual(parse_range("1-10"), (1, 10))
+        self.assertEqual(parse_range("2.5"), (2.5, 2.5))
+        with self.assertRaises(ValueError):
+            parse_range("10-1")
+
+        self.assertEqual(percentiles([3, 1, 2, 4], [50, 100]), [2, 4])
+        self.assertEqual(percentiles([], [50]), [0])
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import tempfile
+
+from asynctest import TestCase
+
+from taskflow.estimator import (
+    ResourceEstimator,
+    get_usage_report,
+    normalize_cmd,
+    percentile,
+)
+from taskflow.model.task import TaskObservedUsage
+from taskflow.blocking import receive_usage_report
+from taskflow.model.ws import MessageType, SocketMessage
+from test.helpers import make_task
+
+MB = 1024**2
+
+
+def observed_usage(memory_peak_bytes: int) -> TaskObservedUsage:
+    observed = TaskObservedUsage()
+    observed.add_sample(memory_peak_bytes, {})
+    return observed
+
+
+class ResourceEstimatorTestCase(TestCase):
+    def test_normalize_cmd(self):
+        self.assertEqual(normalize_cmd("python  'a.py'"), normalize_cmd("python a.py"))
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 95), 5)
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 50), 3)
+
+    async def test_estimate(self):
+        estimator = ResourceEstimator(headroom=0)
+        self.assertIsNone(estimator.estimate("a", "python a.py", "/tmp"))
+
+        for peak in [100, 300, 200]:
+            estimator.record(
+                make_task(
+                    cmd="python a.py",
+                    created_by="a",
+                    cwd="/tmp",
+                    observed=observed_usage(peak * MB),
+                )
+            )
+
+        estimate = estimator.estimate("a", "python  a.py", "/tmp")
+        assert estimate is not None
+        self.assertEqual(estimate.samples_count, 3)
+        self.assertEqual(estimate.memory_bytes, 300 * MB)
+        self.assertIsNone(estimate.gpu_memory_bytes)
+
+        # Profiles are per user and directory
+        self.assertIsNone(estimator.estimate("b", "python a.py", "/tmp"))
+        self.assertIsNone(estimator.estimate("a", "python a.py", "/"))
+
+    async def test_save(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "profiles.json")
+            estimator = ResourceEstimator(path=path)
+            estimator.record(
+                make_task(
+                    cmd="python a.py",
+                    created_by="a",
+                    cwd="/tmp",
+                    observed=observed_usage(100 * MB),
+                )
+            )
+            await estimator.shutdown()
+
+            estimator = ResourceEstimator(path=path)
+            await estimator.init()
+            self.assertEqual(len(estimator), 1)
+            self.assertIsNotNone(estimator.estimate("a", "python a.py", "/tmp"))
+
+    def test_usage_report(self):
+        over = make_task(observed=observed_usage(1024 * MB), memory_bytes="20G")
+        report = get_usage_report(over)
+        assert report is not None
+        self.assertEqual(report.peak_memory_bytes, 1024 * MB)
+
+        close = make_task(observed=observed_usage(1024 * MB), memory_bytes="1.5G")
+        self.assertIsNone(get_usage_report(close))
+
+    async def test_receive_usage_report(self):
+        report = get_usage_report(
+            make_task(observed=observed_usage(1024 * MB), memory_bytes="20G")
+        )
+        messages = [
+            SocketMessage(type=MessageType.INFO_UPDATE).json(),
+            SocketMessage(type=MessageType.TASK_REPORT, data=report).json(),
+        ]
+
+        class FakeSocket:
+            async def recv(self):
+                if len(messages) < 1:
+                    raise asyncio.TimeoutError()
+                return messages.pop(0)
+
+        received = await receive_usage_report(FakeSocket())
+        self.assertEqual(received, report)
+        assert received is not None
+        self.assertIn("RAM: declared 20", received.summary())
+        self.assertIsNone(await receive_usage_report(FakeSocket()))
@@ -0,0 +1,18 @@
+import unittest
+
+from taskflow.fairshare import FairShareTracker
+
+
+class FairShareTrackerTestCase(unittest.TestCase):
+    def test_decay(self):
+        tracker = FairShareTracker(half_life_s=10)
+        tracker.charge("a", 100, now=0)
+        tracker.charge("b", 100, now=10)
+
+        self.assertAlmostEqual(tracker.usage("a", now=10), 50)
+        self.assertAlmostEqual(tracker.usage("a", now=20), 25)
+        self.assertAlmostEqual(tracker.usage("c", now=20), 0)
+
+        shares = {user: share for user, _, share in tracker.shares(now=10)}
+        self.assertAlmostEqual(shares["a"], 1 / 3)
+        self.assertAlmostEqual(shares["b"], 2 / 3)
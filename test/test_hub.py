@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from typing import List
+from asynctest import TestCase
+
+from taskflow.db.mem import InMemoryDb
+from taskflow.hub import UpdateHub
+from test.helpers import make_task
+
+
+class FakeWebSocket:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.messages: List[dict] = []
+
+    async def send_text(self, data: str):
+        if self.fail:
+            raise ConnectionError()
+        self.messages.append(json.loads(data))
+
+
+class UpdateHubTestCase(TestCase):
+    async def test_broadcast(self):
+        db = InMemoryDb()
+        hub = UpdateHub(db=db)
+
+        ws1 = FakeWebSocket()
+        ws2 = FakeWebSocket()
+        await hub.subscribe(ws1)
+        await hub.subscribe(ws2)
+        self.assertEqual(ws1.messages[0]["data"]["pending_tasks_count"], 0)
+
+        await db.insert_task(make_task("1"))
+        await hub.broadcast()
+        self.assertEqual(len(ws1.messages), 2)
+        self.assertEqual(ws2.messages[1]["data"]["pending_tasks_count"], 1)
+
+        # Nothing is sent when the counts did not change
+        await hub.broadcast()
+        self.assertEqual(len(ws1.messages), 2)
+
+        hub.unsubscribe(ws2)
+        await db.insert_task(make_task("2"))
+        await hub.broadcast()
+        self.assertEqual(len(ws1.messages), 3)
+        self.assertEqual(len(ws2.messages), 2)
+
+    async def test_drop_failed_subscribers(self):
+        db = InMemoryDb()
+        hub = UpdateHub(db=db)
+
+        ws = FakeWebSocket()
+        await hub.subscribe(ws)
+        ws.fail = True
+
+        await db.insert_task(make_task("1"))
+        await hub.broadcast()
+        self.assertEqual(len(hub), 0)
+
+    async def test_notify_wakes_loop(self):
+        db = InMemoryDb()
+        hub = UpdateHub(db=db)
+        loop_task = asyncio.ensure_future(hub.run())
+
+        ws = FakeWebSocket()
+        await hub.subscribe(ws)
+        await db.insert_task(make_task("1"))
+        hub.notify()
+        await asyncio.sleep(0.05)
+        self.assertEqual(ws.messages[-1]["data"]["pending_tasks_count"], 1)
+
+        hub.stop()
+        await loop_task
@@ -0,0 +1,94 @@
+import unittest
+
+from taskflow.ledger import ReservationLedger
+from taskflow.model.state import SystemState
+from test.helpers import make_task
+
+
+class ReservationLedgerTestCase(unittest.TestCase):
+    def test_release_on_claim(self):
+        state = SystemState(gpu_available=False)
+        state.memory_free_bytes = 10 * (1024**3)
+
+        ledger = ReservationLedger()
+        ledger.reserve(make_task("1", memory_bytes="2G"), state, expires_at=100)
+        ledger.reserve(make_task("2", memory_bytes="3G"), state, expires_at=100)
+        self.assertEqual(ledger.memory_bytes, 5 * (1024**3))
+
+        # Only the first task's usage has shown up
+        state.memory_free_bytes = 8 * (1024**3)
+        self.assertEqual(ledger.refresh(state, now=0), 1)
+        self.assertEqual(ledger.memory_bytes, 3 * (1024**3))
+
+        state.memory_free_bytes = 5 * (1024**3)
+        self.assertEqual(ledger.refresh(state, now=0), 1)
+        self.assertEqual(len(ledger), 0)
+
+    def test_release_on_expiry(self):
+        state = SystemState(gpu_available=False)
+        state.memory_free_bytes = 10 * (1024**3)
+
+        ledger = ReservationLedger()
+        t1 = make_task("1", gpu_memory_bytes={"any": "1G"})
+        t1.gpu_assignment = {"0": 1024**3}
+        ledger.reserve(t1, state, expires_at=10)
+        ledger.reserve(make_task("2"), state, expires_at=10)
+        self.assertEqual(len(ledger), 1)
+        self.assertEqual(ledger.next_expiry(), 10)
+
+        self.assertEqual(ledger.refresh(state, now=5), 0)
+        self.assertEqual(ledger.refresh(state, now=10), 1)
+        self.assertEqual(ledger.gpu_memory_bytes("0"), 0)
+
+    def test_release_on_ramp_up(self):
+        state = SystemState(gpu_available=False)
+        state.memory_free_bytes = 10 * (1024**3)
+        mib = 1024**2
+
+        ledger = ReservationLedger()
+        ledger.reserve(make_task("1", memory_bytes="2G"), state, expires_at=100)
+        ledger.reserve(make_task("2", memory_bytes="2G"), state, expires_at=100)
+
+        # Reaching the declared usage releases the promise right away
+        self.assertFalse(ledger.observe("1", 500 * mib, {}))
+        self.assertTrue(ledger.observe("1", 2048 * mib, {}))
+        self.assertEqual(len(ledger), 1)
+
+        # Usage that stops growing releases the promise after a few samples
+        released = [ledger.observe("2", 1024 * mib, {}) for _ in range(5)]
+        self.assertEqual(released, [False] * 4 + [True])
+        self.assertEqual(len(ledger), 0)
+
+        # Unknown tasks are ignored
+        self.assertFalse(ledger.observe("3", 0, {}))
+
+    def test_hold_unclaimed_usage(self):
+        state = SystemState(gpu_available=False)
+        state.memory_free_bytes = 10 * (1024**3)
+        mib = 1024**2
+
+        ledger = ReservationLedger()
+        t1 = make_task("1", memory_bytes="4G", gpu_memory_bytes={"any": "2G"})
+        t1.gpu_assignment = {"0": 2048 * mib}
+        ledger.reserve(t1, state, expires_at=10)
+
+        # After ramping up, only the part the task has not used yet stays held
+        ledger.observe("1", 1024 * mib, {"0": 512 * mib})
+        self.assertEqual(ledger.refresh(state, now=10), 1)
+        self.assertEqual(len(ledger), 0)
+        self.assertEqual(ledger.memory_bytes, 3072 * mib)
+        self.assertEqual(ledger.gpu_memory_bytes("0"), 1536 * mib)
+
+        # Using more of the declared usage shrinks the held part
+        ledger.observe("1", 5000 * mib, {"0": 2048 * mib})
+        self.assertEqual(ledger.memory_bytes, 0)
+        self.assertEqual(ledger.gpu_memory_bytes("0"), 0)
+
+        # Freeing memory holds it again, up to the declared usage
+        ledger.observe("1", 3072 * mib, {})
+        self.assertEqual(ledger.memory_bytes, 1024 * mib)
+        self.assertEqual(ledger.gpu_memory_bytes("0"), 2048 * mib)
+
+        self.assertTrue(ledger.release("1"))
+        self.assertEqual(ledger.memory_bytes, 0)
+        self.assertEqual(ledger.gpu_memory_bytes("0"), 0)
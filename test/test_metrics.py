@@ -0,0 +1,44 @@
+import asyncio
+
+from asynctest import TestCase
+
+from taskflow.metrics import Counter, Gauge, Histogram, LoopLagMonitor, MetricsRegistry
+from taskflow import metrics
+
+
+class MetricsTestCase(TestCase):
+    def test_render(self):
+        registry = MetricsRegistry()
+        counter = registry.register(Counter("c_total", "A counter"))
+        gauge = registry.register(Gauge("g", "A gauge", ["user"]))
+        histogram = registry.register(Histogram("h", "A histogram", buckets=(1, 5)))
+
+        counter.inc()
+        counter.inc(2)
+        gauge.inc(labels=('a"b',))
+        gauge.set(3, labels=("c",))
+        gauge.dec(labels=("c",))
+        histogram.observe(0.5)
+        histogram.observe(1)
+        histogram.observe(7)
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE c_total counter", lines)
+        self.assertIn("c_total 3", lines)
+        self.assertIn('g{user="a\\"b"} 1', lines)
+        self.assertIn('g{user="c"} 2', lines)
+        self.assertIn('h_bucket{le="1"} 2', lines)
+        self.assertIn('h_bucket{le="5"} 2', lines)
+        self.assertIn('h_bucket{le="+Inf"} 3', lines)
+        self.assertIn("h_sum 8.5", lines)
+        self.assertIn("h_count 3", lines)
+
+    async def test_loop_lag(self):
+        before = metrics.EVENT_LOOP_LAG.count()
+        monitor = LoopLagMonitor(interval_s=0.01)
+        task = asyncio.ensure_future(monitor.run())
+        await asyncio.sleep(0.1)
+        monitor.stop()
+        await task
+
+        self.assertGreater(metrics.EVENT_LOOP_LAG.count(), before)
@@ -0,0 +1,52 @@
+import unittest
+
+from taskflow.model.task import TaskPriority
+from taskflow.pending import PendingQueue
+from test.helpers import make_task
+
+
+class PendingQueueTestCase(unittest.TestCase):
+    def test_order(self):
+        queue = PendingQueue()
+        queue.push(make_task("1", 0, TaskPriority.LOW))
+        queue.push(make_task("2", 1, TaskPriority.HIGH))
+        queue.push(make_task("3", 2, TaskPriority.MEDIUM))
+        queue.push(make_task("4", 3, TaskPriority.HIGH))
+
+        self.assertEqual([t.id for t in queue], ["2", "4", "3", "1"])
+
+        queue.remove("4")
+        self.assertEqual([t.id for t in queue], ["2", "3", "1"])
+        self.assertIsNone(queue.remove("4"))
+
+        # Updating a task moves it to its new position
+        queue.push(make_task("1", 0, TaskPriority.HIGH))
+        self.assertEqual([t.id for t in queue], ["1", "2", "3"])
+        self.assertEqual(len(queue), 3)
+        self.assertIn("3", queue)
+
+    def test_penalties(self):
+        queue = PendingQueue()
+        for i in range(3):
+            t = make_task(f"a{i}", i, TaskPriority.MEDIUM)
+            t.created_by = "a"
+            queue.push(t)
+        t = make_task("b0", 10, TaskPriority.MEDIUM)
+        t.created_by = "b"
+        queue.push(t)
+
+        self.assertEqual([t.id for t in queue], ["a0", "a1", "a2", "b0"])
+        self.assertEqual(queue.user_count("a"), 3)
+
+        # "a" has used a lot, so its tasks fall behind "b"
+        ordered = queue.ordered({"a": 50, "b": 10})
+        self.assertEqual([t.id for t in ordered], ["b0", "a0", "a1", "a2"])
+
+    def test_aging(self):
+        queue = PendingQueue(aging_per_minute=1)
+        queue.push(make_task("low", 0, TaskPriority.LOW))
+        # Created 2 hours later, so the LOW task has gained more than 100 priority
+        queue.push(make_task("medium", 2 * 3600 * 1000, TaskPriority.MEDIUM))
+        queue.push(make_task("high", 2 * 3600 * 1000, TaskPriority.HIGH))
+
+        self.assertEqual([t.id for t in queue], ["high", "low", "medium"])
@@ -0,0 +1,148 @@
+import os
+import tempfile
+
+from unittest import TestCase
+
+from taskflow.model.state import SystemState
+from taskflow.probe.base import IResourceProbe, ProbeResult
+from taskflow.probe.cgroup import (
+    CgroupMemoryProbe,
+    find_cgroup_dir,
+    find_cgroup_mount,
+)
+from taskflow.probe.file import FileProbe
+
+GB = 1024**3
+
+
+class StaticProbe(IResourceProbe):
+    def __init__(self, result: ProbeResult) -> None:
+        self.result = result
+
+    def probe(self) -> ProbeResult:
+        return self.result
+
+
+def write_cgroup(path: str, limit: str, current: int, inactive_file: int):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "memory.max"), "wt") as f:
+        f.write(limit + "\n")
+    with open(os.path.join(path, "memory.current"), "wt") as f:
+        f.write(f"{current}\n")
+    with open(os.path.join(path, "memory.stat"), "wt") as f:
+        f.write(f"anon {current - inactive_file}\ninactive_file {inactive_file}\n")
+
+
+class CgroupMemoryProbeTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_limits(self):
+        parent = os.path.join(self.root, "taskflow.slice")
+        leaf = os.path.join(parent, "taskflowd.service")
+        write_cgroup(parent, str(8 * GB), current=5 * GB, inactive_file=1 * GB)
+        write_cgroup(leaf, "max", current=3 * GB, inactive_file=1 * GB)
+
+        self.assertTrue(CgroupMemoryProbe.has_limit(leaf, root=self.root))
+        self.assertFalse(CgroupMemoryProbe.has_limit(leaf, root=leaf))
+
+        probe = CgroupMemoryProbe(leaf, root=self.root)
+        result = probe.probe()
+        # Limited by the parent, with its page cache counted as free
+        self.assertEqual(result.memory_free_bytes, 4 * GB)
+        self.assertEqual(result.memory_total_bytes, 8 * GB)
+
+        # The tightest level wins
+        write_cgroup(leaf, str(4 * GB), current=3 * GB, inactive_file=1 * GB)
+        result = probe.probe()
+        self.assertEqual(result.memory_free_bytes, 2 * GB)
+        self.assertEqual(result.memory_total_bytes, 4 * GB)
+
+        # Never more than the host
+        host = StaticProbe(
+            ProbeResult(memory_free_bytes=1 * GB, memory_total_bytes=2 * GB)
+        )
+        result = CgroupMemoryProbe(leaf, root=self.root, host=host).probe()
+        self.assertEqual(result.memory_free_bytes, 1 * GB)
+        self.assertEqual(result.memory_total_bytes, 2 * GB)
+
+        with self.assertRaises(ValueError):
+            CgroupMemoryProbe(os.path.join(self.root, "missing"))
+
+    def test_leaf_without_controller(self):
+        parent = os.path.join(self.root, "user.slice")
+        leaf = os.path.join(parent, "session.scope")
+        write_cgroup(parent, str(8 * GB), current=5 * GB, inactive_file=1 * GB)
+        os.makedirs(leaf)
+
+        self.assertTrue(CgroupMemoryProbe.has_limit(leaf, root=self.root))
+        result = CgroupMemoryProbe(leaf, root=self.root).probe()
+        self.assertEqual(result.memory_free_bytes, 4 * GB)
+        self.assertEqual(result.memory_total_bytes, 8 * GB)
+
+    def test_find_cgroup_dir(self):
+        cgroup_dir = os.path.join(self.root, "system.slice", "taskflowd.service")
+        os.makedirs(cgroup_dir)
+        mountinfo = os.path.join(self.root, "mountinfo")
+        with open(mountinfo, "wt") as f:
+            f.write(
+                "22 1 0:21 / /proc rw,nosuid shared:12 - proc proc rw\n"
+                f"30 25 0:26 / {self.root} rw,nosuid shared:4 - cgroup2 cgroup2 rw\n"
+            )
+        cgroup = os.path.join(self.root, "cgroup")
+        with open(cgroup, "wt") as f:
+            f.write("0::/system.slice/taskflowd.service\n")
+        self.assertEqual(find_cgroup_dir(mountinfo, cgroup), cgroup_dir)
+
+        # The cgroup of a container is mounted as the root
+        with open(cgroup, "wt") as f:
+            f.write("0::/docker/1234\n")
+        self.assertEqual(find_cgroup_dir(mountinfo, cgroup), self.root)
+
+        with open(mountinfo, "wt") as f:
+            f.write("22 1 0:21 / /proc rw,nosuid shared:12 - proc proc rw\n")
+        self.assertIsNone(find_cgroup_dir(mountinfo, cgroup))
+
+        # Without /proc
+        missing = os.path.join(self.root, "missing")
+        self.assertIsNone(find_cgroup_mount(missing))
+        self.assertIsNone(find_cgroup_dir(missing, cgroup))
+        with open(mountinfo, "wt") as f:
+            f.write(f"30 25 0:26 / {self.root} rw - cgroup2 cgroup2 rw\n")
+        self.assertIsNone(find_cgroup_dir(mountinfo, missing))
+
+
+class SystemStateProbesTestCase(TestCase):
+    def test_file_probe(self):
+        with tempfile.NamedTemporaryFile("wt", suffix=".yml") as f:
+            f.write(
+                "memory_free: 2G\nmemory_total: 8G\n"
+                'gpu_memory_free: {0: 1G}\ngpu_memory_total: {"0": 4G}\n'
+            )
+            f.flush()
+
+            result = FileProbe(f.name).probe()
+            self.assertEqual(result.memory_free_bytes, 2 * GB)
+            self.assertEqual(result.gpu_memory_free_bytes, {"0": 1 * GB})
+            self.assertEqual(result.gpu_memory_total_bytes, {"0": 4 * GB})
+
+            result = FileProbe(f.name, memory=False).probe()
+            self.assertIsNone(result.memory_free_bytes)
+            self.assertEqual(result.gpu_memory_free_bytes, {"0": 1 * GB})
+
+            # Later probes override earlier ones
+            host = StaticProbe(
+                ProbeResult(memory_free_bytes=32 * GB, memory_total_bytes=64 * GB)
+            )
+            state = SystemState(probes=[host, FileProbe(f.name, memory=False)])
+            state.update()
+            self.assertEqual(state.memory_free_bytes, 32 * GB)
+            self.assertEqual(dict(state.gpu_memory_free_bytes), {"0": 1 * GB})
+
+            state = SystemState(probes=[host, FileProbe(f.name)])
+            state.update()
+            self.assertEqual(state.memory_total_bytes, 8 * GB)
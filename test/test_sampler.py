@@ -0,0 +1,113 @@
+import asyncio
+import os
+
+from asynctest import TestCase
+
+from taskflow.db.mem import InMemoryDb
+from taskflow.model.task import (
+    Task,
+    TaskObservedUsage,
+    TaskPriority,
+    TaskResourceUsage,
+)
+from taskflow.sampler import TaskUsageSampler
+
+
+class TaskObservedUsageTestCase(TestCase):
+    def test_add_sample(self):
+        observed = TaskObservedUsage()
+        observed.add_sample(100, {"0": 10})
+        observed.add_sample(300, {"1": 30})
+
+        self.assertEqual(observed.samples_count, 2)
+        self.assertEqual(observed.memory_peak_bytes, 300)
+        self.assertEqual(observed.memory_mean_bytes, 200)
+        self.assertEqual(observed.gpu_memory_peak_bytes, {"0": 10, "1": 30})
+        # Missing samples count as no usage
+        self.assertEqual(observed.gpu_memory_mean_bytes, {"0": 5, "1": 15})
+
+
+class TaskUsageSamplerTestCase(TestCase):
+    async def test_sample_own_process(self):
+        db = InMemoryDb()
+        task = Task(
+            id="1",
+            cmd="",
+            created_at=0,
+            created_by="",
+            priority=TaskPriority.MEDIUM,
+            usage=TaskResourceUsage(),
+            is_running=True,
+            pid=os.getpid(),
+        )
+        await db.insert_task(task)
+
+        sampler = TaskUsageSampler(db=db, gpu_available=False)
+        await sampler.sample()
+        await sampler.sample()
+
+        assert task.observed is not None
+        self.assertEqual(task.observed.samples_count, 2)
+        self.assertGreater(task.observed.memory_peak_bytes, 0)
+
+    async def test_ramp_up_samples(self):
+        db = InMemoryDb()
+        task = Task(
+            id="1",
+            cmd="",
+            created_at=0,
+            created_by="",
+            priority=TaskPriority.MEDIUM,
+            usage=TaskResourceUsage(),
+            is_running=True,
+            pid=os.getpid(),
+        )
+        await db.insert_task(task)
+
+        samples = []
+        ramping = [True]
+        sampler = TaskUsageSampler(
+            db=db,
+            interval_s=0,
+            gpu_available=False,
+            ramp_up_interval_s=0.1,
+            ramping=lambda: ramping[0],
+            on_sample=lambda task_id, memory, gpu: samples.append(task_id),
+        )
+        self.assertEqual(sampler.next_interval(), 0.1)
+
+        await sampler.sample()
+        self.assertEqual(samples, ["1"])
+
+        # Periodic sampling is disabled, so only a wake up triggers a sample
+        ramping[0] = False
+        self.assertIsNone(sampler.next_interval())
+
+    async def test_task_deleted_while_probing(self):
+        db = InMemoryDb()
+        task = Task(
+            id="1",
+            cmd="",
+            created_at=0,
+            created_by="",
+            priority=TaskPriority.MEDIUM,
+            usage=TaskResourceUsage(),
+            is_running=True,
+            pid=os.getpid(),
+        )
+        await db.insert_task(task)
+
+        sampler = TaskUsageSampler(db=db, gpu_available=False)
+        probe = sampler._TaskUsageSampler__probe  # type: ignore
+        loop = asyncio.get_event_loop()
+
+        def delete_and_probe(pids):
+            # The task finishes on the event loop while the worker thread measures it
+            asyncio.run_coroutine_threadsafe(db.delete_task(task), loop).result()
+            return probe(pids)
+
+        sampler._TaskUsageSampler__probe = delete_and_probe  # type: ignore
+        await sampler.sample()
+
+        self.assertIsNone(await db.get_task_by_id("1"))
+        self.assertEqual(await db.get_running_tasks_count(), 0)
@@ -0,0 +1,300 @@
+import asyncio
+import os
+import tempfile
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from asynctest import TestCase
+from pydantic import ValidationError
+
+from taskflow.model.settings import GpuPlacement
+from taskflow.model.state import SystemState
+from taskflow.model.task import NewTask, TaskPriority, TaskResourceUsage
+from taskflow.db.mem import InMemoryDb
+from taskflow.db.sqlite import SqliteDb
+from taskflow.scheduler import TaskScheduler
+from test.helpers import make_task
+
+
+class TaskSchedulerTestCase(TestCase):
+    @asynccontextmanager
+    async def with_scheduler(
+        self, state: Optional[SystemState] = None
+    ) -> AsyncIterator[TaskScheduler]:
+        db = InMemoryDb()
+        await db.init()
+
+        if state is None:
+            state = SystemState(gpu_available=False)
+            state.memory_free_bytes = 10 * (1024**3)
+
+        scheduler = TaskScheduler(
+            state=state, db=db, reserved_memory_bytes=0, reserved_gpu_memory_bytes=0
+        )
+        loop_task = asyncio.ensure_future(scheduler.loop())
+
+        yield scheduler
+
+        scheduler.stop()
+        await loop_task
+        await db.shutdown()
+
+    async def test_notify_wakes_loop(self):
+        async with self.with_scheduler() as scheduler:
+            # Let the initial pass run on an empty queue
+            await asyncio.sleep(0.1)
+
+            t1 = make_task("1", memory_bytes="1G")
+            await scheduler.db.insert_task(t1)
+            scheduler.submit(t1)
+
+            # Much shorter than the fallback loop interval
+            can_start = await scheduler.wait_for_task_execution(t1, timeout=1)
+            self.assertTrue(can_start)
+
+    async def test_start_future(self):
+        async with self.with_scheduler() as scheduler:
+            t1 = make_task("1", memory_bytes="1G")
+            await scheduler.db.insert_task(t1)
+            future = scheduler.wait_for_start(t1)
+            scheduler.submit(t1)
+
+            start_info = await asyncio.wait_for(future, timeout=1)
+            self.assertEqual(start_info.gpu_ids, [])
+            self.assertIs(scheduler.wait_for_start(t1), future)
+
+    async def test_state_demand(self):
+        async with self.with_scheduler() as scheduler:
+            requests = []
+            scheduler.on_state_demand = lambda: requests.append(1)
+            self.assertFalse(scheduler.needs_fresh_state())
+
+            t1 = make_task("1", memory_bytes="1G")
+            await scheduler.db.insert_task(t1)
+            scheduler.submit(t1)
+            self.assertTrue(scheduler.needs_fresh_state())
+            self.assertEqual(len(requests), 1)
+
+            # Starting the task asks for a fresh state to follow its ramp-up
+            await scheduler.wait_for_task_execution(t1, timeout=1)
+            self.assertEqual(len(requests), 2)
+
+            scheduler.task_finished(t1)
+            self.assertFalse(scheduler.needs_fresh_state())
+            self.assertEqual(len(requests), 2)
+
+    async def test_task_too_large(self):
+        async with self.with_scheduler() as scheduler:
+            t1 = make_task("1", memory_bytes="20G")
+            await scheduler.db.insert_task(t1)
+            scheduler.submit(t1)
+
+            can_start = await scheduler.wait_for_task_execution(t1, timeout=0.5)
+            self.assertFalse(can_start)
+
+    async def test_start_many_per_pass(self):
+        async with self.with_scheduler() as scheduler:
+            tasks = [
+                make_task(str(i), created_at=i, memory_bytes="2G") for i in range(6)
+            ]
+            for t in tasks:
+                await scheduler.db.insert_task(t)
+                scheduler.submit(t)
+
+            # 10G free fits 4 tasks, without waiting for their init delay
+            results = await asyncio.gather(
+                *[scheduler.wait_for_task_execution(t, timeout=0.5) for t in tasks]
+            )
+            self.assertEqual(results, [True] * 4 + [False] * 2)
+            self.assertEqual(scheduler.ledger.memory_bytes, 8 * (1024**3))
+
+            # Releasing a promise lets the next task in
+            scheduler.task_finished(tasks[0])
+            can_start = await scheduler.wait_for_task_execution(tasks[4], timeout=0.5)
+            self.assertTrue(can_start)
+
+    def test_place_any_gpu(self):
+        state = SystemState(gpu_available=True)
+        state.memory_free_bytes = 10 * (1024**3)
+        state.gpu_memory_free_bytes = {
+            "0": 4 * (1024**3),
+            "1": 12 * (1024**3),
+            "2": 8 * (1024**3),
+        }
+        scheduler = TaskScheduler(
+            state=state,
+            db=InMemoryDb(),
+            reserved_memory_bytes=0,
+            reserved_gpu_memory_bytes=0,
+        )
+
+        t1 = make_task("1", gpu_memory_bytes={"any": "6G"})
+        self.assertEqual(scheduler.place_task(t1), {"2": 6 * (1024**3)})
+
+        t2 = make_task("2", gpu_memory_bytes={"1": "1G", "any": "3G"}, gpu_count=2)
+        self.assertEqual(
+            scheduler.place_task(t2),
+            {"1": 1024**3, "0": 3 * (1024**3), "2": 3 * (1024**3)},
+        )
+        # Pinning would renumber the explicit GPU
+        t2.gpu_assignment = scheduler.place_task(t2)
+        self.assertEqual(t2.visible_gpu_ids(), [])
+        with self.assertRaises(ValidationError):
+            NewTask(
+                cmd="",
+                created_by="",
+                priority=TaskPriority.MEDIUM,
+                usage=t2.usage,
+            )
+
+        t4 = make_task("4", gpu_memory_bytes={"any": "3G"}, gpu_count=2)
+        t4.gpu_assignment = scheduler.place_task(t4)
+        self.assertEqual(t4.visible_gpu_ids(), ["0", "2"])
+
+        scheduler.gpu_placement = GpuPlacement.WORST_FIT
+        self.assertEqual(scheduler.place_task(t1), {"1": 6 * (1024**3)})
+
+        t3 = make_task("3", gpu_memory_bytes={"any": "6G"}, gpu_count=3)
+        self.assertIsNone(scheduler.place_task(t3))
+
+    async def test_place_cpus(self):
+        state = SystemState(gpu_available=False)
+        state.memory_free_bytes = 10 * (1024**3)
+        state.cpu_load_percent = {0: 90, 1: 10, 2: 0, 3: 20}
+
+        async with self.with_scheduler(state) as scheduler:
+            # The busy core is never picked
+            t1 = make_task("1", cpu_count=2)
+            self.assertEqual(scheduler.place_cpus(t1, scheduler._capacity()), [1, 2])
+            self.assertFalse(scheduler.can_task_run(make_task("2", cpu_count=4)))
+
+            await scheduler.db.insert_task(t1)
+            scheduler.submit(t1)
+            start_info = await asyncio.wait_for(scheduler.wait_for_start(t1), 1)
+            self.assertEqual(start_info.cpu_ids, [1, 2])
+
+            # Assigned cores are not given to other tasks
+            t3 = make_task("3", cpu_count=1)
+            self.assertEqual(scheduler.place_cpus(t3, scheduler._capacity()), [3])
+            self.assertFalse(scheduler.can_task_run(make_task("4", cpu_count=2)))
+
+            scheduler.task_finished(t1)
+            self.assertTrue(scheduler.can_task_run(make_task("4", cpu_count=2)))
+
+    async def test_counted_resources(self):
+        state = SystemState(gpu_available=False)
+        state.memory_free_bytes = 10 * (1024**3)
+
+        async with self.with_scheduler(state) as scheduler:
+            scheduler.resources = {"license": 2}
+            self.assertEqual(
+                scheduler.unavailable_resources(
+                    TaskResourceUsage(resources={"license": 3, "ssd": 1})
+                ),
+                ["license", "ssd"],
+            )
+
+            tasks = [
+                make_task(str(i), created_at=i, resources={"license": 1})
+                for i in range(3)
+            ]
+            for t in tasks:
+                await scheduler.db.insert_task(t)
+                scheduler.submit(t)
+
+            results = await asyncio.gather(
+                *[scheduler.wait_for_task_execution(t, timeout=0.5) for t in tasks]
+            )
+            self.assertEqual(results, [True, True, False])
+            self.assertEqual(scheduler.resources_in_use(), {"license": 2})
+
+            scheduler.task_finished(tasks[0])
+            can_start = await scheduler.wait_for_task_execution(tasks[2], timeout=0.5)
+            self.assertTrue(can_start)
+
+    def test_backfill(self):
+        state = SystemState(gpu_available=False)
+        state.memory_free_bytes = 12 * (1024**3)
+        scheduler = TaskScheduler(
+            state=state,
+            db=InMemoryDb(),
+            reserved_memory_bytes=0,
+            reserved_gpu_memory_bytes=0,
+            backfill=True,
+        )
+
+        # 6G running for another hour
+        running = make_task("running", memory_bytes="6G")
+        running.expected_runtime_s = 3600
+        scheduler.submit(running)
+        scheduler.run_pass()
+
+        # The head task needs the running task's memory
+        head = make_task("head", created_at=1, memory_bytes="10G")
+        head.priority = TaskPriority.HIGH
+        short = make_task("short", created_at=2, memory_bytes="2G")
+        short.expected_runtime_s = 60
+        long = make_task("long", created_at=3, memory_bytes="3G")
+        long.expected_runtime_s = 7200
+        unknown = make_task("unknown", created_at=4, memory_bytes="1G")
+        for t in (head, short, long, unknown):
+            scheduler.submit(t)
+
+        # "short" ends before the head's slot, "unknown" fits in the 2G left over at that time
+        scheduler.run_pass()
+        self.assertEqual([t.id for t in scheduler.queue], ["head", "long"])
+
+    def test_effective_priority(self):
+        scheduler = TaskScheduler(
+            state=SystemState(gpu_available=False),
+            db=InMemoryDb(),
+            reserved_memory_bytes=0,
+            reserved_gpu_memory_bytes=0,
+            fair_share=True,
+        )
+        now = scheduler.clock.monotonic()
+        scheduler.usage_tracker.charge("a", 3600, now)
+        scheduler.usage_tracker.charge("b", 3600, now)
+
+        task = make_task("a")
+        task.created_by = "a"
+        self.assertAlmostEqual(scheduler.effective_priority(task), 50, places=3)
+
+        # Penalties computed once for a whole page
+        penalties = scheduler.priority_penalties(now)
+        self.assertAlmostEqual(
+            scheduler.effective_priority(task, penalties), 50, places=3
+        )
+        self.assertEqual(scheduler.effective_priority(task, {}), 100)
+
+    async def test_reattach(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "tasks.db")
+            db = SqliteDb(path=path)
+            await db.init()
+            task = make_task("1", memory_bytes="1G")
+            task.created_by = "a"
+            task.cmd = "train"
+            await db.insert_task(task)
+            await db.shutdown()
+
+            db = SqliteDb(path=path)
+            await db.init()
+            scheduler = TaskScheduler(
+                state=SystemState(gpu_available=False),
+                db=db,
+                reserved_memory_bytes=0,
+                reserved_gpu_memory_bytes=0,
+            )
+            await scheduler.restore()
+
+            # Task ids are public, other users cannot take the task over
+            self.assertIsNone(await scheduler.reattach("1", "b", "train"))
+            self.assertIsNone(await scheduler.reattach("1", "a", "rm -rf"))
+
+            restored = await scheduler.reattach("1", "a", "train")
+            assert restored is not None
+            self.assertEqual(restored.usage.memory_bytes, 1024**3)
+            self.assertEqual(len(scheduler.queue), 1)
+            self.assertIsNone(await scheduler.reattach("1", "a", "train"))
+            await db.shutdown()
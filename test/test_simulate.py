@@ -0,0 +1,75 @@
+import io
+
+from asynctest import TestCase
+
+from benchmark.simulate import (
+    Machine,
+    Simulation,
+    VirtualClock,
+    WorkloadTask,
+    generate_workload,
+    load_workload,
+    save_workload,
+)
+from taskflow.model.task import TaskPriority, TaskResourceUsage
+
+GB = 1024**3
+
+
+def make_workload_task(submit_s: float, memory_gb: int, **kwargs) -> WorkloadTask:
+    return WorkloadTask(
+        submit_s=submit_s,
+        usage=TaskResourceUsage(memory_bytes=memory_gb * GB),
+        init_delay_s=0,
+        **kwargs,
+    )
+
+
+class SimulationTestCase(TestCase):
+    def test_clock(self):
+        clock = VirtualClock(epoch_ms=1000)
+        clock.now_s = 2.5
+        self.assertEqual(clock.monotonic(), 2.5)
+        self.assertEqual(clock.timestamp_ms(), 3500)
+
+    def test_workload_io(self):
+        workload = generate_workload(20, seed=1, gpu_ratio=0.5)
+        self.assertEqual(len(workload), 20)
+        self.assertEqual(workload, generate_workload(20, seed=1, gpu_ratio=0.5))
+        self.assertTrue(all(w.memory_bytes <= w.usage.memory_bytes for w in workload))
+
+        f = io.StringIO()
+        save_workload(workload, f)
+        f.seek(0)
+        self.assertEqual(load_workload(f), workload)
+
+        f = io.StringIO('{"submit_s": 1, "duration_s": 5, "memory_bytes": "2G"}\n')
+        self.assertEqual(load_workload(f)[0].memory_bytes, 2 * GB)
+
+    async def test_queueing(self):
+        workload = [
+            make_workload_task(0, 6, duration_s=100),
+            make_workload_task(10, 6, duration_s=50, priority=TaskPriority.HIGH),
+            make_workload_task(20, 2, duration_s=10),
+        ]
+        simulation = Simulation(workload, Machine(memory_bytes=10 * GB))
+        report = await simulation.run()
+
+        self.assertEqual(report["started"], 3)
+        self.assertEqual(report["finished"], 3)
+        self.assertEqual(report["never_started"], 0)
+        # The second task waits for the first one to finish, the third one fits right away
+        self.assertGreaterEqual(report["wait_s"]["HIGH"]["mean"], 90)
+        self.assertLess(report["wait_s"]["MEDIUM"]["p100"], 5)
+        self.assertGreaterEqual(report["makespan_s"], 150)
+        self.assertLess(report["makespan_s"], 200)
+        self.assertGreater(report["memory_utilization"], 0)
+        self.assertLessEqual(report["memory_utilization"], 1)
+
+    async def test_oversized_task(self):
+        workload = [make_workload_task(0, 64, duration_s=10)]
+        simulation = Simulation(workload, Machine(memory_bytes=10 * GB))
+        report = await simulation.run()
+
+        self.assertEqual(report["started"], 0)
+        self.assertEqual(report["rejected"] + report["never_started"], 1)
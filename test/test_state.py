@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+from asynctest import TestCase
+
+from taskflow.model.state import (
+    SystemState,
+    SystemStateSnapshot,
+    SystemStateUpdateCoroutine,
+)
+
+
+class FakeState(SystemState):
+    __slots__ = ["probe_threads"]
+
+    def __init__(self) -> None:
+        super().__init__(gpu_available=False)
+        self.probe_threads = []
+
+    def probe(self) -> SystemStateSnapshot:
+        self.probe_threads.append(threading.current_thread())
+        return SystemStateSnapshot(memory_free_bytes=len(self.probe_threads) * 100)
+
+
+class SystemStateTestCase(TestCase):
+    def test_publish(self):
+        state = SystemState(gpu_available=False)
+        state.gpu_memory_free_bytes = {"0": 100}
+        with self.assertRaises(TypeError):
+            state.gpu_memory_free_bytes["0"] = 0  # type: ignore
+
+        old = state.snapshot
+        changed = state.publish(
+            old._replace(memory_free_bytes=50), change_threshold_bytes=10
+        )
+        self.assertTrue(changed)
+        self.assertEqual(state.memory_free_bytes, 50)
+        self.assertEqual(state.gpu_memory_free_bytes["0"], 100)
+        # Snapshots are never modified in place
+        self.assertEqual(old.memory_free_bytes, 0)
+
+        changed = state.publish(
+            state.snapshot._replace(memory_free_bytes=55), change_threshold_bytes=10
+        )
+        self.assertFalse(changed)
+
+    async def test_probe_off_loop(self):
+        state = FakeState()
+        changes = []
+        coro = SystemStateUpdateCoroutine(
+            state=state, interval_s=0.01, on_change=lambda: changes.append(1)
+        )
+
+        task = asyncio.ensure_future(coro.run())
+        await asyncio.sleep(0.1)
+        coro.stop()
+        await task
+
+        self.assertGreater(len(changes), 0)
+        self.assertGreater(state.memory_free_bytes, 0)
+        self.assertNotIn(threading.current_thread(), state.probe_threads)
+
+    def test_adaptive_interval(self):
+        demand = [True]
+        coro = SystemStateUpdateCoroutine(
+            state=FakeState(),
+            interval_s=1,
+            min_interval_s=0.1,
+            demand=lambda: demand[0],
+        )
+
+        self.assertEqual(coro.next_interval(1, reset=True), 0.1)
+        # Backs off while nothing changes
+        self.assertAlmostEqual(coro.next_interval(0.1, reset=False), 0.2)
+        self.assertEqual(coro.next_interval(0.8, reset=False), 1)
+
+        demand[0] = False
+        self.assertEqual(coro.next_interval(0.1, reset=True), 1)
+
+        # Fixed rate without a minimum interval
+        fixed = SystemStateUpdateCoroutine(state=FakeState(), interval_s=1)
+        self.assertEqual(fixed.next_interval(1, reset=True), 1)
+
+    async def test_wake(self):
+        state = FakeState()
+        coro = SystemStateUpdateCoroutine(
+            state=state, interval_s=60, min_interval_s=0.1, demand=lambda: False
+        )
+
+        task = asyncio.ensure_future(coro.run())
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(state.probe_threads), 1)
+
+        coro.wake()
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(state.probe_threads), 2)
+
+        coro.stop()
+        await task
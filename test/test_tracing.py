@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+
+from asynctest import TestCase
+
+from taskflow.db.mem import InMemoryDb
+from taskflow.model.state import SystemState
+from taskflow.scheduler import TaskScheduler
+from taskflow.tracing import Tracer
+from test.helpers import make_task
+
+GB = 1024**3
+
+
+def read_trace(tracer: Tracer) -> list:
+    assert tracer.file_path is not None
+    with open(tracer.file_path, "rt") as f:
+        return json.load(f)
+
+
+class TracerTestCase(TestCase):
+    async def test_disabled(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tracer = Tracer(tmp_dir)
+            tracer.task_submitted(make_task("1"))
+            await tracer.flush()
+            self.assertFalse(os.path.exists(os.path.join(tmp_dir, Tracer.FILE_NAME)))
+
+        with self.assertRaises(ValueError):
+            Tracer(None).enable()
+
+    async def test_task_lifecycle(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tracer = Tracer(tmp_dir, enabled=True)
+            task = make_task("1")
+
+            tracer.task_submitted(task)
+            tracer.task_evaluated(task, "memory")
+            tracer.task_evaluated(task, "memory")
+            await tracer.flush()
+            # Each flush leaves a valid JSON file
+            events = read_trace(tracer)
+
+            tracer.task_evaluated(task, "gpu:0")
+            tracer.task_start_sent(task)
+            task.is_running = True
+            tracer.task_updated(task)
+            tracer.task_finished(task, 0)
+            await tracer.flush()
+            await tracer.shutdown()
+
+            events = [e for e in read_trace(tracer) if e["ph"] != "M"]
+            self.assertEqual(
+                [(e["name"], e["ph"]) for e in events],
+                [
+                    ("task 1", "b"),
+                    ("pending", "b"),
+                    ("blocked by memory", "n"),
+                    ("blocked by gpu:0", "n"),
+                    ("pending", "e"),
+                    ("start signal sent", "n"),
+                    ("running", "b"),
+                    ("TASK_UPDATE received", "n"),
+                    ("running", "e"),
+                    ("task 1", "e"),
+                ],
+            )
+            self.assertTrue(all(e["id"] == "1" for e in events))
+            self.assertEqual(events[-1]["args"], {"exit_code": 0})
+
+    async def test_rotate(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tracer = Tracer(tmp_dir, enabled=True, max_bytes=1024, backup_count=2)
+            for i in range(4):
+                for j in range(20):
+                    tracer.task_submitted(make_task(f"{i}-{j}"))
+                await tracer.flush()
+
+            self.assertEqual(
+                sorted(os.listdir(tmp_dir)),
+                [
+                    "taskflow-trace.1.json",
+                    "taskflow-trace.2.json",
+                    "taskflow-trace.json",
+                ],
+            )
+            for name in os.listdir(tmp_dir):
+                with open(os.path.join(tmp_dir, name), "rt") as f:
+                    events = json.load(f)
+                self.assertEqual(events[0]["name"], "process_name")
+
+    async def test_scheduler_pass(self):
+        state = SystemState(gpu_available=False)
+        state.memory_free_bytes = 4 * GB
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tracer = Tracer(tmp_dir, enabled=True)
+            db = InMemoryDb()
+            await db.init()
+            scheduler = TaskScheduler(
+                state=state,
+                db=db,
+                reserved_memory_bytes=0,
+                reserved_gpu_memory_bytes=0,
+                tracer=tracer,
+            )
+
+            t1 = make_task("1", memory_bytes=3 * GB)
+            t2 = make_task("2", memory_bytes=3 * GB)
+            for t in [t1, t2]:
+                await db.insert_task(t)
+                scheduler.submit(t)
+            scheduler.run_pass()
+            await tracer.flush()
+
+            events = read_trace(tracer)
+            passes = [e for e in events if e["name"] == "scheduler pass"]
+            self.assertEqual(len(passes), 1)
+            self.assertEqual(passes[0]["args"], {"placements": 2, "started": 1})
+
+            blocked = [e for e in events if e["name"].startswith("blocked by")]
+            self.assertEqual(
+                [(e["id"], e["name"]) for e in blocked], [("2", "blocked by memory")]
+            )
+
+            await tracer.shutdown()
+            await db.shutdown()
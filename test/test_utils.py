@@ -1,6 +1,9 @@
+import os
+import threading
 import unittest
 
 from datetime import timedelta
+from unittest.mock import patch
 
 from taskflow import utils
 
@@ -21,3 +24,36 @@ class UtilsTestCase(unittest.TestCase):
         expected = "05:17:22"
         output = utils.format_timedelta(inp)
         self.assertEqual(expected, output)
+
+    def test_format_cpu_ids(self):
+        self.assertEqual(utils.format_cpu_ids([3, 0, 1, 2, 8, 10, 11]), "0-3,8,10-11")
+        self.assertEqual(utils.format_cpu_ids([5]), "5")
+        self.assertEqual(utils.format_cpu_ids([]), "")
+
+    @unittest.skipUnless(
+        hasattr(os, "sched_setaffinity")
+        and hasattr(threading, "get_native_id")
+        and os.path.isdir("/proc/self/task"),
+        "Requires sched_setaffinity, get_native_id and /proc",
+    )
+    def test_pin_to_cpus(self):
+        thread_ids = []
+        stop_event = threading.Event()
+
+        def run():
+            thread_ids.append(threading.get_native_id())
+            stop_event.wait()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        pinned = []
+        try:
+            with patch("os.sched_setaffinity", lambda t, ids: pinned.append(t)):
+                utils.pin_to_cpus(utils.get_online_cpu_ids())
+        finally:
+            stop_event.set()
+            thread.join()
+
+        # Threads started before pinning are pinned too
+        self.assertIn(thread_ids[0], pinned)
+        self.assertIn(os.getpid(), pinned)